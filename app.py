@@ -1,8 +1,52 @@
-from fastapi import FastAPI
+import os
+import threading
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from backend.core import registry
+from backend.core.limits import Overloaded
+from backend.core.metrics import get_metrics
 from backend.routers import ingest, qa
+from backend.services.embedding_service import get_embedder
+from backend.services.ingest_jobs import job_manager
 import uvicorn
 
-app = FastAPI(title="SmartTutor API")
+load_dotenv()
+
+# Build the embedding model and clients in the background at startup, so the
+# server accepts requests immediately and the first query does not pay for them.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+
+
+def _startup() -> None:
+    try:
+        job_manager.recover()  # re-queue ingest jobs left behind by a previous process
+        if WARMUP_ON_STARTUP:
+            registry.warm_up(get_embedder())
+    except Exception as e:
+        print(f"Startup tasks failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    threading.Thread(target=_startup, name="startup", daemon=True).start()
+    yield
+    job_manager.shutdown()
+
+
+app = FastAPI(title="SmartTutor API", lifespan=lifespan)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after))},
+    )
+
 
 app.include_router(ingest.router)
 app.include_router(qa.router)
@@ -11,6 +55,15 @@ app.include_router(qa.router)
 def root():
     return {"message": "SmartTutor backend is running"}
 
+
+@app.get("/health/models")
+def models_health():
+    return {"loaded": sorted(registry.load_times), "load_seconds": registry.load_times}
+
+
+@app.get("/metrics")
+def metrics():
+    return get_metrics()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
-    
\ No newline at end of file
@@ -1,14 +1,40 @@
-import os
-from dotenv import load_dotenv
-from utils.utils import get_mongodb_client
+from typing import Callable
 
-load_dotenv()
+from backend.core.registry import get_async_mongo_client, get_mongo_client
 
-MONGODB_URI = os.getenv("MONGODB_ATLAS_URI")
 
-client = get_mongodb_client(MONGODB_URI)
+class LazyCollection:
+    """
+    Purpose: Stand-in for a pymongo Collection that connects on first use.
 
-db = client["smarttutor"]
+    Attribute access is forwarded to smarttutor.<name> on the shared client
+    (sync by default, or the one returned by get_client), so importing this
+    module does not create a MongoClient.
+    """
 
-chunks_collection = db["chunks"]
-chat_collection = db["chat_history"]
+    def __init__(self, name: str, get_client: Callable = get_mongo_client):
+        self._name = name
+        self._get_client = get_client
+        self._collection = None
+
+    def _resolve(self):
+        if self._collection is None:
+            self._collection = self._get_client()["smarttutor"][self._name]
+        return self._collection
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __repr__(self) -> str:
+        return f"LazyCollection({self._name!r})"
+
+
+chunks_collection = LazyCollection("chunks")
+chat_collection = LazyCollection("chat_history")
+answer_cache_collection = LazyCollection("answer_cache")
+manifest_collection = LazyCollection("ingest_manifest")
+embedding_store_collection = LazyCollection("embedding_store")
+ingest_jobs_collection = LazyCollection("ingest_jobs")
+
+# pymongo AsyncCollection for the async /qa path.
+async_chunks_collection = LazyCollection("chunks", get_async_mongo_client)
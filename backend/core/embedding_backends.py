@@ -0,0 +1,141 @@
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Inference backend for the sentence-transformers model:
+#   "torch"      - PyTorch, fp32 (reference)
+#   "onnx"       - ONNX Runtime, fp32
+#   "onnx-int8"  - ONNX Runtime, dynamically quantized int8 weights
+#   "torch-int8" - PyTorch with torch.quantization.quantize_dynamic on Linear layers
+# The ONNX backends need `pip install "sentence-transformers[onnx]"`.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model.onnx")
+# all-MiniLM-L6-v2 ships pre-quantized files per instruction set (avx2, avx512,
+# avx512_vnni, arm64) under onnx/ in its model repo.
+EMBEDDING_ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+# Minimum mean cosine similarity to the torch reference for parity_check() to pass.
+EMBEDDING_PARITY_MIN_COSINE = float(os.getenv("EMBEDDING_PARITY_MIN_COSINE", "0.99"))
+
+BACKENDS = ("torch", "onnx", "onnx-int8", "torch-int8")
+# Backends whose vectors match the reference to float precision.
+EXACT_BACKENDS = ("torch", "onnx")
+
+
+def embedding_model_id(model_name: str, backend: str = EMBEDDING_BACKEND) -> str:
+    """
+    Purpose: Identify the vectors a backend produces, e.g. for the embedding store key.
+
+    fp32 backends share the plain model name; quantized ones get a suffix so
+    their slightly different vectors are never mixed with reference vectors.
+
+    Input: 1. model_name (str): sentence-transformers model name.
+           2. backend (str): One of BACKENDS.
+
+    Output: str: Model id.
+    """
+    return model_name if backend in EXACT_BACKENDS else f"{model_name}:{backend}"
+
+
+def build_embeddings(model_name: str, backend: str = EMBEDDING_BACKEND):
+    """
+    Purpose: Build a HuggingFaceEmbeddings model on the requested backend.
+
+    Input: 1. model_name (str): sentence-transformers model name.
+           2. backend (str): One of BACKENDS.
+
+    Output: HuggingFaceEmbeddings: The model.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported embedding backend: {backend}")
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    model_kwargs: Dict[str, Any] = {"device": "cpu"}
+    if backend == "onnx":
+        model_kwargs.update(backend="onnx", model_kwargs={"file_name": EMBEDDING_ONNX_FILE})
+    elif backend == "onnx-int8":
+        model_kwargs.update(backend="onnx", model_kwargs={"file_name": EMBEDDING_ONNX_INT8_FILE})
+
+    embeddings = HuggingFaceEmbeddings(model_name=model_name, model_kwargs=model_kwargs)
+    if backend == "torch-int8":
+        import torch
+
+        # _client is the underlying SentenceTransformer module.
+        torch.quantization.quantize_dynamic(
+            embeddings._client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    return embeddings
+
+
+def cosine_drift(reference: List[List[float]], candidate: List[List[float]]) -> Dict[str, float]:
+    """
+    Purpose: Compare two embeddings of the same texts row by row.
+
+    Input: 1. reference (List[List[float]]): Reference vectors.
+           2. candidate (List[List[float]]): Vectors from the backend under test.
+
+    Output: Dict[str, float]: Mean, minimum and 1st-percentile cosine similarity,
+            and the mean drift (1 - cosine).
+    """
+    a = np.asarray(reference, dtype=np.float32)
+    b = np.asarray(candidate, dtype=np.float32)
+    cos = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-12)
+    return {
+        "mean_cosine": round(float(cos.mean()), 6),
+        "min_cosine": round(float(cos.min()), 6),
+        "p01_cosine": round(float(np.percentile(cos, 1)), 6),
+        "mean_drift": round(float(1 - cos.mean()), 6),
+    }
+
+
+def parity_check(
+    model_name: str,
+    backend: str,
+    texts: List[str],
+    reference=None,
+    min_cosine: float = EMBEDDING_PARITY_MIN_COSINE,
+) -> Dict[str, Any]:
+    """
+    Purpose: Measure how far a backend's vectors drift from the torch reference.
+
+    Input: 1. model_name (str): sentence-transformers model name.
+           2. backend (str): Backend under test.
+           3. texts (List[str]): Sample texts.
+           4. reference: Already built torch model to reuse (built if None).
+           5. min_cosine (float): Pass threshold on the mean cosine similarity.
+
+    Output: Dict[str, Any]: cosine_drift() stats plus "backend" and "passed".
+    """
+    reference = reference or build_embeddings(model_name, "torch")
+    candidate = build_embeddings(model_name, backend)
+    drift = cosine_drift(reference.embed_documents(texts), candidate.embed_documents(texts))
+    return {"backend": backend, **drift, "passed": drift["mean_cosine"] >= min_cosine}
+
+
+def main() -> None:
+    import argparse
+    import json
+    import sys
+
+    parser = argparse.ArgumentParser(description="Check an embedding backend against torch")
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND, choices=BACKENDS)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("texts", nargs="*", help="Sample texts (a built-in sample by default)")
+    args = parser.parse_args()
+
+    texts = args.texts or [
+        "What is the derivative of x squared?",
+        "Photosynthesis converts light energy into chemical energy stored in glucose.",
+        "TCP uses slow start and congestion avoidance to adapt its sending rate.",
+        "The French Revolution began in 1789 with the storming of the Bastille.",
+    ]
+    result = parity_check(args.model, args.backend, texts)
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class Overloaded(Exception):
+    """Raised when a ConcurrencyLimiter cannot admit a request; routers map it to 429."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Purpose: Admission control for async endpoints.
+
+    At most max_concurrent requests run at once and at most max_queue wait
+    for a slot. A request that finds the queue full, or waits longer than
+    queue_timeout seconds, is rejected with Overloaded instead of piling up.
+
+    Usage: async with limiter: ...  (or acquire()/release() when the slot must
+    outlive the handler, e.g. for a streaming response)
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: Optional[float] = None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout or None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    async def acquire(self) -> None:
+        """Purpose: Take a slot, waiting in the queue if needed; raises Overloaded."""
+        if self._semaphore is None:
+            # Created lazily so it binds to the serving event loop.
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"{self.name}: {self.waiting} requests already queued")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded(f"{self.name}: no slot within {self.queue_timeout}s") from None
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        self.admitted += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    async def __aenter__(self) -> "ConcurrencyLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
+
+
+class RateLimiter:
+    """
+    Purpose: Async token bucket: at most `rate` acquisitions per second on
+             average, with bursts of up to `burst`. rate <= 0 disables it.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class TokenBucket:
+    """
+    Purpose: Thread-safe token bucket shared by sync and async callers.
+
+    reserve(n) takes n tokens right away, letting the balance go negative,
+    and returns the seconds the caller must wait before going ahead (callers
+    sleep with time.sleep or asyncio.sleep). Reservations are served in
+    arrival order. rate is per second; rate <= 0 disables the bucket.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, n: float = 1.0) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self._tokens -= n
+            return max(0.0, -self._tokens / self.rate)
+
+    def adjust(self, n: float) -> None:
+        """Purpose: Give back (n > 0) or take (n < 0) tokens once the real cost is known."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + n)
+
+    def available(self) -> float:
+        if self.rate <= 0:
+            return float("inf")
+        with self._lock:
+            self._refill()
+            return self._tokens
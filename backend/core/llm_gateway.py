@@ -0,0 +1,427 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from backend.core.cache import SingleFlight
+from backend.core.limits import TokenBucket
+from backend.core.metrics import histogram
+from backend.core.registry import get_or_create
+
+load_dotenv()
+
+# "groq" for the real API, "fake" for the local FakeChatModel (tests, load tests).
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq")
+# Calls running against the provider at once (sync and async callers are capped separately).
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Client-side provider quotas; 0 (the default) disables a limit. Set them to the
+# account's limits, e.g. 30 and 12000 on Groq's free tier for llama-3.3-70b-versatile.
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+# Completion tokens reserved per call until the response reports real usage.
+LLM_COMPLETION_TOKENS = int(os.getenv("LLM_COMPLETION_TOKENS", "400"))
+# Retries on 429, 5xx and connection errors/timeouts, with jittered exponential backoff
+# (or the server's Retry-After, capped at LLM_BACKOFF_MAX).
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "50"))
+LLM_FAKE_MS_PER_TOKEN = float(os.getenv("LLM_FAKE_MS_PER_TOKEN", "0"))
+
+# The provider call runs inside the wrapping model's run; without its own (empty)
+# callbacks it would inherit the parent's and every token would be reported twice.
+_DETACHED = {"callbacks": []}
+
+WAIT_MS_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+QUEUE_DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+# Status-less transport failures (the provider SDKs' connection and timeout errors, httpx's).
+TRANSPORT_ERRORS = {"APIConnectionError", "APITimeoutError", "TransportError"}
+
+
+def _is_transport_error(error: Exception) -> bool:
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in TRANSPORT_ERRORS for cls in type(error).__mro__)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _estimate_tokens(messages: List[BaseMessage], kwargs: Dict[str, Any]) -> int:
+    # ~4 characters per token for the prompt, plus the expected completion.
+    prompt = sum(len(str(m.content)) for m in messages) // 4
+    return prompt + int(kwargs.get("max_tokens") or LLM_COMPLETION_TOKENS)
+
+
+class LLMGateway:
+    """
+    Purpose: One process-wide door to the LLM provider for every chain.
+
+    Each call waits for the request and token buckets (and for any pause
+    the provider imposed with a 429), then for a concurrency slot, then
+    runs. Identical prompts in flight on the same route share one call.
+    429s, 5xx errors and connection errors or timeouts are retried with
+    jittered backoff (Retry-After is honoured up to backoff_max); a 429 pauses all
+    callers until its backoff has passed, so a burst does not keep hitting
+    the limit. A retried attempt refunds its bucket reservation, so retries
+    do not drain the budget. Records "llm.latency_ms", "llm.queue_wait_ms" and
+    "llm.queue_depth" histograms.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff_base: float = LLM_BACKOFF_BASE,
+        backoff_max: float = LLM_BACKOFF_MAX,
+    ):
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute / 60, requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sync_slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots: Optional[asyncio.Semaphore] = None
+        self._inflight = SingleFlight()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.active = 0
+        self.counters = {"calls": 0, "retries": 0, "rate_limited": 0, "errors": 0, "tokens": 0}
+        self.latency = histogram("llm.latency_ms")
+        self.queue_wait = histogram("llm.queue_wait_ms", WAIT_MS_BUCKETS)
+        self.queue_depth = histogram("llm.queue_depth", QUEUE_DEPTH_BUCKETS)
+
+    # -------------------------
+    # Bookkeeping
+    # -------------------------
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    def _enter_queue(self) -> float:
+        with self._lock:
+            self.queue_depth.observe(self.waiting)
+            self.waiting += 1
+        return time.perf_counter()
+
+    def _leave_queue(self, queued_at: float) -> None:
+        with self._lock:
+            self.waiting -= 1
+            self.active += 1
+        self.queue_wait.observe((time.perf_counter() - queued_at) * 1000)
+
+    def _done(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def _admission_delay(self, estimate: int) -> float:
+        paused = self._paused_until - time.monotonic()
+        return max(paused, self.requests.reserve(1), self.tokens.reserve(estimate), 0.0)
+
+    def _refund(self, estimate: int) -> None:
+        # A retried attempt gives its reservation back before the retry takes a new
+        # one, so each logical call holds one request and one token estimate.
+        self.requests.adjust(1)
+        self.tokens.adjust(estimate)
+
+    def _settle(self, message: AIMessage, estimate: int, started: float) -> None:
+        self.latency.observe((time.perf_counter() - started) * 1000)
+        self._count("calls")
+        usage = getattr(message, "usage_metadata", None) or {}
+        if usage.get("total_tokens"):
+            self._count("tokens", usage["total_tokens"])
+            self.tokens.adjust(estimate - usage["total_tokens"])
+
+    def _backoff(self, error: Exception, attempt: int) -> Optional[float]:
+        """Purpose: Seconds to wait before retrying, or None if the error is final."""
+        status = _status_code(error)
+        if status is not None:
+            retryable = status == 429 or status >= 500
+        else:
+            retryable = _is_transport_error(error)
+        if attempt >= self.max_retries or not retryable:
+            return None
+        self._count("retries")
+        delay = min(self.backoff_max, self.backoff_base * 2**attempt)
+        retry_after = _retry_after(error)
+        delay = min(retry_after, self.backoff_max) if retry_after else random.uniform(delay / 2, delay)
+        if status == 429:
+            self._count("rate_limited")
+            with self._lock:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+    @staticmethod
+    def _key(route: str, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]):
+        return (
+            route,
+            tuple((m.type, str(m.content)) for m in messages),
+            tuple(stop or ()),
+            repr(sorted(kwargs.items())),
+        )
+
+    # -------------------------
+    # Calls
+    # -------------------------
+    def invoke(self, route: str, model, messages: List[BaseMessage], stop=None, **kwargs) -> AIMessage:
+        """
+        Purpose: Run model.invoke(messages) through the gateway.
+
+        Input: 1. route (str): Caller name, e.g. "qa"; part of the coalescing key.
+               2. model: Provider chat model.
+               3. messages (List[BaseMessage]): Prompt.
+
+        Output: AIMessage: The response (shared with identical concurrent calls).
+        """
+        key = self._key(route, messages, stop, kwargs)
+        return self._inflight.do(key, lambda: self._call(model, messages, stop, kwargs))
+
+    async def ainvoke(self, route: str, model, messages: List[BaseMessage], stop=None, **kwargs) -> AIMessage:
+        """Purpose: Async invoke."""
+        key = self._key(route, messages, stop, kwargs)
+        return await self._inflight.ado(key, lambda: self._acall(model, messages, stop, kwargs))
+
+    def _call(self, model, messages, stop, kwargs) -> AIMessage:
+        estimate = _estimate_tokens(messages, kwargs)
+        for attempt in range(self.max_retries + 1):
+            queued_at = self._enter_queue()
+            time.sleep(self._admission_delay(estimate))
+            self._sync_slots.acquire()
+            self._leave_queue(queued_at)
+            started = time.perf_counter()
+            try:
+                message = model.invoke(messages, _DETACHED, stop=stop, **kwargs)
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    self._count("errors")
+                    raise
+                self._refund(estimate)
+                print(f"LLM call failed ({e}); retrying in {delay:.1f}s")
+            else:
+                self._settle(message, estimate, started)
+                return message
+            finally:
+                self._sync_slots.release()
+                self._done()
+            time.sleep(delay)
+
+    async def _acquire_async(self, estimate: int) -> None:
+        if self._async_slots is None:
+            # Created lazily so it binds to the serving event loop.
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        queued_at = self._enter_queue()
+        try:
+            await asyncio.sleep(self._admission_delay(estimate))
+            await self._async_slots.acquire()
+        except BaseException:
+            with self._lock:
+                self.waiting -= 1
+            raise
+        self._leave_queue(queued_at)
+
+    def _release_async(self) -> None:
+        self._async_slots.release()
+        self._done()
+
+    async def _acall(self, model, messages, stop, kwargs) -> AIMessage:
+        estimate = _estimate_tokens(messages, kwargs)
+        for attempt in range(self.max_retries + 1):
+            await self._acquire_async(estimate)
+            started = time.perf_counter()
+            try:
+                message = await model.ainvoke(messages, _DETACHED, stop=stop, **kwargs)
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    self._count("errors")
+                    raise
+                self._refund(estimate)
+                print(f"LLM call failed ({e}); retrying in {delay:.1f}s")
+            else:
+                self._settle(message, estimate, started)
+                return message
+            finally:
+                self._release_async()
+            await asyncio.sleep(delay)
+
+    async def astream(self, route: str, model, messages: List[BaseMessage], stop=None, **kwargs) -> AsyncIterator[AIMessageChunk]:
+        """
+        Purpose: Stream model.astream(messages) through the gateway.
+
+        Streams are not coalesced, and are retried only if they fail before
+        the first chunk.
+
+        Input: 1. route (str): Caller name, e.g. "qa".
+               2. model: Provider chat model.
+               3. messages (List[BaseMessage]): Prompt.
+
+        Output: AsyncIterator[AIMessageChunk]: Response chunks.
+        """
+        estimate = _estimate_tokens(messages, kwargs)
+        for attempt in range(self.max_retries + 1):
+            await self._acquire_async(estimate)
+            started = time.perf_counter()
+            full: Optional[AIMessageChunk] = None
+            try:
+                async for chunk in model.astream(messages, _DETACHED, stop=stop, **kwargs):
+                    full = chunk if full is None else full + chunk
+                    yield chunk
+            except Exception as e:
+                delay = None if full is not None else self._backoff(e, attempt)
+                if delay is None:
+                    self._count("errors")
+                    raise
+                self._refund(estimate)
+                print(f"LLM stream failed ({e}); retrying in {delay:.1f}s")
+            else:
+                self._settle(full or AIMessage(content=""), estimate, started)
+                return
+            finally:
+                self._release_async()
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+            waiting, active = self.waiting, self.active
+        return {
+            **counters,
+            "waiting": waiting,
+            "active": active,
+            "max_concurrency": self.max_concurrency,
+            "paused_for_s": round(max(0.0, self._paused_until - time.monotonic()), 2),
+            "coalesced": self._inflight.stats()["shared"],
+        }
+
+
+def get_gateway() -> LLMGateway:
+    """
+    Purpose: The process-wide LLM gateway.
+
+    Output: LLMGateway: Shared instance.
+    """
+    return get_or_create("llm_gateway", LLMGateway)
+
+
+class GatewayChatModel(BaseChatModel):
+    """
+    Purpose: Chat model that sends every call of a provider model through the gateway.
+
+    Drop-in for the provider model in chains (invoke, ainvoke, astream and
+    astream_events token streaming all work).
+    """
+
+    route: str
+    provider: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return f"gateway:{self.provider._llm_type}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = get_gateway().invoke(self.route, self.provider, messages, stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = await get_gateway().ainvoke(self.route, self.provider, messages, stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        async for chunk in get_gateway().astream(self.route, self.provider, messages, stop, **kwargs):
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Purpose: Local stand-in for the Groq model (LLM_PROVIDER=fake).
+
+    Replies with respond(messages) after latency_ms plus ms_per_token per
+    completion token: by default a JSON evaluation when the prompt asks for
+    JSON, otherwise an answer that echoes the question. Streams word by word
+    and reports approximate token usage.
+    """
+
+    latency_ms: float = LLM_FAKE_LATENCY_MS
+    ms_per_token: float = LLM_FAKE_MS_PER_TOKEN
+    respond: Optional[Callable[[List[BaseMessage]], str]] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _reply(self, messages: List[BaseMessage]) -> AIMessage:
+        if self.respond:
+            text = self.respond(messages)
+        elif any("json" in str(m.content).lower() for m in messages if m.type == "system"):
+            text = '{"score": 0.9}'
+        else:
+            lines = str(messages[-1].content).strip().splitlines()
+            asked = [line for line in lines if line.lower().startswith("question")]
+            text = f"Fake answer. {(asked or lines or [''])[-1]}"
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+        completion_tokens = len(text) // 4
+        return AIMessage(
+            content=text,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        )
+
+    def _delay(self, reply: AIMessage) -> float:
+        return (self.latency_ms + self.ms_per_token * reply.usage_metadata["output_tokens"]) / 1000
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        reply = self._reply(messages)
+        time.sleep(self._delay(reply))
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        reply = self._reply(messages)
+        await asyncio.sleep(self._delay(reply))
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        reply = self._reply(messages)
+        words = reply.content.split(" ")
+        await asyncio.sleep(self.latency_ms / 1000)
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            if self.ms_per_token:
+                await asyncio.sleep(self.ms_per_token / 1000)
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=word if last else word + " ",
+                    usage_metadata=reply.usage_metadata if last else None,
+                )
+            )
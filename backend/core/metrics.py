@@ -0,0 +1,97 @@
+import bisect
+import threading
+from typing import Any, Dict, Sequence
+
+# Default bucket upper bounds for latencies in milliseconds.
+LATENCY_MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """
+    Purpose: Thread-safe fixed-bucket histogram.
+
+    Observations are counted into the first bucket whose upper bound is >= the
+    value (values above the last bound go to an overflow bucket). Percentiles
+    are estimated as the upper bound of the bucket that contains them, capped
+    at the largest value seen.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_MS_BUCKETS):
+        self.bounds = sorted(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def _percentile(self, q: float) -> float:
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Purpose: Return count, mean, max, p50/p95/p99 and per-bucket counts.
+
+        Output: Dict[str, Any]: Buckets are keyed by "<=bound" plus ">last".
+        """
+        with self._lock:
+            buckets = {f"<={b:g}": n for b, n in zip(self.bounds, self.counts)}
+            buckets[f">{self.bounds[-1]:g}"] = self.counts[-1]
+            return {
+                "count": self.count,
+                "mean": round(self.total / self.count, 3) if self.count else 0.0,
+                "max": round(self.max, 3),
+                "p50": self._percentile(0.50),
+                "p95": self._percentile(0.95),
+                "p99": self._percentile(0.99),
+                "buckets": buckets,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = [0] * (len(self.bounds) + 1)
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
+
+
+_histograms: Dict[str, Histogram] = {}
+_lock = threading.Lock()
+
+
+def histogram(name: str, buckets: Sequence[float] = LATENCY_MS_BUCKETS) -> Histogram:
+    """
+    Purpose: Return the process-wide histogram with this name, creating it on first use.
+
+    Input: 1. name (str): Metric name, e.g. "embed.queue_wait_ms".
+           2. buckets (Sequence[float]): Bucket upper bounds, used on creation only.
+
+    Output: Histogram: The shared histogram.
+    """
+    with _lock:
+        if name not in _histograms:
+            _histograms[name] = Histogram(buckets)
+        return _histograms[name]
+
+
+def get_metrics() -> Dict[str, Any]:
+    """
+    Purpose: Snapshot of every registered histogram.
+
+    Output: Dict[str, Any]: name -> Histogram.snapshot().
+    """
+    with _lock:
+        items = list(_histograms.items())
+    return {name: h.snapshot() for name, h in sorted(items)}
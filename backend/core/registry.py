@@ -0,0 +1,178 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from dotenv import load_dotenv
+
+from backend.core.embedding_backends import (
+    EMBEDDING_BACKEND,
+    build_embeddings,
+    embedding_model_id,
+)
+
+load_dotenv()
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Identifies the vectors of the configured backend (see embedding_model_id).
+EMBEDDING_MODEL_ID = embedding_model_id(EMBEDDING_MODEL)
+GROQ_MODEL = "llama-3.3-70b-versatile"
+
+# Process-wide singletons. Heavy libraries (torch via langchain_huggingface,
+# the Groq SDK, pymongo's client) are imported and built on
+# first use, so importing the app does not pay for them.
+_instances: Dict[str, Any] = {}
+# One lock per name, so building one singleton (e.g. the embedding model) does
+# not hold up first-time lookups of the others. _lock only guards _locks.
+_locks: Dict[str, threading.RLock] = {}
+_lock = threading.Lock()
+_lookup = threading.local()
+load_times: Dict[str, float] = {}
+# kwargs each named chat model was built with (see get_chat_model).
+_chat_options: Dict[str, Dict[str, Any]] = {}
+
+
+class _NotBuilt(Exception):
+    """Raised by get_or_create inside aget() when a singleton still has to be built."""
+
+
+def get_or_create(name: str, factory: Callable[[], Any]) -> Any:
+    """
+    Purpose: Return the named singleton, building it with factory on first use.
+
+    Input: 1. name (str): Registry key.
+           2. factory (Callable[[], Any]): Builds the instance.
+
+    Output: Any: The shared instance.
+    """
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+    if getattr(_lookup, "no_build", False):
+        raise _NotBuilt(name)
+    with _lock:
+        name_lock = _locks.setdefault(name, threading.RLock())
+    with name_lock:
+        if name not in _instances:
+            started = time.perf_counter()
+            _instances[name] = factory()
+            load_times[name] = round(time.perf_counter() - started, 3)
+        return _instances[name]
+
+
+async def aget(getter: Callable[[], Any]) -> Any:
+    """
+    Purpose: Call a singleton getter (e.g. get_chain) from async code.
+
+    Returns at once when everything the getter needs is built; otherwise the
+    first-time construction runs in a worker thread, off the event loop.
+
+    Input: 1. getter (Callable[[], Any]): Function returning a registry singleton.
+
+    Output: Any: The singleton.
+    """
+    _lookup.no_build = True
+    try:
+        return getter()
+    except _NotBuilt:
+        pass
+    finally:
+        _lookup.no_build = False
+    return await asyncio.to_thread(getter)
+
+
+def get_embeddings():
+    """
+    Purpose: Shared MiniLM embedding model used by retrieval and ingestion,
+             on the backend selected by EMBEDDING_BACKEND.
+
+    Output: HuggingFaceEmbeddings: The model.
+    """
+    return get_or_create(
+        "embeddings", lambda: build_embeddings(EMBEDDING_MODEL, EMBEDDING_BACKEND)
+    )
+
+
+def get_chat_model(name: str = "default", **kwargs):
+    """
+    Purpose: Shared chat model; each name is built once with its kwargs.
+
+    Every call goes through the process-wide LLM gateway (rate limits,
+    concurrency cap, retries, coalescing), so the provider client itself
+    does not retry. LLM_PROVIDER=fake swaps Groq for a local fake model.
+
+    kwargs only take effect on the first call for a name. A later call
+    without kwargs returns the existing model; a later call with different
+    kwargs raises ValueError instead of silently ignoring them.
+
+    Input: 1. name (str): Registry key, e.g. "qa" or "eval".
+           2. kwargs: Extra ChatGroq arguments used when the model is first built.
+
+    Output: GatewayChatModel: The chat model.
+    """
+    if kwargs:
+        with _lock:
+            options = _chat_options.setdefault(name, kwargs)
+        if options != kwargs:
+            raise ValueError(f"Chat model {name!r} was already built with {options}, not {kwargs}")
+
+    def build():
+        from backend.core.llm_gateway import LLM_PROVIDER, FakeChatModel, GatewayChatModel
+
+        if LLM_PROVIDER == "fake":
+            provider = FakeChatModel()
+        else:
+            from langchain_groq import ChatGroq
+
+            options = {"model": GROQ_MODEL, "temperature": 0, **kwargs, "max_retries": 0}
+            provider = ChatGroq(api_key=os.getenv("GROQ_API_KEY"), **options)
+        return GatewayChatModel(route=name, provider=provider)
+
+    return get_or_create(f"chat:{name}", build)
+
+
+def get_mongo_client():
+    """
+    Purpose: Shared MongoClient for MONGODB_ATLAS_URI.
+
+    Output: MongoClient: The client.
+    """
+
+    def build():
+        from utils.utils import get_mongodb_client
+
+        return get_mongodb_client(os.getenv("MONGODB_ATLAS_URI"))
+
+    return get_or_create("mongo", build)
+
+
+def get_async_mongo_client():
+    """
+    Purpose: Shared AsyncMongoClient for MONGODB_ATLAS_URI, used by the async serving path.
+
+    Output: AsyncMongoClient: The client.
+    """
+
+    def build():
+        from pymongo import AsyncMongoClient
+
+        return AsyncMongoClient(os.getenv("MONGODB_ATLAS_URI"))
+
+    return get_or_create("mongo_async", build)
+
+
+def warm_up(embedder=None) -> Dict[str, float]:
+    """
+    Purpose: Build the heavy singletons ahead of the first request.
+
+    Input: 1. embedder: Object with embed_query() to warm instead of the local model
+              (e.g. the embedding sidecar client).
+
+    Output: Dict[str, float]: Seconds spent building each component.
+    """
+    (embedder or get_embeddings()).embed_query("warm-up")
+    get_mongo_client()
+    get_chat_model("qa")
+    print(f"Warm-up finished: {load_times}")
+    return dict(load_times)
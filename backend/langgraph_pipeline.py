@@ -1,13 +1,35 @@
 from langgraph.graph import StateGraph, START, END
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser, PydanticOutputParser
 
-from backend.services.qa import answer_question
-from backend.services.web_search import search_and_synthesize
+from backend.core.metrics import histogram
+from backend.core.registry import aget, get_chat_model, get_or_create
+from backend.services.answer_cache import answer_cache
+from backend.services.pre_evaluator import (
+    PRE_EVAL_MODE,
+    PRE_EVAL_TIMEOUT,
+    classify,
+    get_pre_eval_stats,
+    local_score,
+    record_agreement,
+    skip_judge,
+)
+from backend.services.qa import agenerate_answer, extract_sources_from_chunks
+from backend.services.retrieval import aembed_query, asearch_by_vector
+from backend.services.web_search import asearch_and_synthesize, asearch_web, asynthesize_result
+from backend.services.web_writeback import schedule_write_back
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Any, List, Tuple, TypedDict, Optional
+from dotenv import load_dotenv
+import numpy as np
+from models.models import EvalResult, EvalRewriteResult
 
-from typing import Dict, Any, TypedDict, Optional
-from models.models import EvalResult
+load_dotenv()
 
 
 # -------------------------
@@ -15,17 +37,22 @@ from models.models import EvalResult
 # -------------------------
 RAG_THRESHOLD = 0.7
 EVAL_THRESHOLD = 0.7
-
-llm = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    temperature=0,
-)
-
-eval_llm = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    temperature=0,
-    model_kwargs={"response_format": {"type": "json_object"}},
-)
+RAG_TOP_K = 5
+CACHE_NAMESPACE = "graph"
+WEB_TOP_K = 5
+# Evaluate/rewrite stage, chosen when the graph is compiled (see build_graph):
+#   "separate" - evaluator call, then a rewrite call when the score is low
+#   "fused"    - one call returns the score and, when needed, the rewrite
+EVAL_MODE = os.getenv("EVAL_MODE", "separate")
+
+# Speculative web search, started alongside retrieval so web-routed questions
+# do not pay for retrieval and Tavily in sequence:
+#   "off"       - search only after retrieval misses RAG_THRESHOLD
+#   "always"    - search for every question, cancelled when retrieval passes
+#   "predicted" - search when similar past questions scored below the threshold
+SPECULATIVE_WEB = os.getenv("SPECULATIVE_WEB", "off")
+SPECULATIVE_MARGIN = float(os.getenv("SPECULATIVE_MARGIN", "0.05"))
+SPECULATIVE_HISTORY = int(os.getenv("SPECULATIVE_HISTORY", "512"))
 
 
 # -------------------------
@@ -33,6 +60,7 @@ eval_llm = ChatGroq(
 # -------------------------
 class QAState(TypedDict):
     question: str  # User query
+    top_k: Optional[int]  # Chunks to retrieve; RAG_TOP_K when None
 
     rag_result: Optional[
         Dict[str, Any]
@@ -41,17 +69,188 @@ class QAState(TypedDict):
         Dict[str, Any]
     ]  # Contains response strcuture from web pipeline
 
+    rag_chunks: Optional[
+        List[Dict[str, Any]]
+    ]  # Chunks retrieved for the question, reused by the generate node
+
+    web_raw: Optional[
+        List[Dict[str, Any]]
+    ]  # Tavily results fetched speculatively during retrieval, reused by the web node
+
     final_answer: Optional[str]  # Contains final answer
     eval_score: Optional[float]  # Ranging from 0 to 1
+    sources: Optional[List[Dict[str, Any]]]  # Items the final answer was built from
+    cache_hit: Optional[bool]  # True when the answer came from the semantic cache
+    rewritten: Optional[bool]  # True when the fused evaluator already rewrote the answer
+
+    stats: Optional[Dict[str, int]]  # Per-run counters (generations, generations_avoided)
+
+
+# -------------------------
+# Stats
+# -------------------------
+# Process-wide totals; each run also carries its own copy in state["stats"].
+pipeline_stats = {
+    "runs": 0,
+    "cache_hits": 0,
+    "generations": 0,
+    "generations_avoided": 0,
+    "speculative_used": 0,  # Web-routed runs whose search overlapped retrieval
+    "speculative_wasted": 0,  # Extra Tavily calls: retrieval passed, search discarded
+    "speculative_missed": 0,  # Web-routed runs the policy did not speculate on
+    "latency_saved_ms": 0.0,
+    "judge_calls": 0,  # Answers scored by the LLM judge
+    "judge_avoided": 0,  # Answers the local pre-evaluator decided alone
+    "fused_fallbacks": 0,  # Fused evaluate-and-rewrite calls that failed or did not parse
+    "pre_eval_errors": 0,  # Local scoring failed or timed out; the judge decided
+}
+_stats_lock = threading.Lock()
+
+
+def _record(stats: Optional[Dict[str, int]], name: str) -> Dict[str, int]:
+    with _stats_lock:
+        pipeline_stats[name] += 1
+    stats = dict(stats or {"generations": 0, "generations_avoided": 0})
+    stats[name] = stats.get(name, 0) + 1
+    return stats
+
+
+def get_pipeline_stats() -> Dict[str, Any]:
+    """
+    Purpose: Return a snapshot of the process-wide pipeline counters.
+
+    Output: Dict[str, Any]: Runs, answer-cache hits, RAG generations,
+            generations avoided by routing, speculative web search
+            outcomes with the latency they saved, LLM judge calls made and
+            avoided, and the pre-evaluator's agreement with the judge ("pre_eval").
+    """
+    with _stats_lock:
+        stats = dict(pipeline_stats)
+    return {**stats, "pre_eval": get_pre_eval_stats()}
+
+
+# -------------------------
+# Speculation
+# -------------------------
+class ScorePredictor:
+    """
+    Purpose: Guess a question's retrieval top_score before retrieving.
+
+    Keeps the last `size` (query vector, top_score) pairs and predicts the
+    score of the most similar past question, or the mean past score when
+    none is similar enough.
+    """
+
+    def __init__(self, size: int = SPECULATIVE_HISTORY, min_similarity: float = 0.8):
+        self.history: deque = deque(maxlen=size)
+        self.min_similarity = min_similarity
+
+    def observe(self, vec: List[float], top_score: float) -> None:
+        v = np.asarray(vec, dtype=np.float32)
+        self.history.append((v / (np.linalg.norm(v) or 1.0), top_score))
+
+    def predict(self, vec: List[float]) -> Optional[float]:
+        if not self.history:
+            return None
+        q = np.asarray(vec, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        vectors = np.stack([v for v, _ in self.history])
+        scores = np.array([s for _, s in self.history])
+        sims = vectors @ q
+        best = int(sims.argmax())
+        return float(scores[best]) if sims[best] >= self.min_similarity else float(scores.mean())
+
+    def should_speculate(self, vec: List[float]) -> bool:
+        predicted = self.predict(vec)
+        return predicted is None or predicted < RAG_THRESHOLD + SPECULATIVE_MARGIN
+
+
+score_predictor = ScorePredictor()
+
+
+async def _timed_web_search(question: str) -> Tuple[List[Dict[str, Any]], float, float]:
+    """Purpose: Web search returning (results, started, finished) perf_counter times."""
+    started = time.perf_counter()
+    results = await asearch_web(question, k=WEB_TOP_K)
+    return results, started, time.perf_counter()
 
 
 # -------------------------
 # Nodes
 # -------------------------
-def rag_node(state: QAState) -> QAState:
-    """Purpose: Initialize node for using RAG agent"""
-    result = answer_question(state["question"], k=5)
-    return {**state, "rag_result": result}
+def _cache_namespace(state: QAState) -> str:
+    # Answers built from a non-default number of chunks are cached apart.
+    k = state.get("top_k") or RAG_TOP_K
+    return CACHE_NAMESPACE if k == RAG_TOP_K else f"{CACHE_NAMESPACE}:k={k}"
+
+
+async def cache_node(state: QAState) -> QAState:
+    """Purpose: Answer from the semantic answer cache when a similar question was seen"""
+    with _stats_lock:
+        pipeline_stats["runs"] += 1
+    cached = await answer_cache.alookup(state["question"], _cache_namespace(state)) if answer_cache else None
+    if not cached:
+        return {**state, "cache_hit": False}
+
+    with _stats_lock:
+        pipeline_stats["cache_hits"] += 1
+    return {**state, **cached, "cache_hit": True}
+
+
+async def retrieve_node(state: QAState) -> QAState:
+    """Purpose: Retrieve chunks for the question; the answer is generated later.
+    Under SPECULATIVE_WEB the web search runs concurrently and is kept only if retrieval misses."""
+    question = state["question"]
+    stats = {"generations": 0, "generations_avoided": 0}
+    started = time.perf_counter()
+    web_task = None
+    if SPECULATIVE_WEB == "always":
+        web_task = asyncio.ensure_future(_timed_web_search(question))
+
+    try:
+        vec = await aembed_query(question)
+        if SPECULATIVE_WEB == "predicted" and score_predictor.should_speculate(vec):
+            web_task = asyncio.ensure_future(_timed_web_search(question))
+        chunks = await asearch_by_vector(vec, k=state.get("top_k") or RAG_TOP_K)
+    except BaseException:
+        # Don't leave the speculative search running with nobody to collect it.
+        if web_task is not None:
+            web_task.cancel()
+        raise
+    retrieved_at = time.perf_counter()
+
+    items = extract_sources_from_chunks(chunks)
+    top_score = float(items[0]["score"]) if items else 0.0
+    score_predictor.observe(vec, top_score)
+    result = {
+        "type": "rag",
+        "items": items,
+        "top_score": top_score,
+        "answer": None,
+    }
+
+    web_raw = None
+    if web_task is not None and top_score >= RAG_THRESHOLD:
+        web_task.cancel()
+        stats = _record(stats, "speculative_wasted")
+    elif web_task is not None:
+        web_raw, web_started, searched_at = await web_task
+        # Sequential cost (retrieval + web search) minus the overlapped wall time.
+        # The web leg may start after the embedding ("predicted"), so it is timed on its own.
+        sequential = (retrieved_at - started) + (searched_at - web_started)
+        saved_ms = max(0.0, sequential - (max(retrieved_at, searched_at) - started)) * 1000
+        with _stats_lock:
+            pipeline_stats["latency_saved_ms"] += saved_ms
+        stats = _record(stats, "speculative_used")
+        stats["latency_saved_ms"] = round(saved_ms, 1)
+
+    return {
+        **state,
+        "rag_result": result,
+        "rag_chunks": chunks,
+        "web_raw": web_raw,
+        "stats": stats,
+    }
 
 
 def should_use_web(state: QAState) -> str:
@@ -61,14 +260,35 @@ def should_use_web(state: QAState) -> str:
         return "web"
 
     if rag["top_score"] >= RAG_THRESHOLD:
-        return "evaluate"
+        return "generate"
     return "web"
 
 
-def web_node(state: QAState) -> QAState:
+async def generate_node(state: QAState) -> QAState:
+    """Purpose: Generate the RAG answer once retrieval has cleared the threshold"""
+    answer = await agenerate_answer(state["question"], state.get("rag_chunks") or [])
+    return {
+        **state,
+        "rag_result": {**state["rag_result"], "answer": answer},
+        "stats": _record(state.get("stats"), "generations"),
+    }
+
+
+async def web_node(state: QAState) -> QAState:
     """Purpose: Initialize node for using web agent"""
-    result = search_and_synthesize(state["question"], k=5)
-    return {**state, "web_result": result}
+    stats = state.get("stats")
+    if state.get("web_raw") is not None:
+        result = await asynthesize_result(state["question"], state["web_raw"])
+    else:
+        result = await asearch_and_synthesize(state["question"], k=WEB_TOP_K)
+        if SPECULATIVE_WEB != "off":
+            stats = _record(stats, "speculative_missed")
+    schedule_write_back(state["question"], result["items"])
+    return {
+        **state,
+        "web_result": result,
+        "stats": _record(stats, "generations_avoided"),
+    }
 
 
 # -------------------------
@@ -95,11 +315,61 @@ eval_prompt = ChatPromptTemplate.from_messages(
 )
 
 parser = PydanticOutputParser(pydantic_object=EvalResult)
-eval_chain = eval_prompt | eval_llm | parser
 
 
-def evaluator_node(state: QAState) -> QAState:
-    """Purpose: Initialize node for using evaluator agent"""
+def get_eval_chain():
+    """Purpose: Evaluator chain, built on first use with a JSON-mode Groq model"""
+
+    def build():
+        eval_llm = get_chat_model(
+            "eval", model_kwargs={"response_format": {"type": "json_object"}}
+        )
+        return eval_prompt | eval_llm | parser
+
+    return get_or_create("eval_chain", build)
+
+
+# One structured-output call that scores the answer and, when the score is
+# low, rewrites it too, saving the rewrite round trip.
+eval_rewrite_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            (
+                "You are a strict evaluator and editor.\n"
+                "Evaluate the answer based on:\n"
+                "- factual correctness\n"
+                "- completeness\n"
+                "- clarity\n\n"
+                "If the score is below {threshold}, also rewrite the answer to be clearer, "
+                "more structured, and concise. Do not add new facts. Otherwise set "
+                "rewritten_answer to null.\n\n"
+                "{format_instructions}"
+            ),
+        ),
+        (
+            "human",
+            "Question:\n{question}\n\nAnswer:\n{answer}\n\nEvidence:\n{evidence}",
+        ),
+    ]
+)
+
+eval_rewrite_parser = PydanticOutputParser(pydantic_object=EvalRewriteResult)
+
+
+def get_eval_rewrite_chain():
+    """Purpose: Fused evaluate-and-rewrite chain, built on first use with a JSON-mode Groq model"""
+
+    def build():
+        llm = get_chat_model(
+            "eval_rewrite", model_kwargs={"response_format": {"type": "json_object"}}
+        )
+        return eval_rewrite_prompt | llm | eval_rewrite_parser
+
+    return get_or_create("eval_rewrite_chain", build)
+
+
+async def _evaluate(state: QAState, fused: bool) -> QAState:
     candidate = (
         state["rag_result"]
         if state.get("rag_result") and state["rag_result"]["top_score"] >= RAG_THRESHOLD
@@ -113,28 +383,77 @@ def evaluator_node(state: QAState) -> QAState:
             f"title={it.get('title') or it.get('source')} | "
             f"score={it.get('score')}\n"
         )
-
-    try:
-        result: EvalResult = eval_chain.invoke(
-            {
-                "question": state["question"],
-                "answer": candidate["answer"],
-                "evidence": evidence,
-                "format_instructions": parser.get_format_instructions(),
-            }
-        )
-        score = result.score
-    except Exception as e:
-        print("Evaluator failed:", e)
-        score = 0.0  # fail-safe
+    inputs = {"question": state["question"], "answer": candidate["answer"], "evidence": evidence}
+
+    stats = state.get("stats")
+    local, verdict = None, None
+    if PRE_EVAL_MODE != "off":
+        try:
+            local = await asyncio.wait_for(
+                local_score(candidate["answer"], candidate["items"], candidate["top_score"]),
+                timeout=PRE_EVAL_TIMEOUT,
+            )
+            verdict = classify(local["score"])
+        except Exception as e:
+            # Local scoring is an optimization; on failure the judge decides as usual.
+            print("Pre-evaluator failed, sending the answer to the judge:", repr(e))
+            stats = _record(stats, "pre_eval_errors")
+
+    score, rewritten = None, None
+    if skip_judge(verdict):
+        score = local["score"]
+        stats = _record(stats, "judge_avoided")
+    else:
+        if fused:
+            try:
+                fused_result: EvalRewriteResult = await (await aget(get_eval_rewrite_chain)).ainvoke(
+                    {
+                        **inputs,
+                        "threshold": EVAL_THRESHOLD,
+                        "format_instructions": eval_rewrite_parser.get_format_instructions(),
+                    }
+                )
+                score = fused_result.score
+                if score < EVAL_THRESHOLD and (fused_result.rewritten_answer or "").strip():
+                    rewritten = fused_result.rewritten_answer
+            except Exception as e:
+                print("Fused evaluator failed, falling back to evaluate + rewrite:", e)
+                stats = _record(stats, "fused_fallbacks")
+        if score is None:
+            try:
+                result: EvalResult = await (await aget(get_eval_chain)).ainvoke(
+                    {**inputs, "format_instructions": parser.get_format_instructions()}
+                )
+                score = result.score
+            except Exception as e:
+                print("Evaluator failed:", e)
+        if score is not None and verdict is not None:
+            record_agreement(verdict, local["score"], score, EVAL_THRESHOLD)
+        if score is None:
+            score = 0.0  # fail-safe
+        stats = _record(stats, "judge_calls")
 
     return {
         **state,
-        "final_answer": candidate["answer"],
+        "final_answer": rewritten or candidate["answer"],
         "eval_score": score,
+        "rewritten": rewritten is not None,
+        "sources": candidate["items"],
+        "stats": stats,
     }
 
 
+async def evaluator_node(state: QAState) -> QAState:
+    """Purpose: Initialize node for using evaluator agent"""
+    return await _evaluate(state, fused=False)
+
+
+async def fused_evaluator_node(state: QAState) -> QAState:
+    """Purpose: Evaluate and, when the score is low, rewrite in one LLM call.
+    Falls back to the evaluator (and the rewrite node) if the fused call fails or does not parse."""
+    return await _evaluate(state, fused=True)
+
+
 # -------------------------
 # Rewrite Node
 # -------------------------
@@ -148,46 +467,219 @@ rewrite_prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-rewrite_chain = rewrite_prompt | llm | StrOutputParser()
 
 
-def rewrite_node(state: QAState) -> QAState:
+def get_rewrite_chain():
+    """Purpose: Rewrite chain, built on first use"""
+    return get_or_create(
+        "rewrite_chain", lambda: rewrite_prompt | get_chat_model("graph") | StrOutputParser()
+    )
+
+
+async def rewrite_node(state: QAState) -> QAState:
     """Purpose: Initialize node for using rewrite agent"""
-    rewritten = rewrite_chain.invoke({"answer": state["final_answer"]})
+    rewritten = await (await aget(get_rewrite_chain)).ainvoke({"answer": state["final_answer"]})
     return {**state, "final_answer": rewritten}
 
 
+# -------------------------
+# Cache Store Node
+# -------------------------
+async def store_node(state: QAState) -> QAState:
+    """Purpose: Save the final answer in the semantic answer cache"""
+    if answer_cache and state.get("sources"):
+        await answer_cache.astore_result(
+            state["question"],
+            _cache_namespace(state),
+            {
+                "final_answer": state["final_answer"],
+                "eval_score": state["eval_score"],
+                "sources": state["sources"],
+            },
+            [it.get("source") or it.get("url") for it in state["sources"]],
+        )
+    return state
+
+
 # -------------------------
 # Graph
 # -------------------------
-graph = StateGraph(QAState)
+def build_graph(eval_mode: str = EVAL_MODE):
+    """
+    Purpose: Build and compile the QA graph.
+
+    Input: 1. eval_mode (str): "separate" or "fused" evaluate/rewrite stage (see EVAL_MODE).
+
+    Output: CompiledStateGraph: Run it with `await graph.ainvoke(state)`.
+    """
+    if eval_mode not in ("separate", "fused"):
+        raise ValueError(f"Unsupported EVAL_MODE: {eval_mode}")
+    graph = StateGraph(QAState)
+
+    graph.add_node("cache", cache_node)
+    graph.add_node("retrieve", retrieve_node)
+    graph.add_node("generate", generate_node)
+    graph.add_node("web", web_node)
+    graph.add_node("evaluate", fused_evaluator_node if eval_mode == "fused" else evaluator_node)
+    graph.add_node("rewrite", rewrite_node)
+    graph.add_node("store", store_node)
+
+    graph.add_edge(START, "cache")
+
+    graph.add_conditional_edges(
+        "cache",
+        lambda s: END if s.get("cache_hit") else "retrieve",
+        {
+            "retrieve": "retrieve",
+            END: END,
+        },
+    )
 
-graph.add_node("rag", rag_node)
-graph.add_node("web", web_node)
-graph.add_node("evaluate", evaluator_node)
-graph.add_node("rewrite", rewrite_node)
+    graph.add_conditional_edges(
+        "retrieve",
+        should_use_web,
+        {
+            "web": "web",
+            "generate": "generate",
+        },
+    )
 
-graph.add_edge(START, "rag")
+    graph.add_edge("generate", "evaluate")
+    graph.add_edge("web", "evaluate")
 
-graph.add_conditional_edges(
-    "rag",
-    should_use_web,
-    {
-        "web": "web",
-        "evaluate": "evaluate",
-    },
-)
+    graph.add_conditional_edges(
+        "evaluate",
+        lambda s: "rewrite" if s["eval_score"] < EVAL_THRESHOLD and not s.get("rewritten") else "store",
+        {
+            "rewrite": "rewrite",
+            "store": "store",
+        },
+    )
+    graph.add_edge("rewrite", "store")
+    graph.add_edge("store", END)
+    return graph.compile()
 
-graph.add_edge("web", "evaluate")
 
-graph.add_conditional_edges(
-    "evaluate",
-    lambda s: "rewrite" if s["eval_score"] < EVAL_THRESHOLD else END,
-    {
-        "rewrite": "rewrite",
-        END: END,
-    },
-)
-graph.add_edge("rewrite", END)
+# Nodes are async: run the graph with `await app.ainvoke(state)`.
+app = build_graph()
+
 
-app = graph.compile()
+# -------------------------
+# Streaming
+# -------------------------
+GRAPH_NODES = ("cache", "retrieve", "generate", "web", "evaluate", "rewrite", "store")
+# Nodes whose LLM tokens are part of the answer; the evaluator's JSON is not streamed.
+TOKEN_NODES = ("generate", "web", "rewrite")
+
+graph_ttft = histogram("graph.ttft_ms")
+graph_latency = histogram("graph.total_ms")
+
+
+def new_state(question: str, top_k: Optional[int] = None) -> QAState:
+    """Purpose: Initial graph state for a question, retrieving top_k chunks (RAG_TOP_K by default)"""
+    return {
+        "question": question,
+        "top_k": top_k,
+        "rag_result": None,
+        "web_result": None,
+        "rag_chunks": None,
+        "web_raw": None,
+        "final_answer": None,
+        "eval_score": None,
+        "sources": None,
+        "cache_hit": None,
+        "rewritten": None,
+        "stats": None,
+    }
+
+
+def _node_summary(node: str, out: Dict[str, Any]) -> Dict[str, Any]:
+    if node == "cache":
+        return {"cache_hit": bool(out.get("cache_hit"))}
+    if node == "retrieve":
+        return {"top_score": (out.get("rag_result") or {}).get("top_score")}
+    if node == "evaluate":
+        return {"eval_score": out.get("eval_score")}
+    return {}
+
+
+def _answer_node(node: str, out: Dict[str, Any]) -> Optional[str]:
+    # The node that produced the answer the run ends with, if `out` is its output.
+    if node == "cache" and out.get("cache_hit"):
+        return "cache"
+    if node == "generate" and (out.get("rag_result") or {}).get("answer"):
+        return "generate"
+    if node == "web" and (out.get("web_result") or {}).get("answer"):
+        return "web"
+    if node == "rewrite" or (node == "evaluate" and out.get("rewritten")):
+        return "rewrite"
+    return None
+
+
+async def astream_graph(question: str, top_k: Optional[int] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Purpose: Run the graph and stream what happens as it happens.
+
+    Tokens are tagged with the node that produced them: a "rewrite" token
+    stream replaces the "generate"/"web" answer streamed before it.
+    Records the graph.ttft_ms and graph.total_ms histograms.
+
+    Input: 1. question (str): The user question.
+           2. top_k (Optional[int]): Chunks to retrieve (RAG_TOP_K by default).
+
+    Output: AsyncIterator[Tuple[str, Dict[str, Any]]]: ("node", {node, status, ...}),
+            ("sources", {node, items}), ("token", {node, text}) events, then
+            ("done", {answer, eval_score, cache_hit, stats, ttft_ms}).
+    """
+    started = time.perf_counter()
+    first_token_ms = None
+    answer_node = None  # Last node whose output carried the answer
+    final: Dict[str, Any] = {}
+
+    async for ev in app.astream_events(new_state(question, top_k), version="v2"):
+        kind, name = ev["event"], ev["name"]
+        node = ev.get("metadata", {}).get("langgraph_node")
+
+        if kind == "on_chat_model_stream" and node in TOKEN_NODES:
+            text = ev["data"]["chunk"].content
+            if not text:
+                continue
+            if first_token_ms is None:
+                first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+                graph_ttft.observe(first_token_ms)
+            yield "token", {"node": node, "text": text}
+        elif name in GRAPH_NODES and name == node and kind == "on_chain_start":
+            yield "node", {"node": name, "status": "start"}
+        elif name in GRAPH_NODES and name == node and kind == "on_chain_end":
+            out = ev["data"].get("output") or {}
+            yield "node", {"node": name, "status": "end", **_node_summary(name, out)}
+            answer_node = _answer_node(name, out) or answer_node
+            if name == "retrieve" and out.get("rag_result"):
+                yield "sources", {"node": name, "items": out["rag_result"]["items"]}
+            elif name == "web" and out.get("web_result"):
+                yield "sources", {"node": name, "items": out["web_result"]["items"]}
+            elif name == "cache" and out.get("cache_hit"):
+                yield "sources", {"node": name, "items": out.get("sources") or []}
+            elif name == "evaluate" and out.get("rewritten"):
+                # Fused mode: the rewrite came back inside the evaluator's JSON.
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+                    graph_ttft.observe(first_token_ms)
+                yield "token", {"node": "rewrite", "text": out["final_answer"]}
+        elif kind == "on_chain_end" and not ev.get("parent_ids"):
+            final = ev["data"].get("output") or {}
+
+    if first_token_ms is None and final.get("final_answer"):
+        # Nothing was streamed (a cache hit, or an answer built without an LLM
+        # call such as the web "no answer found" reply): send it whole.
+        first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+        graph_ttft.observe(first_token_ms)
+        yield "token", {"node": answer_node, "text": final["final_answer"]}
+    graph_latency.observe((time.perf_counter() - started) * 1000)
+    yield "done", {
+        "answer": final.get("final_answer"),
+        "eval_score": final.get("eval_score"),
+        "cache_hit": bool(final.get("cache_hit")),
+        "stats": final.get("stats"),
+        "ttft_ms": first_token_ms,
+    }
@@ -1,6 +1,13 @@
-from fastapi import APIRouter
+from typing import Any, Dict, Literal, Optional
+
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from backend.services.ingest_jobs import job_manager
+from backend.services.incremental import incremental_ingest_from_dir
+from backend.services.ingest_pipeline import parallel_ingest_from_dir, stream_ingest_from_dir
 from backend.services.ingestion import full_ingest_from_dir
 
 router = APIRouter(prefix="/ingest", tags=["ingestion"])
@@ -8,13 +15,75 @@ router = APIRouter(prefix="/ingest", tags=["ingestion"])
 
 class IngestRequest(BaseModel):
     path: str = "./docs/"   # default if you like
+    # "batch": load everything then insert, "parallel": multi-process parsing with
+    # pipelined embedding and inserts, "stream": constant-memory and resumable,
+    # "incremental": only files whose content changed since the last run
+    mode: Literal["batch", "parallel", "stream", "incremental"] = "batch"
+    dry_run: bool = False  # incremental only: report the delta without ingesting
 
 
 class IngestResponse(BaseModel):
     ingested_chunks: int
+    pages_per_sec: Optional[float] = None
+    chunks_per_sec: Optional[float] = None
+    delta: Optional[Dict[str, Any]] = None
+
+
+class IngestJobRequest(BaseModel):
+    path: str = "./docs/"
+    mode: Literal["stream", "parallel", "incremental"] = "stream"
+
+
+class IngestJob(BaseModel):
+    job_id: str
+    path: str
+    mode: str
+    status: str  # queued, running, succeeded, failed or cancelled
+    progress: Dict[str, Any]
+    throughput: Dict[str, float]
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+def _to_job(doc: Optional[Dict[str, Any]]) -> IngestJob:
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return IngestJob(job_id=doc["_id"], **{k: v for k, v in doc.items() if k != "_id"})
+
+
+@router.post("", response_model=IngestJob, status_code=202)
+def submit_ingest_job(body: IngestJobRequest):
+    return _to_job(job_manager.submit(body.path, mode=body.mode))
+
+
+@router.get("/{job_id}", response_model=IngestJob)
+def get_ingest_job(job_id: str):
+    return _to_job(job_manager.get(job_id))
+
+
+@router.delete("/{job_id}", response_model=IngestJob)
+def cancel_ingest_job(job_id: str):
+    return _to_job(job_manager.cancel(job_id))
 
 
-@router.post("", response_model=IngestResponse)
+@router.post("/sync", response_model=IngestResponse)
 def ingest_docs(body: IngestRequest):
+    if body.mode == "incremental":
+        summary = incremental_ingest_from_dir(body.path, dry_run=body.dry_run)
+        return IngestResponse(
+            ingested_chunks=summary.get("inserted_chunks", 0),
+            delta=summary,
+        )
+    if body.mode != "batch":
+        ingest = parallel_ingest_from_dir if body.mode == "parallel" else stream_ingest_from_dir
+        stats = ingest(body.path)
+        return IngestResponse(
+            ingested_chunks=stats["inserted"],
+            pages_per_sec=stats["pages_per_sec"],
+            chunks_per_sec=stats["chunks_per_sec"],
+        )
     inserted = full_ingest_from_dir(body.path)
     return IngestResponse(ingested_chunks=inserted)
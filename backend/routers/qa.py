@@ -1,11 +1,148 @@
-from fastapi import APIRouter
-from models.models import QARequest, QAResponse
-from backend.services.qa import answer_question
+import json
+import os
+from typing import Any, AsyncIterator, Callable, Dict, Tuple
+
+from dotenv import load_dotenv
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from models.models import (
+    QABatchItem,
+    QABatchRequest,
+    QABatchResponse,
+    QARequest,
+    QAResponse,
+    QAStreamRequest,
+)
+from backend.core.limits import ConcurrencyLimiter
+from backend.langgraph_pipeline import astream_graph
+from backend.services.qa import abatch_answer_questions, acached_answer_question, astream_answer
+
+load_dotenv()
+
+# Admission control for the async QA path; requests beyond the queue get 429.
+QA_MAX_CONCURRENCY = int(os.getenv("QA_MAX_CONCURRENCY", "32"))
+QA_MAX_QUEUE = int(os.getenv("QA_MAX_QUEUE", "64"))
+QA_QUEUE_TIMEOUT = float(os.getenv("QA_QUEUE_TIMEOUT", "10"))
+
+qa_limiter = ConcurrencyLimiter("qa", QA_MAX_CONCURRENCY, QA_MAX_QUEUE, QA_QUEUE_TIMEOUT)
+
+# Batches get their own admission control so bulk runs cannot starve /qa/query.
+QA_BATCH_MAX_RUNNING = int(os.getenv("QA_BATCH_MAX_RUNNING", "2"))
+QA_BATCH_MAX_QUEUE = int(os.getenv("QA_BATCH_MAX_QUEUE", "4"))
+QA_BATCH_MAX_QUESTIONS = int(os.getenv("QA_BATCH_MAX_QUESTIONS", "1000"))
+
+batch_limiter = ConcurrencyLimiter("qa_batch", QA_BATCH_MAX_RUNNING, QA_BATCH_MAX_QUEUE, QA_QUEUE_TIMEOUT)
 
 router = APIRouter(prefix="/qa", tags=["qa"])
 
 
 @router.post("/query", response_model=QAResponse)
-def ask_question(body: QARequest):
-    result = answer_question(body.question, k=body.top_k)
-    return QAResponse(answer=result["answer"], sources=result["sources"])
+async def ask_question(body: QARequest):
+    async with qa_limiter:
+        result = await acached_answer_question(body.question, k=body.top_k)
+    return QAResponse(answer=result["answer"], sources=result["items"])
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _release_once(limiter: ConcurrencyLimiter) -> Callable[[], None]:
+    released = []
+
+    def release() -> None:
+        if not released:
+            released.append(True)
+            limiter.release()
+
+    return release
+
+
+async def _event_stream(
+    events: AsyncIterator[Tuple[str, Dict[str, Any]]], release: Callable[[], None]
+) -> AsyncIterator[str]:
+    # The limiter slot is taken before the response starts and held until the stream ends.
+    try:
+        async for event, data in events:
+            yield _sse(event, data)
+    except Exception as e:
+        print(f"QA stream failed: {e}")
+        yield _sse("error", {"detail": f"{type(e).__name__}: {e}"})
+    finally:
+        release()
+
+
+@router.post("/stream")
+async def stream_answer(body: QAStreamRequest):
+    """
+    Purpose: Server-Sent Events version of /qa/query.
+
+    Chain mode sends "sources", then "token" events, then "done". Graph mode
+    runs the LangGraph pipeline and adds "node" start/end events; its tokens
+    carry the node that produced them.
+    """
+    await qa_limiter.acquire()
+    # Released when the stream ends, or by the background task if the
+    # client disconnected before the stream started.
+    release = _release_once(qa_limiter)
+    events = (
+        astream_graph(body.question, top_k=body.top_k)
+        if body.mode == "graph"
+        else astream_answer(body.question, k=body.top_k)
+    )
+    return StreamingResponse(
+        _event_stream(events, release),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release),
+    )
+
+
+def _batch_item(result: Dict[str, Any]) -> QABatchItem:
+    return QABatchItem(
+        index=result["index"],
+        question=result["question"],
+        answer=result.get("answer"),
+        sources=result.get("items") or [],
+        cached=result.get("cached", False),
+        error=result.get("error"),
+    )
+
+
+async def _ndjson_stream(results: AsyncIterator[Dict[str, Any]], release: Callable[[], None]) -> AsyncIterator[str]:
+    try:
+        async for result in results:
+            yield _batch_item(result).model_dump_json() + "\n"
+    finally:
+        release()
+
+
+@router.post("/batch", response_model=QABatchResponse)
+async def batch_answer(body: QABatchRequest):
+    """
+    Purpose: Answer many questions in one request.
+
+    Duplicates are answered once, questions are embedded together and
+    generations run under the per-batch concurrency and rate limits. Failed
+    questions come back with "error" set. With stream=true the results are
+    sent as NDJSON lines as soon as each is ready.
+    """
+    if len(body.questions) > QA_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {QA_BATCH_MAX_QUESTIONS} questions per batch"
+        )
+
+    results = abatch_answer_questions(body.questions, k=body.top_k, ordered=body.ordered)
+    if not body.stream:
+        async with batch_limiter:
+            items = [_batch_item(r) async for r in results]
+        return QABatchResponse(results=items)
+
+    await batch_limiter.acquire()
+    release = _release_once(batch_limiter)
+    return StreamingResponse(
+        _ndjson_stream(results, release),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(release),
+    )
@@ -0,0 +1,275 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from backend.core.db import answer_cache_collection
+from backend.services.retrieval import embed_query
+
+load_dotenv()
+
+# "memory" keeps entries in-process, "mongo" stores them in the answer_cache
+# collection (needs the vector index below), "off" disables the cache.
+ANSWER_CACHE_BACKEND = os.getenv("ANSWER_CACHE_BACKEND", "memory")
+# Minimum similarity, on the same (1 + cosine) / 2 scale as vectorSearchScore.
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.97"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+ANSWER_CACHE_INDEX = "smarttutor_answer_cache_index"
+# Entries kept by the "memory" backend; the least recently used one is evicted beyond this.
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+
+
+class InMemoryAnswerStore:
+    """
+    Purpose: Process-local answer store, also used as the stand-in for tests.
+
+    Holds at most `max_entries` entries in fixed slots. Their normalized
+    embeddings live in one float32 matrix allocated on the first insert, so a
+    lookup is a single matrix-vector product with expired entries and other
+    namespaces masked out. A full store reuses expired slots first, then
+    evicts the least recently used entry.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._matrix: Optional[np.ndarray] = None
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * max_entries
+        self._expires = np.full(max_entries, -np.inf)  # POSIX timestamps, -inf for empty slots
+        self._namespace_ids = np.full(max_entries, -1, dtype=np.int32)
+        self._namespaces: Dict[str, int] = {}
+        self._recent: "OrderedDict[int, None]" = OrderedDict()  # Used slots, least recent first
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._recent)
+
+    def find_nearest(
+        self, namespace: str, vector: List[float]
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        now = datetime.now(timezone.utc).timestamp()
+
+        with self._lock:
+            namespace_id = self._namespaces.get(namespace)
+            if self._matrix is None or namespace_id is None:
+                return None
+            scores = self._matrix @ query
+            live = (self._namespace_ids == namespace_id) & (self._expires > now)
+            scores[~live] = -np.inf
+            slot = int(np.argmax(scores))
+            if not live[slot]:
+                return None
+            self._recent.move_to_end(slot)
+            return self._entries[slot], (1.0 + float(scores[slot])) / 2.0
+
+    def insert(self, entry: Dict[str, Any]) -> None:
+        vec = np.asarray(entry["embedding"], dtype=np.float32)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, vec.shape[0]), dtype=np.float32)
+            slot = self._free_slot()
+            self._matrix[slot] = vec / (np.linalg.norm(vec) or 1.0)
+            self._entries[slot] = entry
+            self._expires[slot] = entry["expires_at"].timestamp()
+            self._namespace_ids[slot] = self._namespaces.setdefault(entry["namespace"], len(self._namespaces))
+            self._recent[slot] = None
+
+    def _free_slot(self) -> int:
+        if not self._free:
+            now = datetime.now(timezone.utc).timestamp()
+            for slot in np.flatnonzero(self._expires <= now).tolist():
+                self._clear(slot)
+        if not self._free:
+            self._clear(next(iter(self._recent)))
+        return self._free.pop()
+
+    def _clear(self, slot: int) -> None:
+        self._entries[slot] = None
+        self._expires[slot] = -np.inf
+        self._namespace_ids[slot] = -1
+        del self._recent[slot]
+        self._free.append(slot)
+
+    def delete_by_sources(self, sources: List[str]) -> int:
+        wanted = set(sources)
+        with self._lock:
+            stale = [slot for slot in self._recent if wanted & set(self._entries[slot]["sources"])]
+            for slot in stale:
+                self._clear(slot)
+            return len(stale)
+
+
+class MongoAnswerStore:
+    """
+    Purpose: Answer store backed by a Mongo collection.
+
+    Expects an Atlas Vector Search index named ANSWER_CACHE_INDEX on
+    "embedding" (cosine) with "namespace" as a filter field. Expired entries
+    are dropped by a TTL index on "expires_at".
+    """
+
+    def __init__(self, collection, index_name: str = ANSWER_CACHE_INDEX):
+        self.collection = collection
+        self.index_name = index_name
+        self._indexed = False
+
+    def find_nearest(
+        self, namespace: str, vector: List[float]
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        pipeline = [
+            {
+                "$vectorSearch": {
+                    "index": self.index_name,
+                    "path": "embedding",
+                    "queryVector": vector,
+                    "filter": {"namespace": namespace},
+                    "numCandidates": 20,
+                    "limit": 1,
+                }
+            },
+            {"$project": {"embedding": 0, "score": {"$meta": "vectorSearchScore"}}},
+        ]
+        for doc in self.collection.aggregate(pipeline):
+            expires_at = doc["expires_at"]
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            if expires_at > datetime.now(timezone.utc):
+                return doc, float(doc["score"])
+        return None
+
+    def insert(self, entry: Dict[str, Any]) -> None:
+        if not self._indexed:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self.collection.create_index("sources")
+            self._indexed = True
+        self.collection.insert_one(dict(entry))
+
+    def delete_by_sources(self, sources: List[str]) -> int:
+        return self.collection.delete_many({"sources": {"$in": list(sources)}}).deleted_count
+
+
+class SemanticAnswerCache:
+    """
+    Purpose: Return a stored result when a similar question was answered before.
+
+    Questions are embedded with the retrieval query embedder, so a cache miss
+    followed by retrieval still costs a single embedding. Entries remember the
+    sources they were built from and are invalidated when those are re-ingested.
+    """
+
+    def __init__(self, store, threshold: float = ANSWER_CACHE_THRESHOLD, ttl: float = ANSWER_CACHE_TTL):
+        self.store = store
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, question: str, namespace: str) -> Optional[Dict[str, Any]]:
+        """
+        Purpose: Find a cached result for a question.
+
+        Input: 1. question (str): The incoming question.
+               2. namespace (str): Keeps results of different pipelines apart.
+
+        Output: Optional[Dict[str, Any]]: The stored result, or None on a miss.
+        """
+        try:
+            found = self.store.find_nearest(namespace, embed_query(question))
+        except Exception as e:
+            print(f"Answer cache lookup failed: {e}")
+            found = None
+
+        hit = found is not None and found[1] >= self.threshold
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found[0]["result"] if hit else None
+
+    def store_result(
+        self, question: str, namespace: str, result: Dict[str, Any], sources: List[str]
+    ) -> None:
+        """
+        Purpose: Store a result for later similar questions.
+
+        Input: 1. question (str): The answered question.
+               2. namespace (str): Keeps results of different pipelines apart.
+               3. result (Dict[str, Any]): The result to return on later hits.
+               4. sources (List[str]): Source paths or URLs the result was built from.
+        """
+        now = datetime.now(timezone.utc)
+        entry = {
+            "namespace": namespace,
+            "question": question,
+            "embedding": embed_query(question),
+            "result": result,
+            "sources": sorted({s for s in sources if s}),
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl),
+        }
+        try:
+            self.store.insert(entry)
+        except Exception as e:
+            print(f"Answer cache store failed: {e}")
+
+    async def alookup(self, question: str, namespace: str) -> Optional[Dict[str, Any]]:
+        """Purpose: lookup() in a worker thread, for the async serving path."""
+        return await asyncio.to_thread(self.lookup, question, namespace)
+
+    async def astore_result(
+        self, question: str, namespace: str, result: Dict[str, Any], sources: List[str]
+    ) -> None:
+        """Purpose: store_result() in a worker thread, for the async serving path."""
+        await asyncio.to_thread(self.store_result, question, namespace, result, sources)
+
+    def invalidate_sources(self, sources: List[str]) -> int:
+        """
+        Purpose: Drop every cached result built from any of the given sources.
+
+        Input: 1. sources (List[str]): Re-ingested or removed source paths.
+
+        Output: int: Number of entries removed.
+        """
+        if not sources:
+            return 0
+        try:
+            removed = self.store.delete_by_sources(list(sources))
+        except Exception as e:
+            print(f"Answer cache invalidation failed: {e}")
+            return 0
+        with self._lock:
+            self.invalidations += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+
+def _build_cache() -> Optional[SemanticAnswerCache]:
+    if ANSWER_CACHE_BACKEND == "mongo":
+        return SemanticAnswerCache(MongoAnswerStore(answer_cache_collection))
+    if ANSWER_CACHE_BACKEND == "memory":
+        return SemanticAnswerCache(InMemoryAnswerStore())
+    return None
+
+
+# None when ANSWER_CACHE_BACKEND is "off".
+answer_cache = _build_cache()
@@ -0,0 +1,175 @@
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from backend.core.metrics import histogram
+
+load_dotenv()
+
+# Prompt budgets, in estimated tokens (~4 characters each), for the RAG
+# context and for the web evidence. 0 disables the budget.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+WEB_EVIDENCE_TOKEN_BUDGET = int(os.getenv("WEB_EVIDENCE_TOKEN_BUDGET", "1500"))
+# Two passages whose word 5-gram sets overlap at least this much (Jaccard) are near-duplicates.
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.8"))
+# Longest chunk overlap searched for when merging neighbours; the splitter uses 128 characters.
+MAX_OVERLAP_CHARS = 256
+# A passage is only cut to fit the remaining budget if at least this many tokens fit.
+MIN_PARTIAL_TOKENS = 64
+
+TOKEN_BUCKETS = (0, 50, 100, 200, 400, 800, 1600, 3200, 6400)
+
+
+def count_tokens(text: str) -> int:
+    """Purpose: Cheap token estimate (~4 characters per token), as used for the LLM token budget."""
+    return (len(text) + 3) // 4
+
+
+def strip_overlap(previous: str, following: str, max_chars: int = MAX_OVERLAP_CHARS) -> str:
+    """
+    Purpose: Drop the start of `following` that repeats the end of `previous`.
+
+    Input: 1. previous (str): Earlier chunk.
+           2. following (str): The next chunk of the same page.
+           3. max_chars (int): Longest overlap to look for.
+
+    Output: str: `following` without the repeated prefix.
+    """
+    for size in range(min(max_chars, len(previous), len(following)), 15, -1):
+        if previous.endswith(following[:size]):
+            return following[size:]
+    return following
+
+
+def _shingles(text: str, n: int = 5) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= n:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + n]) for i in range(len(words) - n + 1)}
+
+
+def is_near_duplicate(a: set, b: set, threshold: float = CONTEXT_DUPLICATE_THRESHOLD) -> bool:
+    return bool(a and b) and len(a & b) / len(a | b) >= threshold
+
+
+def merge_adjacent(passages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Purpose: Merge passages that are consecutive chunks of the same page.
+
+    Passages sharing a "group" (e.g. source and page) whose "index" values
+    (chunk_index) are consecutive become one passage, with the splitter's
+    overlap removed; it keeps the best score and the first passage's fields.
+    Passages without a group or index are returned unchanged.
+
+    Input: 1. passages (List[Dict[str, Any]]): Dicts with "text", "score",
+              and optionally "group" and "index".
+
+    Output: List[Dict[str, Any]]: Merged passages, with "merged" = number of chunks joined.
+    """
+    merged: List[Dict[str, Any]] = []
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    for p in passages:
+        if p.get("group") is None or p.get("index") is None:
+            merged.append({**p, "merged": 1})
+        else:
+            groups.setdefault(p["group"], []).append(p)
+
+    for members in groups.values():
+        members.sort(key=lambda p: p["index"])
+        run = {**members[0], "merged": 1}
+        for p in members[1:]:
+            if p["index"] == run["index"] + run["merged"]:
+                run["text"] = run["text"] + strip_overlap(run["text"], p["text"])
+                run["score"] = max(run["score"], p["score"])
+                run["merged"] += 1
+            elif p["index"] >= run["index"] + run["merged"]:
+                merged.append(run)
+                run = {**p, "merged": 1}
+            # Same index twice (duplicate hit): keep the first.
+        merged.append(run)
+    return merged
+
+
+def pack_passages(
+    passages: List[Dict[str, Any]], budget: int, kind: str = "context"
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Purpose: Assemble prompt evidence within a token budget.
+
+    Merges adjacent chunks, drops near-duplicates (keeping the higher score),
+    then takes passages by descending score until the budget is spent; the
+    last one is cut at a word boundary if a useful part of it fits. Records
+    the "<kind>.tokens" and "<kind>.tokens_saved" histograms.
+
+    Input: 1. passages (List[Dict[str, Any]]): Dicts with "text" and "score"
+              (plus optional "group"/"index" for merging and any display fields).
+           2. budget (int): Token budget; 0 means unlimited.
+           3. kind (str): Metric prefix, e.g. "context" or "web_evidence".
+
+    Output: Tuple[List[Dict[str, Any]], Dict[str, int]]: Packed passages in score
+            order, and {"tokens_in", "tokens_out", "tokens_saved", "dropped"}.
+    """
+    tokens_in = sum(count_tokens(p["text"]) for p in passages)
+    candidates = sorted(merge_adjacent(passages), key=lambda p: p.get("score", 0.0), reverse=True)
+
+    kept: List[Dict[str, Any]] = []
+    kept_shingles: List[set] = []
+    used = 0
+    dropped = 0
+    for p in candidates:
+        shingles = _shingles(p["text"])
+        if any(is_near_duplicate(shingles, s) for s in kept_shingles):
+            dropped += 1
+            continue
+        tokens = count_tokens(p["text"])
+        remaining = budget - used if budget else tokens
+        if tokens > remaining:
+            if remaining < MIN_PARTIAL_TOKENS:
+                dropped += 1
+                continue
+            cut = p["text"][: remaining * 4]
+            p = {**p, "text": cut[: cut.rfind(" ")] if " " in cut else cut, "truncated": True}
+            tokens = count_tokens(p["text"])
+        kept.append(p)
+        kept_shingles.append(shingles)
+        used += tokens
+
+    stats = {
+        "tokens_in": tokens_in,
+        "tokens_out": used,
+        "tokens_saved": tokens_in - used,
+        "dropped": dropped,
+    }
+    histogram(f"{kind}.tokens", TOKEN_BUCKETS).observe(used)
+    histogram(f"{kind}.tokens_saved", TOKEN_BUCKETS).observe(stats["tokens_saved"])
+    return kept, stats
+
+
+def chunk_passages(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Purpose: Turn retrieved chunks into passages for pack_passages.
+
+    Chunks group by source and page (doc_index when there is no page) and
+    are ordered by chunk_index, which split_documents numbers per document.
+
+    Input: 1. chunks (List[Dict[str, Any]]): Retrieved chunks with "text", "metadata" and "score".
+
+    Output: List[Dict[str, Any]]: Passages.
+    """
+    passages = []
+    for c in chunks:
+        meta = c.get("metadata", {}) or {}
+        page: Optional[Any] = meta.get("page", meta.get("doc_index"))
+        passages.append(
+            {
+                "text": c["text"],
+                "score": float(c.get("score", 0.0)),
+                "group": (meta.get("source"), page) if meta.get("source") is not None else None,
+                "index": meta.get("chunk_index"),
+                "source": meta.get("source"),
+                "page": meta.get("page"),
+            }
+        )
+    return passages
@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from backend.core.metrics import get_metrics, histogram
+from backend.core.registry import get_embeddings, get_or_create
+
+load_dotenv()
+
+# Concurrent embed calls arriving within this window share one forward pass.
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+# Stop collecting once a batch holds this many texts; one larger call runs on its own.
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+# When set (e.g. http://127.0.0.1:8100), embed through the shared sidecar
+# instead of loading the model in this process.
+EMBEDDING_SERVICE_URL = os.getenv("EMBEDDING_SERVICE_URL", "")
+EMBEDDING_SERVICE_TIMEOUT = float(os.getenv("EMBEDDING_SERVICE_TIMEOUT", "30"))
+# Longest a blocking call waits for one slice (at most EMBED_MAX_BATCH texts) before
+# raising TimeoutError; large requests are embedded slice by slice, each with this timeout.
+EMBED_RESULT_TIMEOUT = float(os.getenv("EMBED_RESULT_TIMEOUT", "60"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+WAIT_MS_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
+class MicroBatcher:
+    """
+    Purpose: Embed texts from many threads with as few forward passes as possible.
+
+    Callers block on embed_documents()/embed_query() (or await the a-prefixed
+    variants, so the event loop never runs the model); a single worker thread
+    takes the first waiting request, keeps collecting requests for up to
+    window_ms (or until max_batch texts), embeds them all in one
+    embed_documents() call and hands each caller its slice of the result.
+    Requests larger than max_batch (ingestion) are queued one max_batch slice
+    at a time, so query embeds take turns with them instead of waiting for the
+    whole workload. Requests whose caller was cancelled before the batch runs
+    are dropped.
+    Records "embed.batch_size", "embed.batch_requests", "embed.queue_wait_ms"
+    and "embed.forward_ms" histograms.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        window_ms: float = EMBED_BATCH_WINDOW_MS,
+        max_batch: int = EMBED_MAX_BATCH,
+        result_timeout: float = EMBED_RESULT_TIMEOUT,
+    ):
+        self._model = model
+        self.result_timeout = result_timeout
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[List[str], Future, float]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batch_size = histogram("embed.batch_size", BATCH_SIZE_BUCKETS)
+        self.batch_requests = histogram("embed.batch_requests", BATCH_SIZE_BUCKETS)
+        self.queue_wait = histogram("embed.queue_wait_ms", WAIT_MS_BUCKETS)
+        self.forward = histogram("embed.forward_ms")
+
+    def _submit(self, texts: List[str]) -> Future:
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._loop, name="embed-batcher", daemon=True)
+                self._worker.start()
+        future: Future = Future()
+        self._queue.put((list(texts), future, time.perf_counter()))
+        return future
+
+    def _slices(self, texts: List[str]) -> List[List[str]]:
+        texts = list(texts)
+        return [texts[i : i + self.max_batch] for i in range(0, len(texts), self.max_batch)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for part in self._slices(texts):
+            # The next slice is queued only once this one is done, behind any waiting queries.
+            vectors.extend(self._submit(part).result(timeout=self.result_timeout))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for part in self._slices(texts):
+            vectors.extend(await asyncio.wrap_future(self._submit(part)))
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def _loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.perf_counter() + self.window
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            try:
+                self._run(batch)
+            except Exception as e:
+                # Never let one bad batch stop the worker: every later call would hang.
+                print(f"Embedding batch failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _run(self, batch: List[Tuple[List[str], Future, float]]) -> None:
+        # Claim each future; a cancelled one (its awaiting caller went away) is dropped.
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        for _, _, enqueued in batch:
+            self.queue_wait.observe((started - enqueued) * 1000)
+        texts = [t for item_texts, _, _ in batch for t in item_texts]
+        try:
+            model = self._model or get_embeddings()
+            vectors = model.embed_documents(texts)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        self.forward.observe((time.perf_counter() - started) * 1000)
+        self.batch_size.observe(len(texts))
+        self.batch_requests.observe(len(batch))
+
+        offset = 0
+        for item_texts, future, _ in batch:
+            future.set_result(vectors[offset : offset + len(item_texts)])
+            offset += len(item_texts)
+
+
+class RemoteEmbedder:
+    """
+    Purpose: Client for the embedding sidecar with the same interface as the model.
+
+    Batching happens in the sidecar, across every API worker that points at it.
+    Large requests are sent max_batch texts per HTTP call, so the timeout
+    applies per slice and the sidecar serves queries in between.
+    """
+
+    def __init__(self, url: str, timeout: float = EMBEDDING_SERVICE_TIMEOUT, max_batch: int = EMBED_MAX_BATCH):
+        import httpx
+
+        self.client = httpx.Client(base_url=url.rstrip("/"), timeout=timeout)
+        # Bound to the event loop of its first request; the API runs a single loop.
+        self.async_client = httpx.AsyncClient(base_url=url.rstrip("/"), timeout=timeout)
+        self.max_batch = max_batch
+        self.latency = histogram("embed.remote_ms")
+
+    def _slices(self, texts: List[str]) -> List[List[str]]:
+        texts = list(texts)
+        return [texts[i : i + self.max_batch] for i in range(0, len(texts), self.max_batch)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for part in self._slices(texts):
+            started = time.perf_counter()
+            resp = self.client.post("/embed", json={"texts": part})
+            resp.raise_for_status()
+            self.latency.observe((time.perf_counter() - started) * 1000)
+            vectors.extend(resp.json()["vectors"])
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for part in self._slices(texts):
+            started = time.perf_counter()
+            resp = await self.async_client.post("/embed", json={"texts": part})
+            resp.raise_for_status()
+            self.latency.observe((time.perf_counter() - started) * 1000)
+            vectors.extend(resp.json()["vectors"])
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def local_batcher() -> MicroBatcher:
+    """
+    Purpose: The in-process batcher over the shared model.
+
+    Output: MicroBatcher: Shared instance.
+    """
+    return get_or_create("embed_batcher", MicroBatcher)
+
+
+def get_embedder():
+    """
+    Purpose: Embedder used by retrieval and ingestion: the sidecar client when
+             EMBEDDING_SERVICE_URL is set, otherwise the in-process batcher.
+
+    Output: RemoteEmbedder | MicroBatcher: Object with embed_documents()/embed_query().
+    """
+    if EMBEDDING_SERVICE_URL:
+        return get_or_create("embed_remote", lambda: RemoteEmbedder(EMBEDDING_SERVICE_URL))
+    return local_batcher()
+
+
+# -------------------------
+# Sidecar
+# -------------------------
+class EmbedRequest(BaseModel):
+    texts: List[str]
+
+
+class EmbedResponse(BaseModel):
+    vectors: List[List[float]]
+
+
+sidecar = FastAPI(title="SmartTutor embedding service")
+
+
+@sidecar.post("/embed", response_model=EmbedResponse)
+def embed(req: EmbedRequest):
+    # Sync endpoint: each request waits in its own threadpool thread, so
+    # concurrent requests from all API workers meet in the batcher.
+    return EmbedResponse(vectors=local_batcher().embed_documents(req.texts))
+
+
+@sidecar.get("/metrics")
+def metrics():
+    return get_metrics()
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the shared embedding sidecar")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    local_batcher().embed_query("warm-up")
+    uvicorn.run(sidecar, host=args.host, port=args.port, workers=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import hashlib
+import re
+from typing import Dict, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+LOOKUP_BATCH_SIZE = 1000  # Keys per $in lookup
+
+
+def content_key(text: str, model_name: str) -> str:
+    """
+    Purpose: Content address of a chunk text for a given embedding model.
+
+    Input: 1. text (str): Chunk text; whitespace runs are collapsed before hashing.
+           2. model_name (str): Embedding model name.
+
+    Output: str: Hex SHA-256 digest.
+    """
+    normalized = re.sub(r"\s+", " ", text).strip()
+    return hashlib.sha256(f"{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Purpose: Content-addressed cache of chunk embeddings in a Mongo collection.
+
+    Identical texts (after whitespace normalization) are embedded once per
+    batch and, because vectors are persisted under their content hash, once
+    across documents and re-ingest runs.
+    """
+
+    def __init__(self, collection, model_name: str):
+        self.collection = collection
+        self.model_name = model_name
+
+    def embed_documents(
+        self, texts: List[str], embeddings, counters: Optional[Dict[str, int]] = None
+    ) -> List[List[float]]:
+        """
+        Purpose: Return one vector per text, embedding only texts not seen before.
+
+        Input: 1. texts (List[str]): Chunk texts.
+               2. embeddings: Model with embed_documents().
+               3. counters (Optional[Dict[str, int]]): Accumulates "texts" and "embedded".
+
+        Output: List[List[float]]: Vectors in the order of texts.
+        """
+        keys = [content_key(t, self.model_name) for t in texts]
+        unique: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            unique.setdefault(key, text)
+
+        found: Dict[str, List[float]] = {}
+        keys_unique = list(unique)
+        for i in range(0, len(keys_unique), LOOKUP_BATCH_SIZE):
+            cursor = self.collection.find(
+                {"_id": {"$in": keys_unique[i : i + LOOKUP_BATCH_SIZE]}}, {"embedding": 1}
+            )
+            found.update((doc["_id"], doc["embedding"]) for doc in cursor)
+        missing = [key for key in unique if key not in found]
+        if missing:
+            vectors = embeddings.embed_documents([unique[key] for key in missing])
+            found.update(zip(missing, vectors))
+            try:
+                self.collection.insert_many(
+                    [
+                        {"_id": key, "model": self.model_name, "embedding": found[key]}
+                        for key in missing
+                    ],
+                    ordered=False,
+                )
+            except BulkWriteError:
+                # Another run stored some of the same texts concurrently.
+                pass
+
+        if counters is not None:
+            counters["texts"] = counters.get("texts", 0) + len(texts)
+            counters["embedded"] = counters.get("embedded", 0) + len(missing)
+        return [found[key] for key in keys]
+
+
+def dedupe_ratio(counters: Dict[str, int]) -> float:
+    """
+    Purpose: Share of texts whose embedding was reused instead of computed.
+
+    Input: 1. counters (Dict[str, int]): "texts" and "embedded" counters.
+
+    Output: float: Between 0 and 1.
+    """
+    texts = counters.get("texts", 0)
+    return round(1 - counters.get("embedded", 0) / texts, 4) if texts else 0.0
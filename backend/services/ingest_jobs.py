@@ -0,0 +1,267 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+
+from backend.core.db import ingest_jobs_collection
+from backend.services.incremental import incremental_ingest_from_dir
+from backend.services.ingest_pipeline import (
+    IngestCancelled,
+    parallel_ingest_from_dir,
+    stream_ingest_from_dir,
+)
+
+load_dotenv()
+
+INGEST_JOB_CONCURRENCY = int(os.getenv("INGEST_JOB_CONCURRENCY", "2"))
+# Minimum seconds between progress writes to Mongo for one job.
+PROGRESS_INTERVAL = float(os.getenv("INGEST_PROGRESS_INTERVAL", "1.0"))
+# A running job whose heartbeat is older than this is assumed orphaned by a dead process.
+JOB_STALE_AFTER = float(os.getenv("INGEST_JOB_STALE_AFTER", "300"))
+# Seconds between heartbeats of a running job, independent of progress callbacks.
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("INGEST_JOB_HEARTBEAT_INTERVAL", "30"))
+
+RUNNERS = {
+    "stream": stream_ingest_from_dir,
+    "parallel": parallel_ingest_from_dir,
+    "incremental": incremental_ingest_from_dir,
+}
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class IngestJobManager:
+    """
+    Purpose: Run ingestion jobs in the background with a concurrency cap.
+
+    Job state lives in the ingest_jobs collection, so a restarted process can
+    report finished jobs and re-queue the ones that were queued or running
+    (stream jobs then resume from their per-file checkpoint; parallel jobs
+    remove partly ingested sources when stopped, and skip finished ones).
+    """
+
+    def __init__(self, collection, max_workers: int = INGEST_JOB_CONCURRENCY):
+        self.collection = collection
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._cancel: Dict[str, threading.Event] = {}
+        self._futures: Dict[str, Future] = {}
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="ingest-job"
+                )
+            return self._executor
+
+    def submit(self, path: str, mode: str = "stream") -> Dict[str, Any]:
+        """
+        Purpose: Record a new job and queue it.
+
+        Input: 1. path (str): Directory to ingest.
+               2. mode (str): "stream", "parallel" or "incremental".
+
+        Output: Dict[str, Any]: The job document.
+        """
+        if mode not in RUNNERS:
+            raise ValueError(f"Unsupported ingest mode: {mode}")
+        job = {
+            "_id": uuid.uuid4().hex,
+            "path": path,
+            "mode": mode,
+            "status": "queued",
+            "progress": {"files": 0, "files_total": None, "pages": 0, "chunks": 0, "inserted": 0},
+            "throughput": {"pages_per_sec": 0.0, "chunks_per_sec": 0.0},
+            "result": None,
+            "error": None,
+            "cancel_requested": False,
+            "created_at": _now(),
+            "started_at": None,
+            "heartbeat_at": None,
+            "finished_at": None,
+        }
+        self.collection.insert_one(job)
+        self._enqueue(job["_id"])
+        return job
+
+    def _enqueue(self, job_id: str) -> None:
+        self._cancel[job_id] = threading.Event()
+        self._futures[job_id] = self._pool().submit(self._run, job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({"_id": job_id})
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Purpose: Request cancellation of a queued or running job.
+
+        Input: 1. job_id (str): The job id.
+
+        Output: Optional[Dict[str, Any]]: The updated job, or None if unknown.
+        """
+        job = self.get(job_id)
+        if not job or job["status"] not in ACTIVE_STATUSES:
+            return job
+
+        self.collection.update_one({"_id": job_id}, {"$set": {"cancel_requested": True}})
+        if job_id in self._cancel:
+            self._cancel[job_id].set()
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            # Cancelled before a worker picked it up.
+            self._finish(job_id, "cancelled")
+        elif future is None and job["status"] == "queued":
+            # Queued by another process, which also checks cancel_requested before starting.
+            self._finish(job_id, "cancelled")
+        return self.get(job_id)
+
+    def _run(self, job_id: str) -> None:
+        cancel = self._cancel[job_id]
+        # Claim atomically: with several API workers only one may run a job.
+        job = self.collection.find_one_and_update(
+            {"_id": job_id, "status": "queued", "cancel_requested": False},
+            {"$set": {"status": "running", "started_at": _now(), "heartbeat_at": _now()}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is None:
+            current = self.get(job_id)
+            if current and current["status"] == "queued" and current.get("cancel_requested"):
+                self._finish(job_id, "cancelled")
+            self._cancel.pop(job_id, None)
+            self._futures.pop(job_id, None)
+            return
+
+        started = time.perf_counter()
+        last_write = [0.0]
+
+        def progress(stats: Dict[str, Any]) -> None:
+            elapsed = time.perf_counter() - started
+            if elapsed - last_write[0] < PROGRESS_INTERVAL:
+                return
+            last_write[0] = elapsed
+            self._write_progress(job_id, stats, elapsed)
+            self._check_cancel(job_id, cancel)
+
+        finished = threading.Event()
+        threading.Thread(
+            target=self._heartbeat,
+            args=(job_id, cancel, finished),
+            name=f"ingest-heartbeat-{job_id[:8]}",
+            daemon=True,
+        ).start()
+        try:
+            result = RUNNERS[job["mode"]](job["path"], progress=progress, cancel=cancel)
+        except IngestCancelled:
+            status = "queued" if self._stopping.is_set() else "cancelled"
+            self._finish(job_id, status)
+        except Exception as e:
+            print(f"Ingest job {job_id} failed: {e}")
+            self._finish(job_id, "failed", error=f"{type(e).__name__}: {e}")
+        else:
+            # Incremental runs report their progress counts under "progress".
+            self._write_progress(job_id, result.get("progress", result), time.perf_counter() - started)
+            self._finish(job_id, "succeeded", result=result)
+        finally:
+            finished.set()
+            self._cancel.pop(job_id, None)
+            self._futures.pop(job_id, None)
+
+    def _check_cancel(self, job_id: str, cancel: threading.Event) -> None:
+        # Cancellation may have been requested through another API worker.
+        if self.collection.find_one({"_id": job_id, "cancel_requested": True}, {"_id": 1}):
+            cancel.set()
+
+    def _heartbeat(self, job_id: str, cancel: threading.Event, finished: threading.Event) -> None:
+        """
+        Purpose: Keep a running job's heartbeat fresh on a timer.
+
+        Progress callbacks are throttled and a single large file or embed
+        phase can run for minutes without one, so recover() would otherwise
+        take the job for orphaned and run it twice.
+        """
+        while not finished.wait(JOB_HEARTBEAT_INTERVAL):
+            try:
+                self.collection.update_one(
+                    {"_id": job_id, "status": "running"}, {"$set": {"heartbeat_at": _now()}}
+                )
+                self._check_cancel(job_id, cancel)
+            except Exception as e:
+                print(f"Ingest job {job_id} heartbeat failed: {e}")
+
+    def _write_progress(self, job_id: str, stats: Dict[str, Any], elapsed: float) -> None:
+        progress = {
+            "files": stats.get("files_done", stats.get("files", 0)),
+            "files_total": stats.get("files"),
+            "pages": stats.get("pages", 0),
+            "chunks": stats.get("chunks", 0),
+            "inserted": stats.get("inserted", stats.get("inserted_chunks", 0)),
+        }
+        throughput = {
+            "pages_per_sec": round(progress["pages"] / elapsed, 2) if elapsed else 0.0,
+            "chunks_per_sec": round(progress["chunks"] / elapsed, 2) if elapsed else 0.0,
+        }
+        self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {"progress": progress, "throughput": throughput, "heartbeat_at": _now()}},
+        )
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        update: Dict[str, Any] = {"status": status, "error": error}
+        if status != "queued":
+            update["finished_at"] = _now()
+        if result is not None:
+            update["result"] = result
+        self.collection.update_one({"_id": job_id}, {"$set": update})
+
+    def recover(self) -> int:
+        """
+        Purpose: Re-queue jobs left behind by a previous process: queued jobs,
+                 and running jobs whose heartbeat is older than JOB_STALE_AFTER.
+
+        Output: int: Number of jobs re-queued.
+        """
+        stale = _now() - timedelta(seconds=JOB_STALE_AFTER)
+        jobs = self.collection.find(
+            {
+                "$or": [
+                    {"status": "queued"},
+                    {"status": "running", "heartbeat_at": {"$lt": stale}},
+                ]
+            }
+        )
+        requeued = 0
+        for job in jobs:
+            if job.get("cancel_requested"):
+                self._finish(job["_id"], "cancelled")
+                continue
+            if job["status"] == "running":
+                self.collection.update_one(
+                    {"_id": job["_id"], "heartbeat_at": job["heartbeat_at"]},
+                    {"$set": {"status": "queued"}},
+                )
+            self._enqueue(job["_id"])
+            requeued += 1
+        return requeued
+
+    def shutdown(self) -> None:
+        """Purpose: Stop running jobs at their next batch; they stay queued for recover()."""
+        self._stopping.set()
+        for event in list(self._cancel.values()):
+            event.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+job_manager = IngestJobManager(ingest_jobs_collection)
@@ -0,0 +1,428 @@
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from backend.core.db import chunks_collection
+from backend.services.ingestion import (
+    SNAPSHOT_DIR,
+    build_records,
+    delete_sources,
+    embed_chunks,
+    find_existing_sources,
+    insert_records,
+    make_splitter,
+    split_documents,
+)
+from backend.services.embedding_store import dedupe_ratio
+from backend.services.snapshot import export_snapshot
+
+load_dotenv()
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+# Batches allowed to wait between stages; bounds memory while stages overlap.
+STAGE_QUEUE_SIZE = int(os.getenv("INGEST_STAGE_QUEUE_SIZE", "4"))
+CHECKPOINT_NAME = ".ingest_checkpoint.json"
+# Parse workers are started from a clean server process ("forkserver") or a
+# fresh interpreter ("spawn"), never forked from the API process with its
+# Mongo clients, model weights and running threads.
+INGEST_MP_START_METHOD = os.getenv("INGEST_MP_START_METHOD", "forkserver")
+
+_DONE = object()
+
+
+class IngestCancelled(Exception):
+    """Raised when an ingest run stops because its cancel event was set."""
+
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+def _parse_file(path: str) -> tuple[int, list[Document]]:
+    """
+    Purpose: Load and split one PDF. Runs in a worker process.
+    Input:
+        path (str): PDF path
+    Returns:
+        tuple: Number of pages and the file's chunks
+    """
+    from langchain_community.document_loaders import PyPDFLoader
+
+    pages = PyPDFLoader(path).load()
+    return len(pages), split_documents(pages)
+
+
+def _run_stage(
+    fn: Callable[[Any], Any],
+    inbox: queue.Queue,
+    outbox: Optional[queue.Queue],
+    errors: List[BaseException],
+) -> None:
+    """
+    Purpose: Apply fn to every item of inbox and forward results to outbox.
+
+    After a failure the stage keeps draining its inbox so upstream stages never
+    block on a full queue; the first error is re-raised by the caller.
+    """
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            break
+        if errors:
+            continue
+        try:
+            result = fn(item)
+        except BaseException as e:
+            errors.append(e)
+            continue
+        if outbox is not None:
+            outbox.put(result)
+    if outbox is not None:
+        outbox.put(_DONE)
+
+
+def parallel_ingest_from_dir(
+    path: str,
+    workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, Any]:
+    """
+    Purpose: Ingest a directory of PDFs with overlapping pipeline stages.
+
+        parse + split (process pool) -> embed (batches) -> insert_many
+
+    PDF parsing and splitting run on `workers` processes. Chunks are grouped
+    into batches of `batch_size` for embedding, and each embedded batch is
+    inserted while the next one is being embedded. Sources that already have
+    chunks in Mongo are skipped before parsing.
+    If the run stops early (error or cancel), chunks of sources that were
+    only partly inserted are deleted, so a re-run, which skips sources that
+    have chunks, ingests them again in full.
+    Input:
+        path (str): Path to directory containing documents
+        workers (int): Parser processes (INGEST_WORKERS by default)
+        batch_size (int): Chunks per embedding batch (EMBED_BATCH_SIZE by default)
+        progress (callable): Called with a copy of the running stats after each insert
+        cancel (threading.Event): When set, the run stops and raises IngestCancelled
+    Returns:
+        dict: files, files_done, pages, chunks, inserted, embedded, dedupe_ratio, seconds,
+              pages_per_sec and chunks_per_sec
+    """
+    p = Path(path)
+    if not p.is_dir():
+        raise ValueError("Unsupported file type")
+
+    workers = workers or INGEST_WORKERS
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    started = time.perf_counter()
+
+    files = sorted(str(f) for f in p.glob("*.pdf"))
+    existing = find_existing_sources(set(files)) if files else set()
+    if existing:
+        print(f"Skipping already ingested sources: {existing}")
+    files = [f for f in files if f not in existing]
+
+    stats = {"files": len(files), "files_done": 0, "pages": 0, "chunks": 0, "inserted": 0}
+    counters: Dict[str, int] = {}
+
+    def embed(batch: list[Document]) -> list[dict]:
+        vectors = embed_chunks(batch, counters=counters)
+        return build_records(batch, vectors)
+
+    # Chunks per source: expected once parsed, and inserted so far.
+    expected: Dict[str, int] = {}
+    inserted_by_source: Dict[str, int] = {}
+
+    def insert(records: list[dict]) -> None:
+        stats["inserted"] += insert_records(records)
+        for r in records:
+            source = r["metadata"]["source"]
+            inserted_by_source[source] = inserted_by_source.get(source, 0) + 1
+        if progress:
+            progress(dict(stats))
+
+    errors: List[BaseException] = []
+    embed_q: queue.Queue = queue.Queue(maxsize=STAGE_QUEUE_SIZE)
+    insert_q: queue.Queue = queue.Queue(maxsize=STAGE_QUEUE_SIZE)
+    stages = [
+        threading.Thread(target=_run_stage, args=(embed, embed_q, insert_q, errors), daemon=True),
+        threading.Thread(target=_run_stage, args=(insert, insert_q, None, errors), daemon=True),
+    ]
+
+    mp_context = multiprocessing.get_context(INGEST_MP_START_METHOD)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+        parsed = pool.map(_parse_file, files)
+        for t in stages:
+            t.start()
+
+        try:
+            batch: list[Document] = []
+            # map() yields in file order, so doc_index keeps numbering pages
+            # across the whole directory exactly like load_documents.
+            for num_pages, chunks in parsed:
+                if errors or (cancel and cancel.is_set()):
+                    break
+                for c in chunks:
+                    c.metadata["doc_index"] += stats["pages"]
+                for c in chunks:
+                    expected[c.metadata["source"]] = expected.get(c.metadata["source"], 0) + 1
+                stats["files_done"] += 1
+                stats["pages"] += num_pages
+                stats["chunks"] += len(chunks)
+
+                batch.extend(chunks)
+                while len(batch) >= batch_size:
+                    embed_q.put(batch[:batch_size])
+                    batch = batch[batch_size:]
+            else:
+                if batch and not errors:
+                    embed_q.put(batch)
+        finally:
+            embed_q.put(_DONE)
+            for t in stages:
+                t.join()
+            if errors or (cancel and cancel.is_set()):
+                pool.shutdown(cancel_futures=True)
+
+    if errors or (cancel and cancel.is_set()):
+        partial = [s for s, n in inserted_by_source.items() if n < expected.get(s, 0)]
+        if partial:
+            removed = delete_sources(partial)
+            print(f"Removed {removed} chunks of partly ingested sources: {partial}")
+    if errors:
+        raise errors[0]
+    if cancel and cancel.is_set():
+        raise IngestCancelled(f"Ingest of {path} cancelled")
+
+    seconds = time.perf_counter() - started
+    stats.update(
+        {
+            "embedded": counters.get("embedded", 0),
+            "dedupe_ratio": dedupe_ratio(counters),
+            "seconds": round(seconds, 3),
+            "pages_per_sec": round(stats["pages"] / seconds, 2) if seconds else 0.0,
+            "chunks_per_sec": round(stats["chunks"] / seconds, 2) if seconds else 0.0,
+        }
+    )
+    print(
+        f"Inserted {stats['inserted']} docs from {stats['files']} files "
+        f"({stats['pages_per_sec']} pages/sec, {stats['chunks_per_sec']} chunks/sec, "
+        f"dedupe ratio {stats['dedupe_ratio']})."
+    )
+
+    if SNAPSHOT_DIR and stats["inserted"]:
+        export_snapshot(chunks_collection, SNAPSHOT_DIR)
+    return stats
+
+
+class IngestCheckpoint:
+    """
+    Purpose: Per-file progress of a streaming ingest run, persisted as JSON.
+
+    A file is "started" once any of its chunks may have reached Mongo and
+    "done" once all of them have been inserted. Every update rewrites the file
+    atomically, so a crash leaves either the old or the new state on disk.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path) as f:
+                self.files = json.load(f).get("files", {})
+
+    def status(self, source: str) -> Optional[str]:
+        return self.files.get(source, {}).get("status")
+
+    def mark(self, source: str, status: str, **info: Any) -> None:
+        with self._lock:
+            self.files[source] = {**self.files.get(source, {}), **info, "status": status}
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w") as f:
+                json.dump({"files": self.files}, f)
+            os.replace(tmp, self.path)
+
+    def remove(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+def _stream_batches(
+    files: List[str],
+    batch_size: int,
+    checkpoint: IngestCheckpoint,
+    stats: Dict[str, Any],
+    page_offset: int = 0,
+) -> Iterator[tuple[list[Document], list[tuple[str, int, int]]]]:
+    """
+    Purpose: Lazily turn PDFs into chunk batches, one page at a time.
+
+    Each batch carries the files whose last chunk is in it (or in an earlier
+    batch), so the insert stage knows when a file is fully stored.
+    """
+    from langchain_community.document_loaders import PyPDFLoader
+
+    splitter = make_splitter()
+    batch: list[Document] = []
+    completed: list[tuple[str, int, int]] = []
+
+    for source in files:
+        checkpoint.mark(source, "started")
+        pages = chunks = 0
+        for page in PyPDFLoader(source).lazy_load():
+            for chunk_index, chunk in enumerate(splitter.split_documents([page])):
+                chunk.metadata["doc_index"] = page_offset + stats["pages"]
+                chunk.metadata["chunk_index"] = chunk_index
+                batch.append(chunk)
+                chunks += 1
+                if len(batch) >= batch_size:
+                    yield batch, completed
+                    batch, completed = [], []
+            pages += 1
+            stats["pages"] += 1
+        stats["chunks"] += chunks
+        completed.append((source, pages, chunks))
+
+    if batch or completed:
+        yield batch, completed
+
+
+def stream_ingest_from_dir(
+    path: str,
+    batch_size: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    checkpoint_path: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, Any]:
+    """
+    Purpose: Ingest a directory with constant memory and resumable progress.
+
+        pages (generator) -> chunk batches -> embed -> insert_many
+
+    Pages are read lazily and stages are connected by queues holding at most
+    `queue_size` batches, so memory does not grow with the corpus. Progress is
+    checkpointed per file: a re-run skips finished files and re-ingests a file
+    that was interrupted after deleting its partial chunks. The checkpoint is
+    removed once a run completes.
+    Input:
+        path (str): Path to directory containing documents
+        batch_size (int): Chunks per embedding batch (EMBED_BATCH_SIZE by default)
+        queue_size (int): Batches buffered between stages (INGEST_STAGE_QUEUE_SIZE by default)
+        checkpoint_path (str): Checkpoint file (<path>/.ingest_checkpoint.json by default)
+        progress (callable): Called with a copy of the running stats after each insert
+        cancel (threading.Event): When set, the run stops after the batches already
+            queued and raises IngestCancelled; the checkpoint is kept for resuming
+    Returns:
+        dict: files, files_done, resumed, pages, chunks, inserted, embedded, dedupe_ratio, seconds,
+              pages_per_sec and chunks_per_sec
+    """
+    p = Path(path)
+    if not p.is_dir():
+        raise ValueError("Unsupported file type")
+
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    queue_size = queue_size or STAGE_QUEUE_SIZE
+    checkpoint = IngestCheckpoint(checkpoint_path or str(p / CHECKPOINT_NAME))
+    started = time.perf_counter()
+
+    files = sorted(str(f) for f in p.glob("*.pdf"))
+    files = [f for f in files if checkpoint.status(f) != "done"]
+
+    # Files interrupted mid-way lose their partial chunks and are redone.
+    interrupted = [f for f in files if checkpoint.status(f) == "started"]
+    if interrupted:
+        print(f"Resuming interrupted sources: {interrupted}")
+        chunks_collection.delete_many({"metadata.source": {"$in": interrupted}})
+
+    existing = find_existing_sources(set(files)) if files else set()
+    if existing:
+        print(f"Skipping already ingested sources: {existing}")
+    files = [f for f in files if f not in existing]
+
+    stats = {
+        "files": len(files),
+        "files_done": 0,
+        "resumed": len(interrupted),
+        "pages": 0,
+        "chunks": 0,
+        "inserted": 0,
+    }
+    counters: Dict[str, int] = {}
+
+    def embed(item):
+        batch, completed = item
+        if not batch:
+            return [], completed
+        vectors = embed_chunks(batch, counters=counters)
+        return build_records(batch, vectors), completed
+
+    def insert(item) -> None:
+        records, completed = item
+        stats["inserted"] += insert_records(records)
+        for source, pages, chunks in completed:
+            checkpoint.mark(source, "done", pages=pages, chunks=chunks)
+            stats["files_done"] += 1
+        if progress:
+            progress(dict(stats))
+
+    errors: List[BaseException] = []
+    embed_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    insert_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    stages = [
+        threading.Thread(target=_run_stage, args=(embed, embed_q, insert_q, errors), daemon=True),
+        threading.Thread(target=_run_stage, args=(insert, insert_q, None, errors), daemon=True),
+    ]
+    for t in stages:
+        t.start()
+
+    try:
+        # Pages of files finished by an earlier, interrupted run keep their doc_index.
+        page_offset = sum(
+            info.get("pages", 0) for info in checkpoint.files.values() if info["status"] == "done"
+        )
+        for item in _stream_batches(files, batch_size, checkpoint, stats, page_offset):
+            if errors or (cancel and cancel.is_set()):
+                break
+            embed_q.put(item)
+    finally:
+        embed_q.put(_DONE)
+        for t in stages:
+            t.join()
+
+    if errors:
+        raise errors[0]
+    if cancel and cancel.is_set():
+        raise IngestCancelled(f"Ingest of {path} cancelled")
+    checkpoint.remove()
+
+    seconds = time.perf_counter() - started
+    stats.update(
+        {
+            "embedded": counters.get("embedded", 0),
+            "dedupe_ratio": dedupe_ratio(counters),
+            "seconds": round(seconds, 3),
+            "pages_per_sec": round(stats["pages"] / seconds, 2) if seconds else 0.0,
+            "chunks_per_sec": round(stats["chunks"] / seconds, 2) if seconds else 0.0,
+        }
+    )
+    print(
+        f"Inserted {stats['inserted']} docs from {stats['files']} files "
+        f"({stats['pages_per_sec']} pages/sec, {stats['chunks_per_sec']} chunks/sec, "
+        f"dedupe ratio {stats['dedupe_ratio']})."
+    )
+
+    if SNAPSHOT_DIR and stats["inserted"]:
+        export_snapshot(chunks_collection, SNAPSHOT_DIR)
+    return stats
@@ -1,18 +1,29 @@
 import os
 from pathlib import Path
 from langchain_core.documents import Document
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from dotenv import load_dotenv
-from backend.core.db import get_mongodb_client
 
-from backend.core.db import chunks_collection
+from backend.core.db import chunks_collection, embedding_store_collection
+from backend.core.registry import EMBEDDING_MODEL_ID
+from backend.services.answer_cache import answer_cache
+from backend.services.embedding_service import get_embedder
+from backend.services.embedding_store import EmbeddingStore, dedupe_ratio
+from backend.services.snapshot import export_snapshot
+from backend.services.vector_storage import encode_vector
 
 load_dotenv()
 
-client = get_mongodb_client(os.getenv("MONGODB_ATLAS_URI"))
+# Content-addressed chunk embeddings, reused across batches, files and runs.
+EMBEDDING_STORE = os.getenv("EMBEDDING_STORE", "on")  # "on" or "off"
+embedding_store = (
+    EmbeddingStore(embedding_store_collection, EMBEDDING_MODEL_ID)
+    if EMBEDDING_STORE != "off"
+    else None
+)
 
+# When set, every ingest run that inserts chunks publishes a new corpus snapshot here.
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR")
 
 def load_documents(file_path: str) -> list:
     """
@@ -24,6 +35,8 @@ def load_documents(file_path: str) -> list:
     Returns:
         list: List of documents
     """
+    from langchain_community.document_loaders import PyPDFLoader
+
     p = Path(file_path)
     if p.is_dir():
         docs = []
@@ -35,6 +48,21 @@ def load_documents(file_path: str) -> list:
         raise ValueError("Unsupported file type")
 
 
+def make_splitter() -> RecursiveCharacterTextSplitter:
+    """
+    Purpose: Build the text splitter shared by every ingestion path
+
+    Returns:
+        RecursiveCharacterTextSplitter: 1024-char chunks with 128-char overlap
+    """
+    return RecursiveCharacterTextSplitter(
+        chunk_size=1024,
+        chunk_overlap=128,
+        length_function=len,
+        is_separator_regex=False,
+    )
+
+
 def split_documents(docs: list) -> list[Document]:
     """
     Purpose: Splits documents into chunks
@@ -45,12 +73,7 @@ def split_documents(docs: list) -> list[Document]:
     Returns:
         list: List of split documents
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1024,
-        chunk_overlap=128,
-        length_function=len,
-        is_separator_regex=False,
-    )
+    splitter = make_splitter()
 
     all_chunks = []
     for doc_index, doc in enumerate(docs):
@@ -63,6 +86,102 @@ def split_documents(docs: list) -> list[Document]:
     return all_chunks
 
 
+def find_existing_sources(sources: set[str]) -> set[str]:
+    """
+    Purpose: Ask Mongo which of the given sources already have chunks
+    Input:
+        sources (set): Source paths
+    Returns:
+        set: The sources that are already ingested
+    """
+    return set(
+        chunks_collection.distinct(
+            "metadata.source",
+            {"metadata.source": {"$in": list(sources)}},
+        )
+    )
+
+
+def embed_chunks(
+    chunks: list[Document], embeddings=None, counters: dict | None = None
+) -> list[list[float]]:
+    """
+    Purpose: Embed chunk texts, going through the embedding store when enabled
+    Input:
+        chunks (list): List of split documents
+        embeddings: Model with embed_documents() (the shared batching embedder by default)
+        counters (dict): Accumulates "texts" and "embedded" for dedupe reporting
+    Returns:
+        list: One embedding per chunk
+    """
+    texts = [c.page_content for c in chunks]
+    embeddings = embeddings or get_embedder()
+    if embedding_store:
+        return embedding_store.embed_documents(texts, embeddings, counters)
+
+    if counters is not None:
+        counters["texts"] = counters.get("texts", 0) + len(texts)
+        counters["embedded"] = counters.get("embedded", 0) + len(texts)
+    return embeddings.embed_documents(texts)
+
+
+def build_records(chunks: list[Document], vectors: list[list[float]]) -> list[dict]:
+    """
+    Purpose: Build Mongo records from chunks and their embeddings
+    Input:
+        chunks (list): List of split documents
+        vectors (list): One embedding per chunk, stored as EMBEDDING_STORAGE
+    Returns:
+        list: Records ready for insert_many
+    """
+    records = []
+    for doc, vec in zip(chunks, vectors):
+        records.append(
+            {
+                "text": doc.page_content,
+                "metadata": doc.metadata,
+                "embedding": encode_vector(vec),
+            }
+        )
+    return records
+
+
+def insert_records(records: list[dict], invalidate: bool = True) -> int:
+    """
+    Purpose: Insert records and invalidate cached answers built from their sources
+    Input:
+        records (list): Records built by build_records
+        invalidate (bool): Invalidate cached answers for the records' sources
+    Returns:
+        int: Number of documents inserted
+    """
+    if not records:
+        return 0
+    res = chunks_collection.insert_many(records)
+
+    # Cached answers built from these sources are now stale
+    if invalidate and answer_cache:
+        answer_cache.invalidate_sources({r["metadata"]["source"] for r in records})
+    return len(res.inserted_ids)
+
+
+def delete_sources(sources) -> int:
+    """
+    Purpose: Delete every chunk of the given sources and invalidate cached answers built from them
+    Input:
+        sources (Iterable[str]): Source paths
+    Returns:
+        int: Number of chunks deleted
+    """
+    sources = list(sources)
+    if not sources:
+        return 0
+    deleted = chunks_collection.delete_many({"metadata.source": {"$in": sources}}).deleted_count
+    if answer_cache:
+        answer_cache.invalidate_sources(sources)
+    return deleted
+
+
 def ingest_chunks(chunks: list[Document]) -> int:
     """
     Purpose: Ingests documents to MongoDB
@@ -75,12 +194,7 @@ def ingest_chunks(chunks: list[Document]) -> int:
     sources_in_batch = {c.metadata["source"] for c in chunks}
 
     # 1) Ask Mongo which of these sources already exist
-    existing_sources = set(
-        chunks_collection.distinct(
-            "metadata.source",
-            {"metadata.source": {"$in": list(sources_in_batch)}},
-        )
-    )
+    existing_sources = find_existing_sources(sources_in_batch)
 
     # 2) Filter chunks to only *new* sources
     if existing_sources:
@@ -92,27 +206,19 @@ def ingest_chunks(chunks: list[Document]) -> int:
         return 0
 
     # 3) Build embeddings
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
-    texts = [c.page_content for c in chunks]
-    vectors = embeddings.embed_documents(texts)
+    counters: dict = {}
+    vectors = embed_chunks(chunks, counters=counters)
 
     # 4) Build Mongo records
-    records = []
-    for doc, vec in zip(chunks, vectors):
-        records.append(
-            {
-                "text": doc.page_content,
-                "metadata": doc.metadata,
-                "embedding": vec,
-            }
-        )
+    records = build_records(chunks, vectors)
 
     # 5) Insert only new ones
-    res = chunks_collection.insert_many(records)
-    inserted = len(res.inserted_ids)
-    print(f"Inserted {inserted} docs into MongoDB Atlas.")
+    inserted = insert_records(records)
+    print(
+        f"Inserted {inserted} docs into MongoDB Atlas "
+        f"(embedded {counters['embedded']} of {counters['texts']} texts, "
+        f"dedupe ratio {dedupe_ratio(counters)})."
+    )
     return inserted
 
 
@@ -126,4 +232,7 @@ def full_ingest_from_dir(path: str) -> int:
     """
     docs = load_documents(path)
     chunks = split_documents(docs)
-    return ingest_chunks(chunks)
\ No newline at end of file
+    inserted = ingest_chunks(chunks)
+    if SNAPSHOT_DIR and inserted:
+        export_snapshot(chunks_collection, SNAPSHOT_DIR)
+    return inserted
@@ -0,0 +1,168 @@
+import os
+import random
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from backend.services.embedding_service import get_embedder
+from backend.services.qa import NO_CONTEXT_ANSWER
+
+load_dotenv()
+
+# Local, CPU-only answer scoring ahead of the LLM judge:
+#   "off"    - every answer goes to the judge
+#   "shadow" - score locally, still judge everything, and track agreement
+#   "on"     - answers scoring outside [PRE_EVAL_LOW, PRE_EVAL_HIGH] skip the judge
+PRE_EVAL_MODE = os.getenv("PRE_EVAL_MODE", "off")
+# Keep PRE_EVAL_LOW < EVAL_THRESHOLD <= PRE_EVAL_HIGH so a local decision routes
+# the answer the same way as a judge score on the same side of the threshold.
+PRE_EVAL_LOW = float(os.getenv("PRE_EVAL_LOW", "0.35"))
+PRE_EVAL_HIGH = float(os.getenv("PRE_EVAL_HIGH", "0.75"))
+# Share of locally decided answers still sent to the judge in "on" mode, to keep measuring agreement.
+PRE_EVAL_AUDIT_RATE = float(os.getenv("PRE_EVAL_AUDIT_RATE", "0.05"))
+# Longest the local scoring may take before the answer goes to the judge instead.
+PRE_EVAL_TIMEOUT = float(os.getenv("PRE_EVAL_TIMEOUT", "2"))
+PRE_EVAL_MAX_SENTENCES = 12
+
+# Feature weights; they sum to 1 so the score stays in [0, 1].
+LEXICAL_WEIGHT = 0.35
+SEMANTIC_WEIGHT = 0.45
+RETRIEVAL_WEIGHT = 0.2
+
+STOPWORDS = {
+    "the", "and", "for", "are", "but", "not", "you", "all", "any", "can", "has", "have",
+    "was", "were", "this", "that", "with", "from", "they", "their", "there", "which",
+    "what", "when", "where", "who", "how", "its", "into", "than", "then", "also", "such",
+    "these", "those", "been", "being", "will", "would", "could", "should", "may", "might",
+    "more", "most", "some", "other", "each", "about", "over", "only", "our", "your",
+}
+
+pre_eval_stats = {
+    "scored": 0,
+    "decided_good": 0,  # At or above PRE_EVAL_HIGH
+    "decided_bad": 0,  # At or below PRE_EVAL_LOW
+    "uncertain": 0,  # Inside the band: the judge decides
+    "compared": 0,  # Local decisions the judge also scored (shadow mode or audits)
+    "agreed": 0,  # ...where the judge scored on the verdict's side of EVAL_THRESHOLD
+    "abs_error_sum": 0.0,
+}
+_lock = threading.Lock()
+
+
+def content_words(text: str) -> set:
+    return {w for w in re.findall(r"[a-z0-9]+", text.lower()) if len(w) > 2 and w not in STOPWORDS}
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", text) if len(s.strip()) > 3]
+    return sentences[:PRE_EVAL_MAX_SENTENCES]
+
+
+def evidence_texts(items: List[Dict[str, Any]]) -> List[str]:
+    """Purpose: Text of each source item (RAG "snippet" or web "content")."""
+    return [t for t in ((it.get("snippet") or it.get("content") or "") for it in items) if t.strip()]
+
+
+async def local_score(answer: str, items: List[Dict[str, Any]], top_score: float) -> Dict[str, float]:
+    """
+    Purpose: Score how well an answer is supported by its evidence, without an LLM.
+
+    Features: lexical support (share of the answer's content words found in
+    the evidence), semantic support (mean over answer sentences of the best
+    cosine similarity to an evidence text, one batched embedding call) and
+    the retrieval top score. A missing or "nothing found" answer scores 0.
+
+    Input: 1. answer (str): Candidate answer.
+           2. items (List[Dict[str, Any]]): Source items the answer was built from.
+           3. top_score (float): Best retrieval (or web) score.
+
+    Output: Dict[str, float]: "lexical", "semantic", "retrieval" and the weighted "score".
+    """
+    evidence = evidence_texts(items)
+    sentences = split_sentences(answer or "")
+    if not evidence or not sentences or answer.strip() == NO_CONTEXT_ANSWER:
+        return {"lexical": 0.0, "semantic": 0.0, "retrieval": float(top_score), "score": 0.0}
+
+    words = content_words(answer)
+    evidence_words = set().union(*(content_words(t) for t in evidence))
+    lexical = len(words & evidence_words) / len(words) if words else 0.0
+
+    vectors = np.asarray(await get_embedder().aembed_documents(sentences + evidence), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+    sims = vectors[: len(sentences)] @ vectors[len(sentences) :].T
+    semantic = float(np.clip(sims.max(axis=1), 0.0, 1.0).mean())
+
+    retrieval = float(np.clip(top_score, 0.0, 1.0))
+    score = LEXICAL_WEIGHT * lexical + SEMANTIC_WEIGHT * semantic + RETRIEVAL_WEIGHT * retrieval
+    return {
+        "lexical": round(lexical, 4),
+        "semantic": round(semantic, 4),
+        "retrieval": round(retrieval, 4),
+        "score": round(score, 4),
+    }
+
+
+def classify(score: float) -> Optional[str]:
+    """
+    Purpose: Decide clear-cut cases locally.
+
+    Input: 1. score (float): local_score()["score"].
+
+    Output: Optional[str]: "good", "bad", or None when the judge should decide.
+    """
+    if score >= PRE_EVAL_HIGH:
+        verdict = "good"
+    elif score <= PRE_EVAL_LOW:
+        verdict = "bad"
+    else:
+        verdict = None
+    with _lock:
+        pre_eval_stats["scored"] += 1
+        pre_eval_stats[f"decided_{verdict}" if verdict else "uncertain"] += 1
+    return verdict
+
+
+def skip_judge(verdict: Optional[str]) -> bool:
+    """Purpose: Whether a verdict replaces the judge call (PRE_EVAL_MODE=on, not sampled for audit)."""
+    return PRE_EVAL_MODE == "on" and verdict is not None and random.random() >= PRE_EVAL_AUDIT_RATE
+
+
+def record_agreement(verdict: str, local: float, judge: float, threshold: float) -> None:
+    """
+    Purpose: Compare a local decision with the judge's score for the same answer.
+
+    Input: 1. verdict (str): classify() result, "good" or "bad".
+           2. local (float): Local score.
+           3. judge (float): LLM judge score.
+           4. threshold (float): EVAL_THRESHOLD; the judge agrees with "good"
+              when it scores at or above it, and with "bad" when below.
+    """
+    with _lock:
+        pre_eval_stats["compared"] += 1
+        pre_eval_stats["agreed"] += int((verdict == "good") == (judge >= threshold))
+        pre_eval_stats["abs_error_sum"] += abs(local - judge)
+
+
+def get_pre_eval_stats() -> Dict[str, Any]:
+    """
+    Purpose: Snapshot of the pre-evaluator counters.
+
+    Output: Dict[str, Any]: Counters plus "agreement" (share of compared local
+            decisions the judge agreed with) and "mean_abs_error".
+    """
+    with _lock:
+        stats = dict(pre_eval_stats)
+    compared = stats.pop("compared")
+    agreed = stats.pop("agreed")
+    abs_error_sum = stats.pop("abs_error_sum")
+    return {
+        **stats,
+        "mode": PRE_EVAL_MODE,
+        "band": [PRE_EVAL_LOW, PRE_EVAL_HIGH],
+        "compared": compared,
+        "agreement": round(agreed / compared, 4) if compared else None,
+        "mean_abs_error": round(abs_error_sum / compared, 4) if compared else None,
+    }
@@ -1,56 +1,55 @@
+import asyncio
 import os
-from typing import List, Dict, Any
+import time
+from operator import itemgetter
+from typing import AsyncIterator, List, Dict, Any, Tuple
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough
-from backend.services.retrieval import search_chunks
-
+from langchain_core.runnables import RunnableLambda
+from backend.core.cache import normalize_text
+from backend.core.limits import RateLimiter
+from backend.core.metrics import histogram
+from backend.core.registry import aget, get_chat_model, get_or_create
+from backend.services.answer_cache import answer_cache
+from backend.services.context_packing import CONTEXT_TOKEN_BUDGET, chunk_passages, pack_passages
+from backend.services.retrieval import aembed_queries, asearch_by_vector, asearch_chunks, search_chunks
 
 load_dotenv()
 
-api_key = os.getenv("GROQ_API_KEY")
+# Per-batch bounds for /qa/batch: concurrent vector searches, concurrent LLM
+# generations, and LLM calls per second (0 = no rate limit).
+QA_BATCH_SEARCH_CONCURRENCY = int(os.getenv("QA_BATCH_SEARCH_CONCURRENCY", "32"))
+QA_BATCH_CONCURRENCY = int(os.getenv("QA_BATCH_CONCURRENCY", "8"))
+QA_BATCH_RATE = float(os.getenv("QA_BATCH_RATE", "0"))
 
-llm = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    api_key=api_key,
-    temperature=0,
-    max_retries=2,
-)
+NO_CONTEXT_ANSWER = "I couldn't find anything relevant in the knowledge base."
+
+# Time from request start to the sources event and to the first answer token.
+sources_latency = histogram("qa.sources_ms")
+ttft = histogram("qa.ttft_ms")
+stream_latency = histogram("qa.stream_total_ms")
 
 
 def build_context(chunks: List[Dict[str, Any]]) -> str:
     """
     Purpose: Build a context string from a list of chunks.
 
+    Neighbouring chunks of the same page are merged without their overlap,
+    near-duplicates are dropped and the rest is packed by score into
+    CONTEXT_TOKEN_BUDGET (see pack_passages).
+
     Input: 1. chunks (List[Dict[str, Any]]): A list of chunks with their metadata and text.
 
     Output: str: A string containing the context.
     """
+    passages, _ = pack_passages(chunk_passages(chunks), CONTEXT_TOKEN_BUDGET, "context")
     parts = []
-    for i, c in enumerate(chunks, start=1):
-        meta = c.get("metadata", {})
-        src = meta.get("source")
-        page = meta.get("page")
-        parts.append(f"[Chunk {i} | source={src}, page={page}]\n{c['text']}\n")
+    for i, p in enumerate(passages, start=1):
+        parts.append(f"[Chunk {i} | source={p['source']}, page={p['page']}]\n{p['text']}\n")
     return "\n\n".join(parts)
 
 
-def retriever(question: str, k: int = 5) -> List[Dict[str, Any]]:
-    """
-    Purpose: Retrieve top-k chunks from MongoDB Atlas.
-
-    Input: 1. question (str): The question to search for.
-           2. k (int): The number of chunks to retrieve.
-
-    Output: List[Dict[str, Any]]: A list of chunks with their metadata and text.
-    """
-    return search_chunks(question, k=k)
-
-
-retriever = RunnableLambda(retriever)
-
 context_builder = RunnableLambda(build_context)
 
 prompt = ChatPromptTemplate.from_messages(
@@ -70,15 +69,30 @@ prompt = ChatPromptTemplate.from_messages(
 
 parser = StrOutputParser()
 
-chain = (
-    {
-        "context": retriever | context_builder,
-        "question": RunnablePassthrough(),
-    }
-    | prompt
-    | llm
-    | parser
-)
+
+def get_chain():
+    """
+    Purpose: Build (once) the answer chain; the Groq client is created on first use.
+
+    The chain takes already-retrieved chunks ({"question", "chunks"}) so that a
+    question is embedded and searched exactly once per request.
+
+    Output: Runnable: prompt | llm | parser over {"question", "chunks"}.
+    """
+
+    def build():
+        llm = get_chat_model("qa")
+        return (
+            {
+                "context": itemgetter("chunks") | context_builder,
+                "question": itemgetter("question"),
+            }
+            | prompt
+            | llm
+            | parser
+        )
+
+    return get_or_create("qa_chain", build)
 
 
 def extract_sources_from_chunks(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -108,6 +122,34 @@ def extract_sources_from_chunks(chunks: List[Dict[str, Any]]) -> List[Dict[str,
     return items
 
 
+def generate_answer(question: str, chunks: List[Dict[str, Any]]) -> str:
+    """
+    Purpose: Generate an answer from chunks that were already retrieved.
+
+    Input: 1. question (str): The question to answer.
+           2. chunks (List[Dict[str, Any]]): Chunks returned by search_chunks.
+
+    Output: str: The generated answer.
+    """
+    if not chunks:
+        return NO_CONTEXT_ANSWER
+    return get_chain().invoke({"question": question, "chunks": chunks})
+
+
+async def agenerate_answer(question: str, chunks: List[Dict[str, Any]]) -> str:
+    """
+    Purpose: Async generate_answer; awaits the Groq call with ainvoke.
+
+    Input: 1. question (str): The question to answer.
+           2. chunks (List[Dict[str, Any]]): Chunks returned by search_chunks.
+
+    Output: str: The generated answer.
+    """
+    if not chunks:
+        return NO_CONTEXT_ANSWER
+    return await (await aget(get_chain)).ainvoke({"question": question, "chunks": chunks})
+
+
 def answer_question(question: str, k: int = 5) -> Dict[str, Any]:
     """
     Purpose: Retrieve top-k chunks and generate an answer with OpenAI.
@@ -121,11 +163,52 @@ def answer_question(question: str, k: int = 5) -> Dict[str, Any]:
     chunks = search_chunks(question, k=k)
     items = extract_sources_from_chunks(chunks)
     top_score = items[0]["score"] if items else 0.0
+    answer_text = generate_answer(question, chunks)
 
-    if not chunks:
-        answer_text = "I couldn't find anything relevant in the knowledge base."
-    else:
-        answer_text = chain.invoke(question)
+    return {
+        "type": "rag",
+        "items": items,
+        "top_score": float(top_score),
+        "answer": answer_text,
+    }
+
+
+def cached_answer_question(question: str, k: int = 5) -> Dict[str, Any]:
+    """
+    Purpose: answer_question behind the semantic answer cache.
+
+    Input: 1. question (str): The question to answer.
+           2. k (int): The number of chunks to retrieve.
+
+    Output: Dict[str, Any]: The same structure as answer_question, possibly from the cache.
+    """
+    namespace = f"qa:k={k}"
+    if answer_cache:
+        cached = answer_cache.lookup(question, namespace)
+        if cached:
+            return cached
+
+    result = answer_question(question, k=k)
+    if answer_cache and result["items"]:
+        answer_cache.store_result(
+            question, namespace, result, [it["source"] for it in result["items"]]
+        )
+    return result
+
+
+async def aanswer_question(question: str, k: int = 5) -> Dict[str, Any]:
+    """
+    Purpose: Async answer_question: async retrieval, then ainvoke on the answer chain.
+
+    Input: 1. question (str): The question to answer.
+           2. k (int): The number of chunks to retrieve.
+
+    Output: Dict[str, Any]: The same structure as answer_question.
+    """
+    chunks = await asearch_chunks(question, k=k)
+    items = extract_sources_from_chunks(chunks)
+    top_score = items[0]["score"] if items else 0.0
+    answer_text = await agenerate_answer(question, chunks)
 
     return {
         "type": "rag",
@@ -133,3 +216,196 @@ def answer_question(question: str, k: int = 5) -> Dict[str, Any]:
         "top_score": float(top_score),
         "answer": answer_text,
     }
+
+
+async def acached_answer_question(question: str, k: int = 5) -> Dict[str, Any]:
+    """
+    Purpose: Async cached_answer_question, used by the /qa endpoints.
+
+    Input: 1. question (str): The question to answer.
+           2. k (int): The number of chunks to retrieve.
+
+    Output: Dict[str, Any]: The same structure as answer_question, possibly from the cache.
+    """
+    namespace = f"qa:k={k}"
+    if answer_cache:
+        cached = await answer_cache.alookup(question, namespace)
+        if cached:
+            return cached
+
+    result = await aanswer_question(question, k=k)
+    if answer_cache and result["items"]:
+        await answer_cache.astore_result(
+            question, namespace, result, [it["source"] for it in result["items"]]
+        )
+    return result
+
+
+async def astream_answer(question: str, k: int = 5) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Purpose: Stream a RAG answer: sources as soon as retrieval completes, then
+             answer tokens as the chain produces them.
+
+    Answer-cache hits are replayed as a single token. Records the qa.sources_ms,
+    qa.ttft_ms and qa.stream_total_ms histograms.
+
+    Input: 1. question (str): The question to answer.
+           2. k (int): The number of chunks to retrieve.
+
+    Output: AsyncIterator[Tuple[str, Dict[str, Any]]]: ("sources", {items, top_score}),
+            then ("token", {text}) events, then ("done", {answer, cached, ttft_ms}).
+    """
+    started = time.perf_counter()
+    namespace = f"qa:k={k}"
+    cached = await answer_cache.alookup(question, namespace) if answer_cache else None
+    if cached:
+        chunks = None
+        items, top_score = cached["items"], cached["top_score"]
+    else:
+        chunks = await asearch_chunks(question, k=k)
+        items = extract_sources_from_chunks(chunks)
+        top_score = float(items[0]["score"]) if items else 0.0
+    sources_latency.observe((time.perf_counter() - started) * 1000)
+    yield "sources", {"items": items, "top_score": top_score}
+
+    first_token_ms = None
+    parts: List[str] = []
+    if cached:
+        tokens = _once(cached["answer"])
+    elif not chunks:
+        tokens = _once(NO_CONTEXT_ANSWER)
+    else:
+        tokens = (await aget(get_chain)).astream({"question": question, "chunks": chunks})
+    async for token in tokens:
+        if not token:
+            continue
+        if first_token_ms is None:
+            first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+            ttft.observe(first_token_ms)
+        parts.append(token)
+        yield "token", {"text": token}
+
+    answer = "".join(parts)
+    if answer_cache and not cached and items:
+        result = {"type": "rag", "items": items, "top_score": top_score, "answer": answer}
+        await answer_cache.astore_result(
+            question, namespace, result, [it["source"] for it in items]
+        )
+    stream_latency.observe((time.perf_counter() - started) * 1000)
+    yield "done", {"answer": answer, "cached": bool(cached), "ttft_ms": first_token_ms}
+
+
+async def _once(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def abatch_answer_questions(
+    questions: List[str],
+    k: int = 5,
+    ordered: bool = True,
+    concurrency: int = QA_BATCH_CONCURRENCY,
+    rate: float = QA_BATCH_RATE,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Purpose: Answer many questions at once.
+
+    Questions that normalize to the same text are answered once. All new
+    questions are embedded in one batched call, vector searches run
+    concurrently, and generations are bounded by `concurrency` and `rate`.
+    A failing question yields an error item without affecting the others.
+
+    Input: 1. questions (List[str]): The questions.
+           2. k (int): The number of chunks to retrieve per question.
+           3. ordered (bool): Yield in input order; otherwise as answers complete.
+           4. concurrency (int): Maximum concurrent LLM generations.
+           5. rate (float): Maximum LLM calls per second (0 = unlimited).
+
+    Output: AsyncIterator[Dict[str, Any]]: One item per input question with
+            "index" and "question", plus either "answer", "items", "top_score"
+            and "cached", or "error".
+    """
+    keys = [normalize_text(q) for q in questions]
+    unique: Dict[str, str] = {}
+    indices: Dict[str, List[int]] = {}
+    for i, (key, question) in enumerate(zip(keys, questions)):
+        unique.setdefault(key, question)
+        indices.setdefault(key, []).append(i)
+
+    namespace = f"qa:k={k}"
+    searches = asyncio.Semaphore(QA_BATCH_SEARCH_CONCURRENCY)
+    generations = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate)
+    embedded = asyncio.ensure_future(aembed_queries(list(unique.values())))
+
+    async def answer_one(key: str, position: int) -> Dict[str, Any]:
+        question = unique[key]
+        vector = (await asyncio.shield(embedded))[position]
+        if answer_cache:
+            cached = await answer_cache.alookup(question, namespace)
+            if cached:
+                return {**cached, "cached": True}
+
+        async with searches:
+            chunks = await asearch_by_vector(vector, k=k)
+        items = extract_sources_from_chunks(chunks)
+        async with generations:
+            if chunks:
+                await limiter.acquire()
+            answer = await agenerate_answer(question, chunks)
+
+        result = {
+            "type": "rag",
+            "items": items,
+            "top_score": float(items[0]["score"]) if items else 0.0,
+            "answer": answer,
+        }
+        if answer_cache and items:
+            await answer_cache.astore_result(
+                question, namespace, result, [it["source"] for it in items]
+            )
+        return {**result, "cached": False}
+
+    tasks = {key: asyncio.ensure_future(answer_one(key, n)) for n, key in enumerate(unique)}
+    key_of = {task: key for key, task in tasks.items()}
+
+    def item(i: int, task: asyncio.Future) -> Dict[str, Any]:
+        base = {"index": i, "question": questions[i]}
+        if task.exception() is not None:
+            e = task.exception()
+            return {**base, "error": f"{type(e).__name__}: {e}"}
+        return {**base, **task.result()}
+
+    try:
+        if ordered:
+            for i, key in enumerate(keys):
+                await asyncio.wait([tasks[key]])
+                yield item(i, tasks[key])
+        else:
+            pending = set(tasks.values())
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    for i in indices[key_of[task]]:
+                        yield item(i, task)
+    finally:
+        # Consumer stopped early (e.g. the client disconnected).
+        for task in tasks.values():
+            task.cancel()
+        embedded.cancel()
+
+
+def batch_answer_questions(questions: List[str], k: int = 5, **options) -> List[Dict[str, Any]]:
+    """
+    Purpose: Blocking abatch_answer_questions for scripts (quiz generation, regression sets).
+
+    Input: 1. questions (List[str]): The questions.
+           2. k (int): The number of chunks to retrieve per question.
+           3. options: concurrency and rate, as for abatch_answer_questions.
+
+    Output: List[Dict[str, Any]]: One item per question, in input order.
+    """
+
+    async def collect() -> List[Dict[str, Any]]:
+        return [it async for it in abatch_answer_questions(questions, k=k, ordered=True, **options)]
+
+    return asyncio.run(collect())
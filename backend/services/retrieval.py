@@ -1,14 +1,202 @@
-from typing import List, Dict, Any
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
 
-from langchain_huggingface import HuggingFaceEmbeddings
-from backend.core.db import chunks_collection
+from dotenv import load_dotenv
+from backend.core.cache import TTLCache, normalize_text
+from backend.core.db import async_chunks_collection, chunks_collection
+from backend.core.registry import aget, get_async_mongo_client
+from backend.services.embedding_service import get_embedder
+from backend.services.snapshot import current_version
+from backend.services.vector_index import LocalVectorIndex
+from backend.services.vector_storage import query_vector
 
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+load_dotenv()
+
+# "atlas" runs $vectorSearch in MongoDB Atlas, "local" searches an in-process
+# LocalVectorIndex built from the chunks collection.
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "atlas")
+LOCAL_INDEX_MODE = os.getenv("LOCAL_INDEX_MODE", "exact")  # "exact" or "ivf"
+LOCAL_INDEX_NLIST = int(os.getenv("LOCAL_INDEX_NLIST", "0")) or None
+LOCAL_INDEX_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", "8"))
+LOCAL_INDEX_SNAPSHOT = os.getenv("LOCAL_INDEX_SNAPSHOT")  # Snapshot root to load instead of Mongo
+# Seconds between checks of the snapshot's CURRENT pointer; a newly published
+# version is loaded in the background and swapped in.
+LOCAL_INDEX_RELOAD_INTERVAL = float(os.getenv("LOCAL_INDEX_RELOAD_INTERVAL", "5"))
+
+# Query embeddings keyed by normalized question; size 0 disables the cache.
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "2048"))
+QUERY_EMBED_CACHE_TTL = float(os.getenv("QUERY_EMBED_CACHE_TTL", "3600"))
+
+query_embedding_cache = TTLCache(maxsize=QUERY_EMBED_CACHE_SIZE, ttl=QUERY_EMBED_CACHE_TTL)
+
+_local_index: Optional[LocalVectorIndex] = None
+_local_index_version: Optional[str] = None  # Snapshot version behind _local_index, if any
+_index_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_next_reload_check = 0.0
+
+# Counters for the retrieval hot path. They let callers (and tests) check how
+# many query embeddings and vector-search aggregates a request actually cost.
+search_stats = {"embed_calls": 0, "aggregate_calls": 0, "local_searches": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        search_stats[name] += 1
+
+
+def get_search_stats() -> Dict[str, Any]:
+    """
+    Purpose: Return a snapshot of the retrieval counters.
+
+    Output: Dict[str, Any]: Number of query embeddings and searches run so far,
+            plus the query-embedding cache counters under "query_cache".
+    """
+    with _stats_lock:
+        stats = dict(search_stats)
+    return {**stats, "query_cache": query_embedding_cache.stats()}
+
+
+def reset_search_stats() -> None:
+    """Purpose: Reset the retrieval counters to zero."""
+    with _stats_lock:
+        for name in search_stats:
+            search_stats[name] = 0
+
+
+def embed_query(query: str) -> List[float]:
+    """
+    Purpose: Embed a query, reusing a cached vector for the same normalized text.
+
+    Input: 1. query (str): The query to embed.
+
+    Output: List[float]: The query embedding.
+    """
+    key = normalize_text(query)
+    vec = query_embedding_cache.get(key)
+    if vec is None:
+        vec = get_embedder().embed_query(query)
+        _count("embed_calls")
+        query_embedding_cache.set(key, vec)
+    return vec
+
+
+async def aembed_query(query: str) -> List[float]:
+    """
+    Purpose: Async embed_query; the forward pass runs in the embedder's worker, not on the event loop.
+
+    Input: 1. query (str): The query to embed.
+
+    Output: List[float]: The query embedding.
+    """
+    key = normalize_text(query)
+    vec = query_embedding_cache.get(key)
+    if vec is None:
+        vec = await get_embedder().aembed_query(query)
+        _count("embed_calls")
+        query_embedding_cache.set(key, vec)
+    return vec
+
+
+async def aembed_queries(queries: List[str]) -> List[List[float]]:
+    """
+    Purpose: Embed many queries with one batched call for those not already cached.
+
+    Input: 1. queries (List[str]): The queries to embed.
+
+    Output: List[List[float]]: One embedding per query, in order.
+    """
+    keys = [normalize_text(q) for q in queries]
+    vectors = {key: query_embedding_cache.get(key) for key in keys}
+    missing = {key: q for key, q in zip(keys, queries) if vectors[key] is None}
+    if missing:
+        embedded = await get_embedder().aembed_documents(list(missing.values()))
+        _count("embed_calls")
+        for key, vec in zip(missing, embedded):
+            vectors[key] = vec
+            query_embedding_cache.set(key, vec)
+    return [vectors[key] for key in keys]
+
+
+def set_local_index(index: Optional[LocalVectorIndex]) -> None:
+    """
+    Purpose: Install (or clear, with None) the index used by the "local" backend.
+
+    Input: 1. index (Optional[LocalVectorIndex]): A prebuilt index, e.g. from ingestion records.
+    """
+    global _local_index, _local_index_version
+    with _index_lock:
+        _local_index = index
+        _local_index_version = None  # Installed by hand: never replaced by a snapshot reload
+
+
+def _index_options() -> Dict[str, Any]:
+    return {"mode": LOCAL_INDEX_MODE, "nlist": LOCAL_INDEX_NLIST, "nprobe": LOCAL_INDEX_NPROBE}
+
+
+def _reload_local_index(version: str) -> None:
+    """Purpose: Build the index for a newly published snapshot version and swap it in."""
+    global _local_index, _local_index_version
+    try:
+        index = LocalVectorIndex.from_snapshot(LOCAL_INDEX_SNAPSHOT, version, **_index_options())
+        with _index_lock:
+            if _local_index_version is not None:
+                _local_index, _local_index_version = index, version
+        print(f"Local index reloaded from snapshot {version}.")
+    except Exception as e:
+        print(f"Local index reload from snapshot {version} failed: {e}")
+    finally:
+        _reload_lock.release()
+
+
+def _maybe_reload_local_index() -> None:
+    global _next_reload_check
+    now = time.monotonic()
+    if now < _next_reload_check:
+        return
+    _next_reload_check = now + LOCAL_INDEX_RELOAD_INTERVAL
+    try:
+        version = current_version(LOCAL_INDEX_SNAPSHOT)
+    except OSError:
+        return
+    if version == _local_index_version or not _reload_lock.acquire(blocking=False):
+        return
+    # Queries keep using the current index while the new one is built.
+    threading.Thread(target=_reload_local_index, args=(version,), name="local-index-reload", daemon=True).start()
+
+
+def get_local_index() -> LocalVectorIndex:
+    """
+    Purpose: Return the local index, building it on first use from the
+             LOCAL_INDEX_SNAPSHOT snapshot if set, else from the chunks collection.
+             A snapshot-backed index is rebuilt in the background when CURRENT
+             moves to a new version.
+
+    Output: LocalVectorIndex: The in-process index.
+    """
+    global _local_index, _local_index_version
+    with _index_lock:
+        if _local_index is None:
+            if LOCAL_INDEX_SNAPSHOT:
+                version = current_version(LOCAL_INDEX_SNAPSHOT)
+                _local_index = LocalVectorIndex.from_snapshot(LOCAL_INDEX_SNAPSHOT, version, **_index_options())
+                _local_index_version = version
+            else:
+                _local_index = LocalVectorIndex.from_collection(chunks_collection, **_index_options())
+        index, from_snapshot = _local_index, _local_index_version is not None
+    if from_snapshot:
+        _maybe_reload_local_index()
+    return index
 
 
 def search_chunks(query: str, k: int = 5) -> List[Dict[str, Any]]:
     """
-    Purpose: Embed the query and run a vector search in MongoDB Atlas.
+    Purpose: Embed the query and run a vector search on the configured backend.
 
     Input: 1. query (str): The query to search for.
            2. k (int): The number of chunks to return.
@@ -16,8 +204,80 @@ def search_chunks(query: str, k: int = 5) -> List[Dict[str, Any]]:
     Output: List[Dict[str, Any]]: A list of chunks with their metadata and score.
     """
 
-    query_vec = embeddings.embed_query(query)
+    query_vec = embed_query(query)
+    return search_by_vector(query_vec, k=k)
+
+
+def search_by_vector(query_vec: List[float], k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Purpose: Run a vector search for an already embedded query.
+
+    Input: 1. query_vec (List[float]): The query embedding.
+           2. k (int): The number of chunks to return.
+
+    Output: List[Dict[str, Any]]: A list of chunks with their metadata and score.
+    """
+    if RETRIEVAL_BACKEND == "local":
+        results = get_local_index().search(query_vec, k=k)
+        _count("local_searches")
+        return _drop_expired(results)
+
+    results = list(chunks_collection.aggregate(_search_pipeline(query_vec, k)))
+    _count("aggregate_calls")
+    return _drop_expired(results)
+
+
+async def asearch_chunks(query: str, k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Purpose: Async search_chunks for the async serving path.
 
+    Input: 1. query (str): The query to search for.
+           2. k (int): The number of chunks to return.
+
+    Output: List[Dict[str, Any]]: A list of chunks with their metadata and score.
+    """
+    query_vec = await aembed_query(query)
+    return await asearch_by_vector(query_vec, k=k)
+
+
+async def asearch_by_vector(query_vec: List[float], k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Purpose: Async search_by_vector: the Atlas aggregate goes through the async
+             Mongo driver, a local index search runs in a worker thread.
+
+    Input: 1. query_vec (List[float]): The query embedding.
+           2. k (int): The number of chunks to return.
+
+    Output: List[Dict[str, Any]]: A list of chunks with their metadata and score.
+    """
+    if RETRIEVAL_BACKEND == "local":
+        return await asyncio.to_thread(search_by_vector, query_vec, k)
+
+    await aget(get_async_mongo_client)  # First use imports and builds the client off the loop
+    cursor = await async_chunks_collection.aggregate(_search_pipeline(query_vec, k))
+    results = await cursor.to_list(length=None)
+    _count("aggregate_calls")
+    return _drop_expired(results)
+
+
+def _drop_expired(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Written-back web chunks carry metadata.expires_at (a datetime from Mongo,
+    # an ISO string from a snapshot); hide them once expired, before GC runs.
+    now = datetime.now(timezone.utc)
+    live = []
+    for r in results:
+        expires_at = r.get("metadata", {}).get("expires_at")
+        if isinstance(expires_at, str):
+            expires_at = datetime.fromisoformat(expires_at)
+        if expires_at is not None and expires_at.tzinfo is None:
+            # pymongo returns naive UTC datetimes by default.
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at is None or expires_at > now:
+            live.append(r)
+    return live
+
+
+def _search_pipeline(query_vec: List[float], k: int) -> List[Dict[str, Any]]:
     # Create a pipeline to search for the query in the chunks collection
     # The pipeline is a list of stages that are executed in order
     # The $vectorSearch stage is used to perform the vector search
@@ -27,7 +287,7 @@ def search_chunks(query: str, k: int = 5) -> List[Dict[str, Any]]:
             "$vectorSearch": {
                 "index": "smarttutor_chunks_index",  # The Vector Search index name configured in Atlas
                 "path": "embedding",  # The field name in the document that contains the embedding vector
-                "queryVector": query_vec,
+                "queryVector": query_vector(query_vec),  # Same encoding as the stored vectors
                 "numCandidates": 100,  # The number of documents to consider before ranking and returning for the search
                 "limit": k,  # The number of documents to return
             }
@@ -43,6 +303,4 @@ def search_chunks(query: str, k: int = 5) -> List[Dict[str, Any]]:
             }
         },
     ]
-
-    results = list(chunks_collection.aggregate(pipeline))
-    return results
+    return pipeline
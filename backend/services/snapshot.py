@@ -0,0 +1,369 @@
+"""
+On-disk corpus snapshots.
+
+A snapshot root holds numbered versions plus a CURRENT pointer:
+
+    <root>/CURRENT              name of the published version, e.g. "v000003"
+    <root>/v000003/manifest.json
+                  /embeddings.npy  (n, dim) float32 or int8 matrix
+                  /text.bin        UTF-8 chunk texts, back to back
+                  /text_offsets.npy (n + 1) int64 byte offsets into text.bin
+                  /meta.bin        JSON metadata per chunk, back to back
+                  /meta_offsets.npy (n + 1) int64 byte offsets into meta.bin
+
+Every file is opened with mmap, so worker processes reading the same version
+share one page-cache copy. A version directory is written under a temporary
+name, renamed into a version name claimed with an exclusive mkdir, and only
+then made current by atomically replacing CURRENT.
+"""
+
+import argparse
+import fcntl
+import json
+import mmap
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from backend.services.vector_storage import decode_vector, encode_vector
+
+FORMAT_VERSION = 1
+INT8_SCALE = 127.0
+
+
+class CorpusSnapshot:
+    """
+    Purpose: Read-only, memory-mapped view of one snapshot version.
+
+    Supports len() and indexing; snapshot[i] returns {"text", "metadata"} so a
+    snapshot can back a LocalVectorIndex without copying the texts.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        with open(self.path / "manifest.json") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {self.path}")
+
+        self.embeddings = np.load(self.path / "embeddings.npy", mmap_mode="r")
+        self.text_offsets = np.load(self.path / "text_offsets.npy", mmap_mode="r")
+        self.meta_offsets = np.load(self.path / "meta_offsets.npy", mmap_mode="r")
+        self._text = _map(self.path / "text.bin")
+        self._meta = _map(self.path / "meta.bin")
+
+    @classmethod
+    def open(cls, root: str, version: Optional[str] = None) -> "CorpusSnapshot":
+        """
+        Purpose: Open a snapshot version (the CURRENT one by default).
+
+        Input: 1. root (str): Snapshot root directory.
+               2. version (Optional[str]): Version directory name, e.g. "v000003".
+
+        Output: CorpusSnapshot: The opened snapshot.
+        """
+        return cls(str(Path(root) / (version or current_version(root))))
+
+    def __len__(self) -> int:
+        return int(self.manifest["count"])
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        return {"text": self.text(i), "metadata": self.metadata(i)}
+
+    def text(self, i: int) -> str:
+        start, end = int(self.text_offsets[i]), int(self.text_offsets[i + 1])
+        return self._text[start:end].decode("utf-8")
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        start, end = int(self.meta_offsets[i]), int(self.meta_offsets[i + 1])
+        return json.loads(self._meta[start:end])
+
+    def vectors(self) -> np.ndarray:
+        """
+        Purpose: Return the unit-length float32 embedding matrix.
+
+        Output: np.ndarray: The memory-mapped matrix for float32 snapshots,
+                or a dequantized copy for int8 snapshots.
+        """
+        if self.manifest["dtype"] == "int8":
+            return self.embeddings.astype(np.float32) / INT8_SCALE
+        return self.embeddings
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """
+        Purpose: Iterate over chunks as ingestion-style records.
+
+        Output: Iterator[Dict[str, Any]]: Dicts with "text", "metadata" and "embedding".
+        """
+        vectors = self.vectors()
+        for i in range(len(self)):
+            yield {**self[i], "embedding": vectors[i].tolist()}
+
+    def close(self) -> None:
+        for m in (self._text, self._meta):
+            if isinstance(m, mmap.mmap):
+                m.close()
+
+
+def current_version(root: str) -> str:
+    """
+    Purpose: Return the name of the published snapshot version.
+
+    Input: 1. root (str): Snapshot root directory.
+
+    Output: str: Version directory name.
+    """
+    with open(Path(root) / "CURRENT") as f:
+        return f.read().strip()
+
+
+def list_versions(root: str) -> List[str]:
+    """
+    Purpose: List the complete snapshot versions under a root, oldest first.
+
+    Input: 1. root (str): Snapshot root directory.
+
+    Output: List[str]: Version directory names.
+    """
+    p = Path(root)
+    if not p.is_dir():
+        return []
+    return sorted(d.name for d in p.iterdir() if d.is_dir() and d.name.startswith("v"))
+
+
+# Bytes reserved for the embeddings.npy header, which is written once the row count is known.
+NPY_HEADER_SIZE = 128
+
+
+def _npy_header(dtype: str, shape: tuple) -> bytes:
+    """Purpose: A version 1.0 .npy header padded to NPY_HEADER_SIZE bytes."""
+    descr = np.lib.format.dtype_to_descr(np.dtype(dtype))
+    text = f"{{'descr': {descr!r}, 'fortran_order': False, 'shape': {shape!r}, }}"
+    body_size = NPY_HEADER_SIZE - 10  # magic (6) + version (2) + header length (2)
+    body = text.ljust(body_size - 1) + "\n"
+    if len(body) != body_size:
+        raise ValueError(f"Snapshot header too long for shape {shape}")
+    return np.lib.format.magic(1, 0) + body_size.to_bytes(2, "little") + body.encode("latin1")
+
+
+def _reserve_version(root_path: Path) -> str:
+    """
+    Purpose: Claim the next version name with an exclusive mkdir.
+
+    Concurrent writers that pick the same number get FileExistsError and
+    move on to the next one; the empty directory is later replaced by rename.
+    """
+    versions = list_versions(str(root_path))
+    number = int(versions[-1][1:]) + 1 if versions else 1
+    while True:
+        version = f"v{number:06d}"
+        try:
+            (root_path / version).mkdir()
+            return version
+        except FileExistsError:
+            number += 1
+
+
+def write_snapshot(
+    root: str,
+    records: Iterator[Dict[str, Any]],
+    dim: Optional[int] = None,
+    dtype: str = "float32",
+    keep: int = 3,
+) -> str:
+    """
+    Purpose: Write records to a new snapshot version and publish it atomically.
+
+    Records are counted as they are written, so the source may change while
+    it is read (e.g. a live Mongo cursor): the snapshot holds exactly the
+    rows the iterator produced. CURRENT only moves forward: a writer that
+    finishes after a newer version was published leaves CURRENT alone.
+
+    Input: 1. root (str): Snapshot root directory.
+           2. records (Iterator[Dict[str, Any]]): Dicts with "text", "metadata" and "embedding".
+           3. dim (Optional[int]): Embedding dimension; taken from the first record if None.
+           4. dtype (str): "float32" or "int8".
+           5. keep (int): Number of versions to keep on disk, including the new one.
+
+    Output: str: The published version name.
+    """
+    if dtype not in ("float32", "int8"):
+        raise ValueError(f"Unsupported snapshot dtype: {dtype}")
+
+    root_path = Path(root)
+    root_path.mkdir(parents=True, exist_ok=True)
+    tmp = root_path / f".tmp-{uuid.uuid4().hex}"
+    tmp.mkdir()
+    version = None
+
+    try:
+        text_offsets = [0]
+        meta_offsets = [0]
+        with (
+            open(tmp / "embeddings.npy", "wb") as emb_f,
+            open(tmp / "text.bin", "wb") as text_f,
+            open(tmp / "meta.bin", "wb") as meta_f,
+        ):
+            emb_f.write(b"\0" * NPY_HEADER_SIZE)
+            for rec in records:
+                vec = np.asarray(decode_vector(rec["embedding"]), dtype=np.float32)
+                if dim is None:
+                    dim = len(vec)
+                if len(vec) != dim:
+                    raise ValueError(f"Embedding of dimension {len(vec)} in a {dim}-dimensional snapshot")
+                norm = np.linalg.norm(vec)
+                vec = vec / norm if norm else vec
+                if dtype == "int8":
+                    vec = np.clip(np.rint(vec * INT8_SCALE), -127, 127)
+                emb_f.write(vec.astype(dtype).tobytes())
+
+                text_f.write((rec.get("text") or "").encode("utf-8"))
+                meta_f.write(json.dumps(rec.get("metadata", {}), default=str).encode("utf-8"))
+                text_offsets.append(text_f.tell())
+                meta_offsets.append(meta_f.tell())
+            count = len(text_offsets) - 1
+            dim = dim or 0
+            emb_f.seek(0)
+            emb_f.write(_npy_header(dtype, (count, dim)))
+
+        np.save(tmp / "text_offsets.npy", np.asarray(text_offsets, dtype=np.int64))
+        np.save(tmp / "meta_offsets.npy", np.asarray(meta_offsets, dtype=np.int64))
+
+        version = _reserve_version(root_path)
+        with open(tmp / "manifest.json", "w") as f:
+            json.dump(
+                {
+                    "format_version": FORMAT_VERSION,
+                    "version": version,
+                    "count": count,
+                    "dim": dim,
+                    "dtype": dtype,
+                },
+                f,
+            )
+
+        # Replaces the empty directory reserved above.
+        os.rename(tmp, root_path / version)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if version:
+            shutil.rmtree(root_path / version, ignore_errors=True)
+        raise
+
+    # Compare-and-publish under a lock, so a slower writer cannot move CURRENT back.
+    with open(root_path / ".publish.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            published = current_version(root)
+        except FileNotFoundError:
+            published = None
+        if published is None or published < version:
+            pointer = root_path / f".CURRENT-{uuid.uuid4().hex}"
+            with open(pointer, "w") as f:
+                f.write(version)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(pointer, root_path / "CURRENT")
+
+    # Older versions stay readable by processes that still have them mapped;
+    # on POSIX removing the directory does not invalidate open mappings.
+    for old in list_versions(root)[:-keep] if keep > 0 else []:
+        shutil.rmtree(root_path / old, ignore_errors=True)
+
+    print(f"Published snapshot {version} with {count} chunks to {root}.")
+    return version
+
+
+def export_snapshot(collection, root: str, dtype: str = "float32", keep: int = 3) -> str:
+    """
+    Purpose: Export a Mongo chunks collection to a new snapshot version.
+
+    One cursor is read to the end and its rows are counted as they are
+    written, so concurrent ingests or write-backs cannot make the declared
+    and written counts disagree.
+
+    Input: 1. collection: The pymongo collection holding the chunks.
+           2. root (str): Snapshot root directory.
+           3. dtype (str): "float32" or "int8".
+           4. keep (int): Number of versions to keep on disk.
+
+    Output: str: The published version name.
+    """
+    cursor = collection.find({}, {"_id": 0, "text": 1, "metadata": 1, "embedding": 1})
+    return write_snapshot(root, cursor, dtype=dtype, keep=keep)
+
+
+def import_snapshot(
+    collection, root: str, version: Optional[str] = None, batch_size: int = 1000
+) -> int:
+    """
+    Purpose: Load a snapshot version into a Mongo chunks collection.
+
+    Input: 1. collection: The pymongo collection to insert into.
+           2. root (str): Snapshot root directory.
+           3. version (Optional[str]): Version to import (CURRENT by default).
+           4. batch_size (int): Documents per insert_many call.
+
+    Output: int: Number of documents inserted.
+    """
+    snapshot = CorpusSnapshot.open(root, version)
+    inserted = 0
+    batch = []
+    for rec in snapshot.records():
+        batch.append({**rec, "embedding": encode_vector(rec["embedding"])})
+        if len(batch) >= batch_size:
+            inserted += len(collection.insert_many(batch).inserted_ids)
+            batch = []
+    if batch:
+        inserted += len(collection.insert_many(batch).inserted_ids)
+    snapshot.close()
+    print(f"Inserted {inserted} docs from snapshot {snapshot.manifest['version']}.")
+    return inserted
+
+
+def _map(path: Path):
+    # mmap cannot map empty files; an empty blob is served from bytes instead.
+    if path.stat().st_size == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export or import corpus snapshots.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_p = sub.add_parser("export", help="Export the chunks collection to a snapshot")
+    export_p.add_argument("root")
+    export_p.add_argument("--dtype", choices=["float32", "int8"], default="float32")
+    export_p.add_argument("--keep", type=int, default=3)
+
+    import_p = sub.add_parser("import", help="Import a snapshot into the chunks collection")
+    import_p.add_argument("root")
+    import_p.add_argument("--version")
+
+    list_p = sub.add_parser("list", help="List snapshot versions")
+    list_p.add_argument("root")
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        current = current_version(args.root) if (Path(args.root) / "CURRENT").exists() else None
+        for v in list_versions(args.root):
+            print(f"{v}{' (current)' if v == current else ''}")
+        return
+
+    from backend.core.db import chunks_collection
+
+    if args.command == "export":
+        export_snapshot(chunks_collection, args.root, dtype=args.dtype, keep=args.keep)
+    else:
+        import_snapshot(chunks_collection, args.root, version=args.version)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+from typing import List, Dict, Any, Iterable, Optional
+
+import numpy as np
+
+from backend.services.vector_storage import decode_vector
+
+
+class LocalVectorIndex:
+    """
+    Purpose: In-process vector index over chunk embeddings.
+
+    Two modes are supported:
+        - "exact": NumPy brute force over every vector.
+        - "ivf":   inverted file index. Vectors are clustered into `nlist` lists
+                   with spherical k-means and a query only scans the `nprobe`
+                   closest lists. Raising `nprobe` trades latency for recall.
+
+    Scores follow the Atlas `vectorSearchScore` for cosine similarity,
+    (1 + cosine) / 2, so thresholds such as RAG_THRESHOLD mean the same thing
+    for both backends.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        records: List[Dict[str, Any]],
+        mode: str = "exact",
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        kmeans_iters: int = 10,
+        seed: int = 0,
+        normalized: bool = False,
+    ):
+        if mode not in ("exact", "ivf"):
+            raise ValueError(f"Unsupported index mode: {mode}")
+        if len(vectors) != len(records):
+            raise ValueError("vectors and records must have the same length")
+
+        self.mode = mode
+        self.nprobe = nprobe
+        self.records = records
+        # Already unit-length vectors (e.g. a memory-mapped snapshot) are used
+        # as-is so they are not copied out of the shared page cache.
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.vectors = vectors if normalized else _normalize(vectors)
+
+        self.centroids = None
+        self.lists: List[np.ndarray] = []
+        if mode == "ivf" and len(records):
+            nlist = nlist or max(1, int(np.sqrt(len(records))))
+            self._train(min(nlist, len(records)), kmeans_iters, seed)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], **kwargs) -> "LocalVectorIndex":
+        """
+        Purpose: Build an index from ingestion records.
+
+        Input: 1. records (Iterable[Dict[str, Any]]): Dicts with "text", "metadata" and
+                  "embedding" (a list or a BSON binary vector).
+               2. kwargs: Index options (mode, nlist, nprobe, ...).
+
+        Output: LocalVectorIndex: The built index.
+        """
+        kept, vectors = [], []
+        for r in records:
+            vectors.append(decode_vector(r["embedding"]))
+            kept.append({"text": r.get("text"), "metadata": r.get("metadata", {})})
+        dim = len(vectors[0]) if vectors else 0
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), dim)
+        return cls(matrix, kept, **kwargs)
+
+    @classmethod
+    def from_collection(cls, collection, **kwargs) -> "LocalVectorIndex":
+        """
+        Purpose: Build an index from every document in a Mongo chunks collection.
+
+        Input: 1. collection: The pymongo collection holding the chunks.
+               2. kwargs: Index options (mode, nlist, nprobe, ...).
+
+        Output: LocalVectorIndex: The built index.
+        """
+        cursor = collection.find({}, {"_id": 0, "text": 1, "metadata": 1, "embedding": 1})
+        return cls.from_records(cursor, **kwargs)
+
+    @classmethod
+    def from_snapshot(cls, root: str, version: Optional[str] = None, **kwargs) -> "LocalVectorIndex":
+        """
+        Purpose: Build an index over a memory-mapped corpus snapshot.
+
+        Input: 1. root (str): Snapshot root directory.
+               2. version (Optional[str]): Snapshot version (CURRENT by default).
+               3. kwargs: Index options (mode, nlist, nprobe, ...).
+
+        Output: LocalVectorIndex: The built index; texts and metadata are read lazily.
+        """
+        from backend.services.snapshot import CorpusSnapshot
+
+        snapshot = CorpusSnapshot.open(root, version)
+        return cls(snapshot.vectors(), snapshot, normalized=True, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _train(self, nlist: int, iters: int, seed: int) -> None:
+        rng = np.random.default_rng(seed)
+        centroids = self.vectors[rng.choice(len(self.vectors), nlist, replace=False)]
+        for _ in range(iters):
+            assign = np.argmax(self.vectors @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = self.vectors[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        assign = np.argmax(self.vectors @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assign == c) for c in range(nlist)]
+
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        if self.mode != "ivf" or self.centroids is None:
+            return None
+        nprobe = min(self.nprobe, len(self.lists))
+        closest = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.lists[c] for c in closest])
+
+    def search(self, query_vec: List[float], k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Purpose: Return the top-k chunks for a query vector.
+
+        Input: 1. query_vec (List[float]): The query embedding.
+               2. k (int): The number of chunks to return.
+
+        Output: List[Dict[str, Any]]: Chunks with text, metadata and score, best first.
+        """
+        if not self.records or k <= 0:
+            return []
+
+        query = _normalize(np.asarray(query_vec, dtype=np.float32)[None, :])[0]
+        ids = self._candidates(query)
+        matrix = self.vectors if ids is None else self.vectors[ids]
+
+        sims = matrix @ query
+        k = min(k, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+
+        results = []
+        for i in top:
+            rec = self.records[i if ids is None else ids[i]]
+            results.append({**rec, "score": float((1.0 + sims[i]) / 2.0)})
+        return results
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
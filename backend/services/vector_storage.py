@@ -0,0 +1,273 @@
+"""
+Storage encodings for chunk embeddings.
+
+    "array"   - BSON array of doubles (8 bytes per dimension plus per-element keys)
+    "float32" - BSON binary vector, packed float32 (4 bytes per dimension)
+    "int8"    - BSON binary vector, int8 scalar-quantized per vector (1 byte per dimension)
+
+Atlas Vector Search indexes all three with the same "vector" field definition
+(see index_definition). int8 vectors are scaled per vector so the largest
+component maps to 127, which keeps cosine similarity (the index's metric)
+unchanged apart from rounding. Queries against binary vectors are sent in the
+same encoding as the stored vectors.
+"""
+
+import argparse
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from bson import encode
+from bson.binary import Binary, BinaryVectorDtype
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Encoding for newly ingested chunk embeddings; also selects the query encoding.
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "array")
+STORAGES = ("array", "float32", "int8")
+CHUNKS_INDEX = "smarttutor_chunks_index"
+EMBEDDING_DIMENSIONS = 384
+
+_DTYPES = {"float32": BinaryVectorDtype.FLOAT32, "int8": BinaryVectorDtype.INT8}
+
+
+def encode_vector(vec: Iterable[float], storage: str = EMBEDDING_STORAGE) -> Any:
+    """
+    Purpose: Encode an embedding for storage in Mongo.
+
+    Input: 1. vec (Iterable[float]): The embedding.
+           2. storage (str): One of STORAGES.
+
+    Output: Any: A list of floats ("array") or a BSON binary vector.
+    """
+    if storage not in STORAGES:
+        raise ValueError(f"Unsupported embedding storage: {storage}")
+    if storage == "array":
+        return [float(x) for x in vec]
+    v = np.asarray(vec, dtype=np.float32)
+    if storage == "int8":
+        peak = float(np.abs(v).max()) or 1.0
+        v = np.clip(np.rint(v * (127.0 / peak)), -127, 127).astype(np.int8)
+    return Binary.from_vector(v.tolist(), _DTYPES[storage])
+
+
+def storage_of(value: Any) -> str:
+    """Purpose: Name the encoding of a stored embedding ("array", "float32" or "int8")."""
+    if isinstance(value, Binary):
+        dtype = value.as_vector().dtype
+        return "int8" if dtype == BinaryVectorDtype.INT8 else "float32"
+    return "array"
+
+
+def decode_vector(value: Any) -> List[float]:
+    """
+    Purpose: Read a stored embedding back as floats, whatever its encoding.
+
+    int8 vectors come back on the int8 scale; they are only meaningful for
+    cosine similarity, which every consumer uses (or normalizes for).
+
+    Input: 1. value (Any): A list of floats or a BSON binary vector.
+
+    Output: List[float]: The embedding.
+    """
+    if isinstance(value, Binary):
+        return [float(x) for x in value.as_vector().data]
+    return value
+
+
+def query_vector(vec: List[float], storage: str = EMBEDDING_STORAGE) -> Any:
+    """
+    Purpose: Encode a query embedding to match the stored vectors' encoding.
+
+    Input: 1. vec (List[float]): The query embedding.
+           2. storage (str): Encoding of the stored vectors.
+
+    Output: Any: queryVector value for $vectorSearch.
+    """
+    return vec if storage == "array" else encode_vector(vec, storage)
+
+
+def index_definition(dimensions: int = EMBEDDING_DIMENSIONS) -> Dict[str, Any]:
+    """
+    Purpose: Atlas Vector Search definition for CHUNKS_INDEX; the same for every storage.
+
+    Input: 1. dimensions (int): Embedding size.
+
+    Output: Dict[str, Any]: The index definition.
+    """
+    return {
+        "fields": [
+            {
+                "type": "vector",
+                "path": "embedding",
+                "numDimensions": dimensions,
+                "similarity": "cosine",
+            }
+        ]
+    }
+
+
+def create_index(collection, name: str = CHUNKS_INDEX) -> str:
+    """
+    Purpose: Create the chunks vector search index on Atlas.
+
+    Input: 1. collection: The pymongo chunks collection.
+           2. name (str): Index name.
+
+    Output: str: The index name.
+    """
+    from pymongo.operations import SearchIndexModel
+
+    model = SearchIndexModel(definition=index_definition(), name=name, type="vectorSearch")
+    return collection.create_search_index(model)
+
+
+def migrate(collection, storage: str, batch_size: int = 500, limit: Optional[int] = None) -> Dict[str, int]:
+    """
+    Purpose: Re-encode existing chunk embeddings in bulk.
+
+    Documents already in the target encoding are skipped, so the command can
+    be re-run after an interruption. Each batch is one unordered bulk_write.
+
+    Input: 1. collection: The pymongo chunks collection.
+           2. storage (str): Target encoding, one of STORAGES.
+           3. batch_size (int): Updates per bulk_write.
+           4. limit (Optional[int]): Stop after this many documents (for trial runs).
+
+    Output: Dict[str, int]: "scanned", "converted" and "skipped" counts.
+    """
+    from pymongo import UpdateOne
+
+    if storage not in STORAGES:
+        raise ValueError(f"Unsupported embedding storage: {storage}")
+    counts = {"scanned": 0, "converted": 0, "skipped": 0}
+    batch = []
+    cursor = collection.find({}, {"_id": 1, "embedding": 1}, batch_size=batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+    for doc in cursor:
+        counts["scanned"] += 1
+        if storage_of(doc["embedding"]) == storage:
+            counts["skipped"] += 1
+            continue
+        encoded = encode_vector(decode_vector(doc["embedding"]), storage)
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"embedding": encoded}}))
+        if len(batch) >= batch_size:
+            counts["converted"] += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        counts["converted"] += collection.bulk_write(batch, ordered=False).modified_count
+    print(f"Migrated embeddings to {storage}: {counts}")
+    return counts
+
+
+def _recall(reference: np.ndarray, candidate: np.ndarray, queries: np.ndarray, k: int) -> float:
+    def top_k(matrix: np.ndarray) -> np.ndarray:
+        m = matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12)
+        return np.argsort(-(queries @ m.T), axis=1)[:, :k]
+
+    expected, found = top_k(reference), top_k(candidate)
+    hits = sum(len(set(e) & set(f)) for e, f in zip(expected, found))
+    return hits / expected.size
+
+
+def storage_report(vectors: List[List[float]], k: int = 10, queries: int = 200, seed: int = 0) -> Dict[str, Any]:
+    """
+    Purpose: Compare the encodings on a sample of embeddings.
+
+    Sizes are the BSON bytes of the "embedding" field. Recall@k is measured
+    by exact cosine search over the sample: slightly perturbed copies of
+    sampled vectors are searched against the decoded vectors, and the hits
+    are compared with the same search over the float64 originals.
+
+    Input: 1. vectors (List[List[float]]): Sample embeddings (full precision).
+           2. k (int): Neighbours per query.
+           3. queries (int): Number of query vectors.
+           4. seed (int): Random seed for query selection.
+
+    Output: Dict[str, Any]: Per-encoding bytes per vector, savings vs "array" and recall@k.
+    """
+    reference = np.asarray(vectors, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    picked = reference[rng.choice(len(reference), size=min(queries, len(reference)), replace=False)]
+    picked = picked + rng.normal(scale=0.01, size=picked.shape)
+    picked /= np.linalg.norm(picked, axis=1, keepdims=True) + 1e-12
+    k = min(k, len(reference))
+
+    array_bytes = np.mean([len(encode({"embedding": encode_vector(v, "array")})) for v in vectors])
+    report: Dict[str, Any] = {"vectors": len(vectors), "k": k, "encodings": {}}
+    for storage in STORAGES:
+        encoded = [encode_vector(v, storage) for v in vectors]
+        size = float(np.mean([len(encode({"embedding": e})) for e in encoded]))
+        decoded = np.asarray([decode_vector(e) for e in encoded], dtype=np.float64)
+        report["encodings"][storage] = {
+            "bytes_per_vector": round(size, 1),
+            "saved_vs_array": round(1 - size / array_bytes, 4),
+            f"recall@{k}": round(_recall(reference, decoded, picked, k), 4),
+        }
+    return report
+
+
+def collection_report(collection, sample: int = 2000, k: int = 10) -> Dict[str, Any]:
+    """
+    Purpose: storage_report() over a sample of the chunks collection, plus its current size.
+
+    Input: 1. collection: The pymongo chunks collection.
+           2. sample (int): Documents to sample.
+           3. k (int): Neighbours per query for recall@k.
+
+    Output: Dict[str, Any]: The report.
+    """
+    docs = collection.aggregate([{"$sample": {"size": sample}}, {"$project": {"_id": 0, "embedding": 1}}])
+    stored = [d["embedding"] for d in docs]
+    vectors = [decode_vector(v) for v in stored]
+    stats = collection.database.command("collStats", collection.name)
+    current: Dict[str, int] = {}
+    for value in stored:
+        current[storage_of(value)] = current.get(storage_of(value), 0) + 1
+    return {
+        "collection": {
+            "count": stats.get("count"),
+            "size": stats.get("size"),
+            "avg_obj_size": stats.get("avgObjSize"),
+            "storage_size": stats.get("storageSize"),
+            "total_index_size": stats.get("totalIndexSize"),
+            "sampled_encodings": current,
+        },
+        # Recall is relative to the sampled vectors, which are exact only if stored as array/float32.
+        **storage_report(vectors, k=k),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Chunk embedding storage tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("index-definition", help="Print the Atlas vector search index definition")
+    sub.add_parser("create-index", help="Create the Atlas vector search index")
+    migrate_p = sub.add_parser("migrate", help="Re-encode existing chunk embeddings")
+    migrate_p.add_argument("--to", choices=STORAGES, default=EMBEDDING_STORAGE)
+    migrate_p.add_argument("--batch-size", type=int, default=500)
+    migrate_p.add_argument("--limit", type=int)
+    report_p = sub.add_parser("report", help="Storage savings and recall per encoding")
+    report_p.add_argument("--sample", type=int, default=2000)
+    report_p.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "index-definition":
+        print(json.dumps(index_definition(), indent=2))
+        return
+
+    from backend.core.db import chunks_collection
+
+    if args.command == "create-index":
+        print({"index": create_index(chunks_collection)})
+    elif args.command == "migrate":
+        migrate(chunks_collection, args.to, batch_size=args.batch_size, limit=args.limit)
+    else:
+        print(json.dumps(collection_report(chunks_collection, sample=args.sample, k=args.k), indent=2))
+
+
+if __name__ == "__main__":
+    main()
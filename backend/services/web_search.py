@@ -1,23 +1,132 @@
 import os
+import threading
 from typing import List, Dict, Any
 from dotenv import load_dotenv
-from tavily import TavilyClient
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from backend.core.cache import SingleFlight, TTLCache, normalize_text
+from backend.core.registry import aget, get_chat_model, get_or_create
+from backend.services.context_packing import WEB_EVIDENCE_TOKEN_BUDGET, pack_passages
+
 load_dotenv()
 
-tavily_api_key = os.getenv("TAVILY_API_KEY")
-tavily = TavilyClient(api_key=tavily_api_key)
+TAVILY_API_URL = os.getenv("TAVILY_API_URL", "https://api.tavily.com")
+WEB_SEARCH_TIMEOUT = float(os.getenv("WEB_SEARCH_TIMEOUT", "10"))  # Seconds per Tavily request
+WEB_POOL_SIZE = int(os.getenv("WEB_POOL_SIZE", "20"))  # Max pooled keep-alive connections
+# Search results keyed by normalized query and k; size 0 disables the cache.
+WEB_CACHE_SIZE = int(os.getenv("WEB_CACHE_SIZE", "1024"))
+WEB_CACHE_TTL = float(os.getenv("WEB_CACHE_TTL", "3600"))
+
+web_cache = TTLCache(maxsize=WEB_CACHE_SIZE, ttl=WEB_CACHE_TTL)
+_inflight = SingleFlight()
+web_stats = {"tavily_calls": 0, "tavily_errors": 0}
+_stats_lock = threading.Lock()
+
+
+class TavilySearch:
+    """
+    Purpose: Minimal Tavily /search client over pooled keep-alive connections.
+
+    One sync and one async httpx client are shared by all requests of the
+    process, each with a bounded pool and a per-request timeout.
+    """
+
+    def __init__(self, api_key: str, base_url: str = TAVILY_API_URL, timeout: float = WEB_SEARCH_TIMEOUT):
+        import httpx
+
+        options = {
+            "base_url": base_url,
+            "headers": {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+            "timeout": httpx.Timeout(timeout),
+            "limits": httpx.Limits(
+                max_connections=WEB_POOL_SIZE, max_keepalive_connections=WEB_POOL_SIZE
+            ),
+        }
+        self.client = httpx.Client(**options)
+        self.async_client = httpx.AsyncClient(**options)
+
+    def search(self, query: str, max_results: int = 5) -> Dict[str, Any]:
+        resp = self.client.post("/search", json={"query": query, "max_results": max_results})
+        resp.raise_for_status()
+        return resp.json()
+
+    async def asearch(self, query: str, max_results: int = 5) -> Dict[str, Any]:
+        resp = await self.async_client.post("/search", json={"query": query, "max_results": max_results})
+        resp.raise_for_status()
+        return resp.json()
+
+
+def get_tavily() -> TavilySearch:
+    """
+    Purpose: Shared pooled Tavily client.
+
+    Output: TavilySearch: The client.
+    """
+    return get_or_create("tavily", lambda: TavilySearch(os.getenv("TAVILY_API_KEY", "")))
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        web_stats[name] += 1
+
+
+def get_web_search_stats() -> Dict[str, Any]:
+    """
+    Purpose: Return outbound Tavily calls and errors, result-cache counters
+             and how many searches were shared with an identical in-flight one.
+
+    Output: Dict[str, Any]: The counters.
+    """
+    with _stats_lock:
+        stats = dict(web_stats)
+    return {**stats, "cache": web_cache.stats(), "inflight": _inflight.stats()}
+
+
+def _store(key, resp: Dict[str, Any]) -> Dict[str, Any]:
+    raw = resp.get("results", []) or []
+    entry = {"raw": raw, "items": normalize(raw)}
+    web_cache.set(key, entry)
+    return entry
 
-groq_api_key = os.getenv("GROQ_API_KEY")
-groq = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    api_key=groq_api_key,
-    temperature=0,
-    max_retries=2,
-)
+
+def _failed(e: Exception) -> Dict[str, Any]:
+    # Failures are not cached, so the next request retries.
+    _count("tavily_errors")
+    print(f"Error searching web: {e}")
+    return {"raw": [], "items": []}
+
+
+def _search_entry(query: str, k: int) -> Dict[str, Any]:
+    key = (normalize_text(query), k)
+    entry = web_cache.get(key)
+    if entry is not None:
+        return entry
+
+    def fetch() -> Dict[str, Any]:
+        _count("tavily_calls")
+        return _store(key, get_tavily().search(query, max_results=k))
+
+    try:
+        return _inflight.do(key, fetch)
+    except Exception as e:
+        return _failed(e)
+
+
+async def _asearch_entry(query: str, k: int) -> Dict[str, Any]:
+    key = (normalize_text(query), k)
+    entry = web_cache.get(key)
+    if entry is not None:
+        return entry
+
+    async def fetch() -> Dict[str, Any]:
+        _count("tavily_calls")
+        return _store(key, await get_tavily().asearch(query, max_results=k))
+
+    try:
+        return await _inflight.ado(key, fetch)
+    except Exception as e:
+        return _failed(e)
 
 prompt = ChatPromptTemplate.from_messages(
     [
@@ -36,7 +145,16 @@ prompt = ChatPromptTemplate.from_messages(
 
 parser = StrOutputParser()
 
-chain = prompt | groq | parser
+
+def get_chain():
+    """
+    Purpose: Build (once) the web synthesis chain; the Groq client is created on first use.
+
+    Output: Runnable: prompt | llm | parser over {"question", "evidence"}.
+    """
+    return get_or_create(
+        "web_chain", lambda: prompt | get_chat_model("web") | parser
+    )
 
 
 def search_web(query: str, k: int = 5) -> List[Dict[str, Any]]:
@@ -48,12 +166,19 @@ def search_web(query: str, k: int = 5) -> List[Dict[str, Any]]:
 
     Output: List[Dict[str, Any]]: A list of documents with their metadata and text.
     """
-    try:
-        resp = tavily.search(query=query, num_results=k)
-        return resp.get("results", []) or []
-    except Exception as e:
-        print(f"Error searching web: {e}")
-        return []
+    return _search_entry(query, k)["raw"]
+
+
+async def asearch_web(query: str, k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Purpose: Async search_web; shares the result cache and in-flight searches.
+
+    Input: 1. query (str): The query to search for.
+           2. k (int): The number of documents to return.
+
+    Output: List[Dict[str, Any]]: A list of documents with their metadata and text.
+    """
+    return (await _asearch_entry(query, k))["raw"]
 
 
 def normalize(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -80,20 +205,31 @@ def normalize(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return items
 
 
+def format_evidence(items: List[Dict[str, Any]]) -> str:
+    """
+    Purpose: Format web excerpts for the synthesis prompt: near-duplicates
+             dropped, packed by score into WEB_EVIDENCE_TOKEN_BUDGET.
+
+    Input: 1. items (List[Dict[str, Any]]): normalize()d results.
+
+    Output: str: The evidence block.
+    """
+    passages = [{**it, "text": it["content"]} for it in items]
+    packed, _ = pack_passages(passages, WEB_EVIDENCE_TOKEN_BUDGET, "web_evidence")
+    return "".join(
+        f"[{i}] title: {p['title']}\nurl: {p['url']}\ncontent: {p['text']}\n\n"
+        for i, p in enumerate(packed, start=1)
+    )
+
+
 def synthesize_answer(question: str, items: List[Dict[str, Any]]) -> str:
     if not items:
         return "no answer found"
 
-    evidence = ""
-    for i, it in enumerate(items, start=1):
-        evidence += (
-            f"[{i}] title: {it['title']}\n"
-            f"url: {it['url']}\n"
-            f"content: {it['content']}\n\n"
-        )
+    evidence = format_evidence(items)
 
     try:
-        answer = chain.invoke(
+        answer = get_chain().invoke(
             {
                 "question": question,
                 "evidence": evidence,  # ✅ KEY FIX
@@ -105,6 +241,20 @@ def synthesize_answer(question: str, items: List[Dict[str, Any]]) -> str:
         return "no answer found"
 
 
+async def asynthesize_answer(question: str, items: List[Dict[str, Any]]) -> str:
+    if not items:
+        return "no answer found"
+
+    try:
+        answer = await (await aget(get_chain)).ainvoke(
+            {"question": question, "evidence": format_evidence(items)}
+        )
+        answer = answer.strip()
+        return answer if answer else "no answer found"
+    except Exception:
+        return "no answer found"
+
+
 def search_and_synthesize(query: str, k: int = 5) -> Dict[str, Any]:
     """
     Purpose: Search the web for relevant documents and synthesize an answer.
@@ -114,8 +264,7 @@ def search_and_synthesize(query: str, k: int = 5) -> Dict[str, Any]:
 
     Output: Dict[str, Any]: A dictionary containing the answer and the sources used.
     """
-    raw = search_web(query, k=k)
-    items = normalize(raw)
+    items = _search_entry(query, k)["items"]
     answer = synthesize_answer(query, items)
 
     return {
@@ -124,3 +273,43 @@ def search_and_synthesize(query: str, k: int = 5) -> Dict[str, Any]:
         "top_score": items[0]["score"] if items else 0.0,
         "answer": answer,
     }
+
+
+async def asearch_and_synthesize(query: str, k: int = 5) -> Dict[str, Any]:
+    """
+    Purpose: Async search_and_synthesize.
+
+    Input: 1. query (str): The query to search for.
+           2. k (int): The number of documents to return.
+
+    Output: Dict[str, Any]: A dictionary containing the answer and the sources used.
+    """
+    items = (await _asearch_entry(query, k))["items"]
+    answer = await asynthesize_answer(query, items)
+
+    return {
+        "type": "web",
+        "items": items,
+        "top_score": items[0]["score"] if items else 0.0,
+        "answer": answer,
+    }
+
+
+async def asynthesize_result(query: str, raw: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Purpose: Build the web result from search results fetched earlier.
+
+    Input: 1. query (str): The query that was searched.
+           2. raw (List[Dict[str, Any]]): Raw Tavily results.
+
+    Output: Dict[str, Any]: A dictionary containing the answer and the sources used.
+    """
+    items = normalize(raw)
+    answer = await asynthesize_answer(query, items)
+
+    return {
+        "type": "web",
+        "items": items,
+        "top_score": items[0]["score"] if items else 0.0,
+        "answer": answer,
+    }
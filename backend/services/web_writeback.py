@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from backend.core.db import chunks_collection
+from backend.services.answer_cache import answer_cache
+from backend.services.ingestion import build_records, embed_chunks, insert_records, split_documents
+
+load_dotenv()
+
+# Opt-in: store web evidence from web-routed questions as "web" chunks, so
+# later similar questions can be answered from the knowledge base.
+WEB_WRITEBACK = os.getenv("WEB_WRITEBACK", "off")  # "on" or "off"
+WEB_WRITEBACK_TTL = float(os.getenv("WEB_WRITEBACK_TTL", str(7 * 86400)))
+# Tavily relevance score an excerpt needs to be kept.
+WEB_WRITEBACK_MIN_SCORE = float(os.getenv("WEB_WRITEBACK_MIN_SCORE", "0.5"))
+# Expired web chunks are deleted at most this often (seconds) as a side effect of write-back.
+WEB_GC_INTERVAL = float(os.getenv("WEB_GC_INTERVAL", "3600"))
+
+_last_gc = [0.0]
+_gc_lock = threading.Lock()
+# Keeps fire-and-forget write-back tasks referenced until they finish.
+_background: Set[asyncio.Task] = set()
+
+
+def write_back(question: str, items: List[Dict[str, Any]]) -> int:
+    """
+    Purpose: Chunk, embed and store web excerpts as expiring "web" chunks.
+
+    URLs that already have live web chunks are skipped. Excerpts go through
+    the same splitter and embedding path (and embedding store) as documents.
+
+    Input: 1. question (str): The question the excerpts were fetched for.
+           2. items (List[Dict[str, Any]]): normalize()d Tavily results.
+
+    Output: int: Number of chunks inserted.
+    """
+    now = datetime.now(timezone.utc)
+    keep = {
+        it["url"]: it
+        for it in items
+        if it.get("url") and it.get("content") and it.get("score", 0.0) >= WEB_WRITEBACK_MIN_SCORE
+    }
+    if keep:
+        live = chunks_collection.distinct(
+            "metadata.source",
+            {
+                "metadata.type": "web",
+                "metadata.source": {"$in": list(keep)},
+                "metadata.expires_at": {"$gt": now},
+            },
+        )
+        for url in live:
+            keep.pop(url, None)
+    if not keep:
+        return 0
+
+    docs = [
+        Document(
+            page_content=it["content"],
+            metadata={
+                "source": url,
+                "title": it.get("title"),
+                "type": "web",
+                "question": question,
+                "web_score": it.get("score"),
+                "fetched_at": now,
+                "expires_at": now + timedelta(seconds=WEB_WRITEBACK_TTL),
+            },
+        )
+        for url, it in keep.items()
+    ]
+    chunks = split_documents(docs)
+    # No cache invalidation: answers cached from this same evidence are not stale,
+    # and store_node may have just cached one under these URLs.
+    inserted = insert_records(build_records(chunks, embed_chunks(chunks)), invalidate=False)
+    print(f"Wrote back {inserted} web chunks from {len(docs)} pages.")
+    maybe_gc()
+    return inserted
+
+
+def schedule_write_back(question: str, items: List[Dict[str, Any]]) -> None:
+    """
+    Purpose: Run write_back in a worker thread without delaying the answer.
+
+    Input: 1. question (str): The question the excerpts were fetched for.
+           2. items (List[Dict[str, Any]]): normalize()d Tavily results.
+    """
+    if WEB_WRITEBACK != "on" or not items:
+        return
+
+    async def run() -> None:
+        try:
+            await asyncio.to_thread(write_back, question, items)
+        except Exception as e:
+            print(f"Web write-back failed: {e}")
+
+    task = asyncio.ensure_future(run())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+def gc_expired_web_chunks(now: Optional[datetime] = None) -> int:
+    """
+    Purpose: Delete every expired web chunk with one delete_many.
+
+    Cached answers built from the expired URLs are invalidated as well.
+
+    Input: 1. now (Optional[datetime]): Reference time (UTC now by default).
+
+    Output: int: Number of chunks deleted.
+    """
+    query = {
+        "metadata.type": "web",
+        "metadata.expires_at": {"$lte": now or datetime.now(timezone.utc)},
+    }
+    sources = chunks_collection.distinct("metadata.source", query)
+    if not sources:
+        return 0
+    deleted = chunks_collection.delete_many(query).deleted_count
+    if answer_cache:
+        answer_cache.invalidate_sources(sources)
+    print(f"Deleted {deleted} expired web chunks from {len(sources)} URLs.")
+    return deleted
+
+
+def maybe_gc() -> int:
+    """Purpose: gc_expired_web_chunks, at most once per WEB_GC_INTERVAL."""
+    with _gc_lock:
+        if time.monotonic() - _last_gc[0] < WEB_GC_INTERVAL:
+            return 0
+        _last_gc[0] = time.monotonic()
+    return gc_expired_web_chunks()
+
+
+def ensure_ttl_index() -> str:
+    """
+    Purpose: Let Mongo expire web chunks itself via a TTL index on
+             metadata.expires_at (document chunks have no expiry and are untouched).
+
+    Output: str: The index name.
+    """
+    return chunks_collection.create_index("metadata.expires_at", expireAfterSeconds=0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Web write-back maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("gc", help="Delete expired web chunks now")
+    sub.add_parser("ttl-index", help="Create the TTL index on metadata.expires_at")
+    args = parser.parse_args()
+
+    if args.command == "gc":
+        print({"deleted": gc_expired_web_chunks()})
+    else:
+        print({"index": ensure_ttl_index()})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Purpose: Compare embedding backends on throughput, query latency and parity.
+
+For each backend: texts/sec embedding the corpus sample in batches, p50/p99
+single-query embed latency, and cosine drift against the torch reference.
+Backends that cannot be loaded (e.g. missing onnxruntime) are reported with
+their error.
+
+Usage: python -m benchmarks.embedding_backends [--pdf-dir data/] [--backends torch onnx-int8]
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from backend.core.embedding_backends import BACKENDS, build_embeddings, cosine_drift
+from backend.core.registry import EMBEDDING_MODEL
+
+
+def sample_texts(pdf_dir: str, limit: int) -> List[str]:
+    if pdf_dir:
+        from backend.services.ingestion import load_documents, split_documents
+
+        return [c.page_content for c in split_documents(load_documents(pdf_dir))][:limit]
+    topics = ["photosynthesis", "linear algebra", "the French revolution", "TCP congestion control"]
+    return [
+        f"Chunk {i}: an explanation of {topics[i % len(topics)]} covering definitions, "
+        f"worked examples and common mistakes, part {i // len(topics)}."
+        for i in range(limit)
+    ]
+
+
+def bench_backend(
+    backend: str, texts: List[str], queries: List[str], batch_size: int, reference: List[List[float]]
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    model = build_embeddings(EMBEDDING_MODEL, backend)
+    load_s = time.perf_counter() - started
+    model.embed_documents(texts[:batch_size])  # warm-up
+
+    started = time.perf_counter()
+    vectors: List[List[float]] = []
+    for i in range(0, len(texts), batch_size):
+        vectors += model.embed_documents(texts[i : i + batch_size])
+    elapsed = time.perf_counter() - started
+
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        model.embed_query(q)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    return {
+        "backend": backend,
+        "load_s": round(load_s, 2),
+        "texts_per_sec": round(len(texts) / elapsed, 1),
+        "query_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "query_p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        **cosine_drift(reference, vectors),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SmartTutor embedding backend benchmark")
+    parser.add_argument("--pdf-dir", default="")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    args = parser.parse_args()
+
+    texts = sample_texts(args.pdf_dir, args.texts)
+    queries = [t[:80] for t in texts[: args.queries]]
+    reference = build_embeddings(EMBEDDING_MODEL, "torch").embed_documents(texts)
+
+    results = []
+    for backend in args.backends:
+        try:
+            results.append(bench_backend(backend, texts, queries, args.batch_size, reference))
+        except Exception as e:
+            results.append({"backend": backend, "error": f"{type(e).__name__}: {e}"})
+        print(json.dumps(results[-1]))
+    print(json.dumps({"texts": len(texts), "queries": len(queries), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
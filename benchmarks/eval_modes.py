@@ -0,0 +1,161 @@
+"""
+Purpose: Compare the "separate" and "fused" evaluate/rewrite stages on tail latency.
+
+Both graphs answer the same questions over an in-memory local index, with
+the answer cache off. Reports p50/p95/p99 of the end-to-end graph latency per
+mode, overall and for rewritten answers only, and LLM calls per question.
+
+By default the run is SIMULATED: the LLM is the local fake (LLM_PROVIDER=fake,
+no rate limits) with a scripted latency (LLM_FAKE_LATENCY_MS per call plus
+LLM_FAKE_MS_PER_TOKEN per completion token), and a script decides which
+--low-share of answers score below EVAL_THRESHOLD and take the rewrite path.
+Its latencies restate those parameters; only the call counts and the relative
+shape of the two graphs carry over. The report is marked "simulated": true.
+Set LLM_PROVIDER=groq (with GROQ_API_KEY) for real latencies and judge scores.
+
+Usage: python -m benchmarks.eval_modes [--questions 200] [--concurrency 8] [--low-share 0.3]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import zlib
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Read by the modules imported below.
+os.environ.setdefault("LLM_PROVIDER", "fake")
+if os.environ["LLM_PROVIDER"] == "fake":
+    os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "0")
+    os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "0")
+    os.environ.setdefault("LLM_FAKE_LATENCY_MS", "300")
+    os.environ.setdefault("LLM_FAKE_MS_PER_TOKEN", "4")
+os.environ.setdefault("RETRIEVAL_BACKEND", "local")
+os.environ.setdefault("ANSWER_CACHE_BACKEND", "off")
+
+from backend import langgraph_pipeline as pipeline  # noqa: E402
+from backend.core.llm_gateway import LLM_PROVIDER, get_gateway  # noqa: E402
+from backend.core.registry import get_chat_model  # noqa: E402
+from backend.services import retrieval  # noqa: E402
+from backend.services.embedding_service import get_embedder  # noqa: E402
+from backend.services.vector_index import LocalVectorIndex  # noqa: E402
+
+TOPICS = ["photosynthesis", "linear algebra", "the French revolution", "TCP congestion control"]
+ANSWER = (
+    "In short, {topic} works as follows. The key idea is explained in the notes, "
+    "followed by a worked example and the most common mistakes students make."
+)
+
+
+def sample_texts(n: int) -> List[str]:
+    return [
+        f"Note {i}: an explanation of {TOPICS[i % len(TOPICS)]} covering definitions, "
+        f"worked examples and common mistakes, part {i // len(TOPICS)}."
+        for i in range(n)
+    ]
+
+
+def install_fake_judge(low_share: float) -> None:
+    """Purpose: Make the fake models answer each route like the real prompts expect."""
+
+    def question_of(messages) -> str:
+        text = str(messages[-1].content)
+        return text.split("Question:", 1)[-1].strip().split("\n", 1)[0]
+
+    def is_low(messages) -> bool:
+        return zlib.crc32(question_of(messages).encode()) % 1000 < low_share * 1000
+
+    def answer(messages) -> str:
+        return ANSWER.format(topic=question_of(messages)[:60])
+
+    def judge(messages) -> str:
+        return json.dumps({"score": 0.4 if is_low(messages) else 0.9})
+
+    def fused(messages) -> str:
+        if is_low(messages):
+            return json.dumps({"score": 0.4, "rewritten_answer": "Rewritten: " + answer(messages)})
+        return json.dumps({"score": 0.9, "rewritten_answer": None})
+
+    def rewrite(messages) -> str:
+        return "Rewritten: " + str(messages[-1].content)
+
+    for route, respond in (("qa", answer), ("eval", judge), ("eval_rewrite", fused), ("graph", rewrite)):
+        get_chat_model(route).provider.respond = respond
+
+
+def percentiles(values: List[float]) -> Dict[str, Any]:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+    }
+
+
+async def run_mode(mode: str, questions: List[str], concurrency: int) -> Dict[str, Any]:
+    app = pipeline.build_graph(mode)
+    semaphore = asyncio.Semaphore(concurrency)
+    calls_before = get_gateway().stats()["calls"]
+
+    async def one(question: str):
+        async with semaphore:
+            started = time.perf_counter()
+            out = await app.ainvoke(pipeline.new_state(question))
+            return (time.perf_counter() - started) * 1000, out
+
+    runs = await asyncio.gather(*[one(q) for q in questions])
+    rewritten = [ms for ms, out in runs if out["final_answer"].startswith("Rewritten")]
+    return {
+        "mode": mode,
+        "all": percentiles([ms for ms, _ in runs]),
+        "rewritten": percentiles(rewritten),
+        "llm_calls_per_question": round((get_gateway().stats()["calls"] - calls_before) / len(questions), 2),
+    }
+
+
+async def main_async(args) -> None:
+    texts = sample_texts(args.questions)
+    vectors = get_embedder().embed_documents(texts)
+    records = [
+        {"text": t, "metadata": {"source": f"notes-{i % 10}.pdf", "page": i}, "embedding": v}
+        for i, (t, v) in enumerate(zip(texts, vectors))
+    ]
+    retrieval.set_local_index(LocalVectorIndex.from_records(records))
+    if LLM_PROVIDER == "fake":
+        install_fake_judge(args.low_share)
+
+    results = []
+    for mode in ("separate", "fused"):
+        results.append(await run_mode(mode, texts, args.concurrency))
+        print(json.dumps(results[-1]))
+    print(
+        json.dumps(
+            {
+                "provider": LLM_PROVIDER,
+                "simulated": LLM_PROVIDER == "fake",
+                "questions": len(texts),
+                "concurrency": args.concurrency,
+                "results": results,
+                "pipeline": pipeline.get_pipeline_stats(),
+            },
+            indent=2,
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SmartTutor evaluate/rewrite mode benchmark")
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--low-share", type=float, default=0.3, help="Share of answers the fake judge scores low")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Purpose: Measure API cold-start cost.
+
+Each run starts a fresh interpreter, imports app (timed), starts it through
+TestClient with the background warm-up disabled and sends two POST /qa/query
+requests (timed). In "lazy" mode the first query pays for everything startup
+did not build: the embedding model, the Mongo client and the chat model. In
+"warm" mode registry.warm_up() runs (timed) before the first query, as the
+startup thread would. Reports medians per mode, with the registry's build times.
+
+The LLM is the local fake (LLM_PROVIDER=fake) unless set otherwise, and the
+answer cache is off. Retrieval still needs MONGODB_ATLAS_URI, or
+RETRIEVAL_BACKEND=local with LOCAL_INDEX_SNAPSHOT; questions that route to
+the web need TAVILY_API_KEY.
+
+Usage: python -m benchmarks.startup [--runs 5] [--question "What is a vector?"]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+from backend.core import registry
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+question, mode = sys.argv[1], sys.argv[2]
+with TestClient(app.app) as client:
+    w0 = time.perf_counter()
+    if mode == "warm":
+        from backend.services.embedding_service import get_embedder
+        registry.warm_up(get_embedder())
+    t2 = time.perf_counter()
+    first = client.post("/qa/query", json={"question": question})
+    t3 = time.perf_counter()
+    second = client.post("/qa/query", json={"question": question + " Explain briefly."})
+    t4 = time.perf_counter()
+first.raise_for_status()
+second.raise_for_status()
+print("RESULT " + json.dumps({
+    "import_s": t1 - t0,
+    "warm_up_s": t2 - w0,
+    "first_query_s": t3 - t2,
+    "second_query_s": t4 - t3,
+    "load_times": registry.load_times,
+}))
+"""
+
+METRICS = ("import_s", "warm_up_s", "first_query_s", "second_query_s")
+
+
+def run_once(mode: str, question: str) -> dict:
+    env = {
+        "LLM_PROVIDER": "fake",
+        "ANSWER_CACHE_BACKEND": "off",
+        **os.environ,
+        "WARMUP_ON_STARTUP": "0",
+    }
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE, question, mode],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    line = next(l for l in out.stdout.splitlines() if l.startswith("RESULT "))
+    return json.loads(line[len("RESULT ") :])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SmartTutor startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--question", default="What is a vector?")
+    args = parser.parse_args()
+
+    report = {"runs": args.runs}
+    for mode in ("lazy", "warm"):
+        samples = [run_once(mode, args.question) for _ in range(args.runs)]
+        report[mode] = {name: round(statistics.median(s[name] for s in samples), 3) for name in METRICS}
+        components = {name for s in samples for name in s["load_times"]}
+        report[mode]["load_times"] = {
+            name: round(statistics.median(s["load_times"].get(name, 0.0) for s in samples), 3)
+            for name in sorted(components)
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Literal
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class ChatMessage(BaseModel):
@@ -14,6 +14,10 @@ class QARequest(BaseModel):
     top_k: int = 5
 
 
+class QAStreamRequest(QARequest):
+    mode: Literal["chain", "graph"] = "chain"
+
+
 class SourceItem(BaseModel):
     source: str | None = None
     page: int | None = None
@@ -25,5 +29,33 @@ class QAResponse(BaseModel):
     sources: List[SourceItem]
 
 
+class QABatchRequest(BaseModel):
+    questions: List[str]
+    top_k: int = 5
+    ordered: bool = True  # False: results in completion order
+    stream: bool = False  # True: one JSON line per result (application/x-ndjson)
+
+
+class QABatchItem(BaseModel):
+    index: int
+    question: str
+    answer: str | None = None
+    sources: List[SourceItem] = []
+    cached: bool = False
+    error: str | None = None
+
+
+class QABatchResponse(BaseModel):
+    results: List[QABatchItem]
+
+
 class EvalResult(BaseModel):
     score: float = Field(ge=0.0, le=1.0, description="Evaluation score between 0 and 1")
+
+
+class EvalRewriteResult(BaseModel):
+    score: float = Field(ge=0.0, le=1.0, description="Evaluation score between 0 and 1")
+    rewritten_answer: Optional[str] = Field(
+        default=None,
+        description="Clearer, more structured and concise rewrite of the answer when the score is low, otherwise null",
+    )
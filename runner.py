@@ -1,7 +1,9 @@
-from backend.langgraph_pipeline import app
+import asyncio
 
+from backend.langgraph_pipeline import app, new_state
 
-def chat():
+
+async def chat():
     thread_id = "chat_1"  # SAME thread = persistent memory
 
     print("SmartTutor Chat (type 'exit' or 'quit' to stop)\n")
@@ -13,13 +15,7 @@ def chat():
             print("👋 Exiting chat.")
             break
 
-        initial_state = {
-            "question": question,
-            "rag_result": None,
-            "web_result": None,
-            "final_answer": None,
-            "eval_score": None,
-        }
+        initial_state = new_state(question)
 
         config = {
             "configurable": {
@@ -28,10 +24,10 @@ def chat():
         }
 
         # 🔹 Run the graph
-        result = app.invoke(initial_state, config)
+        result = await app.ainvoke(initial_state, config)
 
         print("\nAssistant:", result["final_answer"])
-        print(f"(eval_score={result['eval_score']})")
+        print(f"(eval_score={result['eval_score']}, stats={result['stats']})")
 
         # 🔹 DEBUG: inspect persisted state
         state = app.get_state({"configurable": {"thread_id": thread_id}})
@@ -41,4 +37,5 @@ def chat():
 
 
 if __name__ == "__main__":
-    chat()
+    # One event loop for the whole session: the async Mongo and HTTP clients bind to it.
+    asyncio.run(chat())
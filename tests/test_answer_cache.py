@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from backend.services.answer_cache import InMemoryAnswerStore
+
+
+def make_entry(vector, namespace="qa", source="a.pdf", ttl=60.0):
+    return {
+        "namespace": namespace,
+        "embedding": list(vector),
+        "result": {"answer": source},
+        "sources": [source],
+        "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl),
+    }
+
+
+def test_lookup_is_scoped_to_namespace_and_skips_expired():
+    rng = np.random.default_rng(0)
+    a, b = rng.normal(size=(2, 16))
+    store = InMemoryAnswerStore(max_entries=4)
+    store.insert(make_entry(a, source="a.pdf"))
+    store.insert(make_entry(b, namespace="web", source="b.pdf", ttl=-1))
+
+    entry, score = store.find_nearest("qa", a)
+    assert entry["result"] == {"answer": "a.pdf"}
+    assert score > 0.99
+    assert store.find_nearest("web", b) is None
+    assert store.find_nearest("other", a) is None
+
+
+def test_full_store_evicts_least_recently_used():
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(3, 16))
+    store = InMemoryAnswerStore(max_entries=2)
+    store.insert(make_entry(vectors[0], source="0"))
+    store.insert(make_entry(vectors[1], source="1"))
+    store.find_nearest("qa", vectors[0])  # 1 is now the least recently used
+    store.insert(make_entry(vectors[2], source="2"))
+
+    assert len(store) == 2
+    assert store.find_nearest("qa", vectors[1])[0]["sources"] != ["1"]
+    assert store.find_nearest("qa", vectors[0])[0]["sources"] == ["0"]
+    assert store.delete_by_sources(["0", "2"]) == 2
+    assert len(store) == 0
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.services.embedding_service import MicroBatcher
+
+
+class BlockingModel:
+    """Fake embedding model whose first forward pass waits for `release`."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        self.started.set()
+        self.release.wait(5)
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+def test_cancelled_caller_does_not_kill_worker():
+    model = BlockingModel()
+    batcher = MicroBatcher(model=model, window_ms=0, result_timeout=5)
+
+    async def scenario():
+        # In flight when cancelled: the batch is already running.
+        running = asyncio.create_task(batcher.aembed_query("running"))
+        await asyncio.to_thread(model.started.wait, 5)
+        # Still queued when cancelled: dropped before the next batch.
+        queued = asyncio.create_task(batcher.aembed_query("queued"))
+        await asyncio.sleep(0.01)
+        running.cancel()
+        queued.cancel()
+        await asyncio.gather(running, queued, return_exceptions=True)
+        model.release.set()
+        return await asyncio.wait_for(batcher.aembed_query("after"), 5)
+
+    assert asyncio.run(scenario()) == [5.0, 1.0]
+    assert batcher._worker.is_alive()
+    assert ["queued"] not in model.calls
+    assert batcher.embed_query("sync") == [4.0, 1.0]
+
+
+def test_model_error_reaches_callers_and_worker_survives():
+    class FlakyModel:
+        def __init__(self):
+            self.fail = True
+
+        def embed_documents(self, texts):
+            if self.fail:
+                self.fail = False
+                raise RuntimeError("model down")
+            return [[1.0] for _ in texts]
+
+    batcher = MicroBatcher(model=FlakyModel(), window_ms=0, result_timeout=5)
+    with pytest.raises(RuntimeError, match="model down"):
+        batcher.embed_query("first")
+    assert batcher.embed_query("second") == [1.0]
+
+
+class SlowModel:
+    """Fake embedding model taking `seconds` per forward pass."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        time.sleep(self.seconds)
+        return [[float(len(t))] for t in texts]
+
+
+def test_bulk_request_is_sliced_and_not_bound_by_the_result_timeout():
+    model = SlowModel(0.02)
+    batcher = MicroBatcher(model=model, window_ms=0, max_batch=64, result_timeout=0.5)
+    texts = [f"text {i}" for i in range(2000)]
+    vectors = batcher.embed_documents(texts)
+    assert vectors == [[float(len(t))] for t in texts]
+    assert max(len(b) for b in model.batches) <= 64
+
+
+def test_query_takes_turns_with_bulk_embedding():
+    model = SlowModel(0.02)
+    batcher = MicroBatcher(model=model, window_ms=0, max_batch=8, result_timeout=5)
+    done = {}
+
+    def bulk():
+        batcher.embed_documents([f"doc {i}" for i in range(400)])
+        done["bulk"] = time.perf_counter()
+
+    thread = threading.Thread(target=bulk)
+    thread.start()
+    time.sleep(0.1)
+    started = time.perf_counter()
+    batcher.embed_query("query")
+    done["query"] = time.perf_counter()
+    thread.join()
+    # The query waits for at most a slice or two, not the remaining ~40 forward passes.
+    assert done["query"] - started < 0.2
+    assert done["query"] < done["bulk"]
@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from backend.core.limits import TokenBucket
+from backend.core.llm_gateway import FakeChatModel, GatewayChatModel, LLMGateway
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def make_gateway(**kwargs) -> LLMGateway:
+    options = {
+        "max_concurrency": 4,
+        "requests_per_minute": 0,
+        "tokens_per_minute": 0,
+        "max_retries": 3,
+        "backoff_base": 0.01,
+        "backoff_max": 0.05,
+    }
+    options.update(kwargs)
+    return LLMGateway(**options)
+
+
+def flaky_model(failures: int) -> FakeChatModel:
+    """Fake provider that answers 429 to its first `failures` calls."""
+    calls = {"n": 0}
+
+    def respond(messages):
+        calls["n"] += 1
+        if calls["n"] <= failures:
+            raise RateLimited("rate limited")
+        return "ok"
+
+    return FakeChatModel(latency_ms=0, respond=respond)
+
+
+def test_token_bucket_reserve_and_adjust():
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    assert bucket.reserve(1) == 0.0
+    assert bucket.reserve(1) == 0.0
+    # Empty: the third token arrives in about a second.
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    bucket.adjust(1)
+    assert bucket.available() == pytest.approx(0.0, abs=0.05)
+    # Refunds never push the balance above capacity.
+    bucket.adjust(10)
+    assert bucket.available() == pytest.approx(2.0)
+
+
+def test_token_bucket_disabled():
+    bucket = TokenBucket(rate=0)
+    assert bucket.reserve(1000) == 0.0
+    assert bucket.available() == float("inf")
+
+
+def test_429_is_retried_and_pauses_callers():
+    gateway = make_gateway()
+    message = gateway.invoke("test", flaky_model(failures=2), [HumanMessage(content="hi")])
+    assert message.content == "ok"
+    stats = gateway.stats()
+    assert stats["calls"] == 1
+    assert stats["retries"] == 2
+    assert stats["rate_limited"] == 2
+    assert stats["errors"] == 0
+    assert gateway._paused_until > 0
+
+
+def test_429_gives_up_after_max_retries():
+    gateway = make_gateway(max_retries=1)
+    with pytest.raises(RateLimited):
+        gateway.invoke("test", flaky_model(failures=5), [HumanMessage(content="hi")])
+    assert gateway.stats()["errors"] == 1
+
+
+def test_connection_errors_are_retried_without_pausing():
+    calls = {"n": 0}
+
+    def respond(messages):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise ConnectionResetError("connection reset by peer")
+        return "ok"
+
+    gateway = make_gateway()
+    message = gateway.invoke("test", FakeChatModel(latency_ms=0, respond=respond), [HumanMessage(content="hi")])
+    assert message.content == "ok"
+    assert gateway.stats()["retries"] == 1
+    assert gateway.stats()["rate_limited"] == 0
+    assert gateway._paused_until == 0.0
+
+
+def test_other_errors_are_not_retried():
+    def respond(messages):
+        raise ValueError("bad prompt")
+
+    gateway = make_gateway()
+    with pytest.raises(ValueError):
+        gateway.invoke("test", FakeChatModel(latency_ms=0, respond=respond), [HumanMessage(content="hi")])
+    assert gateway.stats()["retries"] == 0
+
+
+def test_retry_after_is_capped():
+    class Response:
+        headers = {"retry-after": "3600"}
+
+    error = RateLimited("slow down")
+    error.response = Response()
+    gateway = make_gateway(backoff_max=0.05)
+    assert gateway._backoff(error, attempt=0) == 0.05
+
+
+def test_retries_do_not_drain_the_buckets():
+    gateway = make_gateway(requests_per_minute=600, tokens_per_minute=600_000)
+    model = flaky_model(failures=3)
+    message = asyncio.run(gateway.ainvoke("test", model, [HumanMessage(content="hello " * 100)]))
+    # One request and the call's real usage stay reserved; the failed attempts were refunded.
+    assert gateway.requests.available() > gateway.requests.capacity - 1.5
+    used = message.usage_metadata["total_tokens"]
+    assert gateway.tokens.available() > gateway.tokens.capacity - used - 100
+
+
+def test_identical_concurrent_calls_are_coalesced():
+    gateway = make_gateway()
+    model = FakeChatModel(latency_ms=50)
+    messages = [HumanMessage(content="Question: what is a vector?")]
+
+    async def burst():
+        return await asyncio.gather(*[gateway.ainvoke("qa", model, messages) for _ in range(5)])
+
+    replies = asyncio.run(burst())
+    assert len({r.content for r in replies}) == 1
+    assert gateway.stats()["calls"] == 1
+    assert gateway.stats()["coalesced"] == 4
+
+
+def test_astream_passes_tokens_through(monkeypatch):
+    gateway = make_gateway()
+    monkeypatch.setattr("backend.core.llm_gateway.get_gateway", lambda: gateway)
+    model = GatewayChatModel(route="qa", provider=FakeChatModel(latency_ms=0))
+    messages = [HumanMessage(content="Question: what is a vector?")]
+
+    async def collect():
+        return [chunk.content async for chunk in model.astream(messages)]
+
+    tokens = asyncio.run(collect())
+    assert len(tokens) > 1
+    assert "".join(tokens) == model.invoke(messages).content
+    assert gateway.stats()["calls"] == 2
+    assert gateway.stats()["tokens"] > 0
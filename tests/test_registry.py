@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.core import registry
+
+
+@pytest.fixture
+def names():
+    created = []
+    yield created
+    for name in created:
+        registry._instances.pop(name, None)
+        registry._locks.pop(name, None)
+
+
+def slow_factory(seconds, value):
+    def build():
+        time.sleep(seconds)
+        return value
+
+    return build
+
+
+def test_building_one_singleton_does_not_block_others(names):
+    names.extend(["test:slow", "test:fast"])
+    thread = threading.Thread(target=registry.get_or_create, args=("test:slow", slow_factory(0.5, "slow")))
+    thread.start()
+    time.sleep(0.05)
+    started = time.perf_counter()
+    assert registry.get_or_create("test:fast", lambda: "fast") == "fast"
+    assert time.perf_counter() - started < 0.1
+    thread.join()
+    assert registry.get_or_create("test:slow", lambda: "other") == "slow"
+
+
+def test_aget_builds_off_the_event_loop(names):
+    names.append("test:aget")
+
+    def getter():
+        return registry.get_or_create("test:aget", slow_factory(0.3, "built"))
+
+    async def scenario():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        beat = asyncio.create_task(heartbeat())
+        value = await registry.aget(getter)
+        beat.cancel()
+        # Already built: returned without a thread hop.
+        assert await registry.aget(getter) == "built"
+        return value, ticks
+
+    value, ticks = asyncio.run(scenario())
+    assert value == "built"
+    assert ticks >= 10